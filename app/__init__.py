@@ -1,14 +1,36 @@
 from flask import Flask
 from flask_cors import CORS
-from app.routes import docker_routes, k8s_routes, welcome_routes
+from app.json_response import install_json
+from app.metrics import instrument_app
+from app.routes import docker_routes, k8s_routes, welcome_routes, metrics_routes, health_routes, event_routes
 
 app = Flask(__name__)
 CORS(app)
+# 按路由统计请求耗时，通过 /metrics 暴露
+instrument_app(app)
+# jsonify使用快速编码器，JSON响应支持 ?fields=、?compact=true，较大的响应按Accept-Encoding压缩
+install_json(app)
+app.register_blueprint(metrics_routes.app, url_prefix='/metrics')
+
 # 注册 Welcome 相关路由
 app.register_blueprint(welcome_routes.app, url_prefix='/')
 
+# 注册存活/就绪检查路由：/healthz、/readyz
+app.register_blueprint(health_routes.app)
+
 # 注册 Docker 相关路由
 app.register_blueprint(docker_routes.app, url_prefix='/docker')
 
+# 注册多主机路由：/docker/hosts/<host>/... 与 /docker/... 相同，但操作指定的docker主机
+app.register_blueprint(docker_routes.hosts_app, url_prefix='/docker/hosts')
+app.register_blueprint(docker_routes.app, url_prefix='/docker/hosts/<host>', name='docker_host')
+
+# 注册资源变化订阅路由：/events（SSE/NDJSON，ASGI方式运行时在事件循环中处理），WebSocket为 /events/ws（仅ASGI方式）
+app.register_blueprint(event_routes.app, url_prefix='/events')
+
 # 注册 Kubernetes 相关路由
 app.register_blueprint(k8s_routes.app, url_prefix='/k8s')
+
+# 注册多集群路由：/k8s/clusters/<cluster>/... 与 /k8s/... 相同，但操作指定的集群
+app.register_blueprint(k8s_routes.clusters_app, url_prefix='/k8s/clusters')
+app.register_blueprint(k8s_routes.app, url_prefix='/k8s/clusters/<cluster>', name='k8s_cluster')
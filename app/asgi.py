@@ -0,0 +1,209 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# 执行Docker/Kubernetes阻塞调用的线程池大小，即单个进程能同时处理的慢请求数
+ASGI_MAX_WORKERS = 256
+
+
+class RequestBody:
+    # 提供给WSGI应用的wsgi.input，在工作线程中按需从ASGI的receive读取请求体
+    def __init__(self, loop, receive, has_body):
+        self.loop = loop
+        self.receive = receive
+        self.buffer = bytearray()
+        # done在工作线程中使用，complete通知事件循环中的断开监听
+        self.done = not has_body
+        self.complete = asyncio.Event()
+        if self.done:
+            self.complete.set()
+
+    def _receive_more(self):
+        if self.done:
+            return False
+        message = asyncio.run_coroutine_threadsafe(self.receive(), self.loop).result()
+        if message['type'] == 'http.disconnect' or not message.get('more_body', False):
+            self.done = True
+            self.loop.call_soon_threadsafe(self.complete.set)
+        self.buffer.extend(message.get('body', b''))
+        return True
+
+    def read(self, size=-1):
+        while (size is None or size < 0 or len(self.buffer) < size) and self._receive_more():
+            pass
+        if size is None or size < 0:
+            size = len(self.buffer)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def readline(self, size=-1):
+        while b'\n' not in self.buffer and (size is None or size < 0 or len(self.buffer) < size) \
+                and self._receive_more():
+            pass
+        end = self.buffer.find(b'\n') + 1 or len(self.buffer)
+        if size is not None and 0 <= size < end:
+            end = size
+        data = bytes(self.buffer[:end])
+        del self.buffer[:end]
+        return data
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line
+
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            environ[name] = value
+            continue
+        key = 'HTTP_' + name
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+def has_request_body(scope):
+    for name, value in scope.get('headers', []):
+        name = name.lower()
+        if name == b'transfer-encoding':
+            return True
+        if name == b'content-length':
+            return value.strip() != b'0'
+    return False
+
+
+class AsgiApp:
+    # 以ASGI方式运行现有的Flask应用（路由不变）
+    # 每个请求的处理在受控的线程池中执行，事件循环只负责网络读写；
+    # 请求体和响应体都按块在事件循环和工作线程之间传递，流式接口（日志、下载、上传）保持流式，
+    # 发送时等待客户端接收，慢客户端会对上游形成背压；客户端断开后停止迭代响应并关闭上游连接
+    # websocket_routes: {path: handler}，WebSocket连接交给 handler(scope, receive, send, executor) 处理
+    # http_routes: {path: handler}，这些路径的GET请求同样交给handler在事件循环中处理（如长时间保持的事件订阅），不占用工作线程
+    def __init__(self, wsgi_app, max_workers=ASGI_MAX_WORKERS, websocket_routes=None, http_routes=None):
+        self.wsgi_app = wsgi_app
+        self.max_workers = max_workers
+        self.websocket_routes = websocket_routes or {}
+        self.http_routes = http_routes or {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.handle_http(scope, receive, send)
+        elif scope['type'] == 'websocket':
+            await self.handle_websocket(scope, receive, send)
+        else:
+            # 不支持的连接类型（以后的协议扩展）直接结束，不抛出异常，由服务器关闭连接
+            return
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle_websocket(self, scope, receive, send):
+        handler = self.websocket_routes.get(scope['path'])
+        if handler is None:
+            await receive()
+            await send({'type': 'websocket.close', 'code': 1000})
+            return
+        await handler(scope, receive, send, self.executor)
+
+    async def handle_http(self, scope, receive, send):
+        handler = self.http_routes.get(scope['path'])
+        if handler is not None and scope['method'] == 'GET':
+            await handler(scope, receive, send, self.executor)
+            return
+        loop = asyncio.get_event_loop()
+        body = RequestBody(loop, receive, has_request_body(scope))
+        environ = build_environ(scope, body)
+        disconnected = asyncio.Event()
+
+        # 请求体读完之后继续监听客户端断开
+        async def watch_disconnect():
+            await body.complete.wait()
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    disconnected.set()
+                    return
+
+        watcher = loop.create_task(watch_disconnect())
+        try:
+            await loop.run_in_executor(self.executor, self.run_wsgi, loop, environ, send, disconnected)
+        finally:
+            watcher.cancel()
+
+    # 在工作线程中执行WSGI应用，并把响应按块交给事件循环发送
+    def run_wsgi(self, loop, environ, send, disconnected):
+        state = {'status': None, 'headers': None, 'started': False}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and state['started']:
+                raise exc_info[1].with_traceback(exc_info[2])
+            state['status'] = int(status.split(' ', 1)[0])
+            state['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                for name, value in headers]
+
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def send_start():
+            if not state['started']:
+                state['started'] = True
+                send_sync({'type': 'http.response.start', 'status': state['status'],
+                           'headers': state['headers']})
+
+        iterable = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in iterable:
+                if disconnected.is_set():
+                    return
+                if chunk:
+                    send_start()
+                    send_sync({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            send_start()
+            send_sync({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+
+# uvicorn --factory app.asgi:create_asgi_app --host 0.0.0.0 --port 31001
+def create_asgi_app(max_workers=ASGI_MAX_WORKERS):
+    from app import app
+    from app.routes.event_routes import WEBSOCKET_ROUTES, HTTP_ROUTES
+    return AsgiApp(app, max_workers, WEBSOCKET_ROUTES, HTTP_ROUTES)
@@ -1,49 +1,213 @@
 import json
-import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import docker
 from flask import jsonify, send_file, Response
 from tempfile import NamedTemporaryFile
 
+from app.docker.docker_state import DockerStateStore
+from app.docker.stats_sampler import StatsSampler
+from app.docker.image_gc import ImageGraph, GC_MODES
+from app.docker.image_export import ImageExportCache, compress_chunks, negotiate_compression, \
+    supported_compressions, EXTENSIONS, MIMETYPES
+from app.json_response import is_shaped
+from app.log_stream import log_response
+from app.metrics import cache_lookup, instrument_docker_api
+
+# 批量操作的默认并发数和上限
+BULK_CONCURRENCY = 16
+BULK_MAX_CONCURRENCY = 64
+# 批量stop/restart的默认等待时间（秒），与docker默认值一致
+BULK_STOP_TIMEOUT = 10
+# 上传镜像时每次从请求体读取并转发给docker的块大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# 上传进度的汇报间隔（秒）
+UPLOAD_PROGRESS_INTERVAL = 1
+# 每个docker主机的连接池大小，即同时向一个docker发起的最大请求数（docker-py默认只有10）
+POOL_MAXSIZE = 32
+# 请求docker的超时时间（秒），与docker-py默认值一致
+DOCKER_TIMEOUT = 60
+# 列表接口补全新容器的字段时同时发起的inspect数
+INSPECT_CONCURRENCY = 8
+
 
 class DockerClient:
-    def __init__(self):
-        self.client = docker.from_env()
+    # base_url为空时使用本机的DOCKER_HOST环境变量或unix socket
+    # base_url: unix:///var/run/docker.sock、tcp://host:2376（配合tls）、ssh://user@host
+    # tls: docker.tls.TLSConfig，ssh主机默认使用系统的ssh命令连接
+    def __init__(self, host='local', base_url=None, tls=False, max_pool_size=POOL_MAXSIZE, timeout=DOCKER_TIMEOUT,
+                 use_ssh_client=False):
+        self.host = host
+        if base_url is None:
+            self.client = docker.from_env(max_pool_size=max_pool_size, timeout=timeout)
+        else:
+            self.client = docker.DockerClient(base_url=base_url, tls=tls, max_pool_size=max_pool_size,
+                                              timeout=timeout, use_ssh_client=use_ssh_client)
+        instrument_docker_api(self.client.api, host)
+        self._state = None
+        self._state_lock = threading.Lock()
+        self._stats_sampler = None
+        self.export_cache = ImageExportCache()
+        # 容器id -> (Config.Cmd, Created, HostConfig.PortBindings)，见_inspect_fields
+        self._container_fields = {}
+        self._container_fields_lock = threading.Lock()
+
+    # 基于docker事件维护的containers/images/networks状态，首次使用时启动订阅
+    def state(self):
+        with self._state_lock:
+            if self._state is None:
+                self._state = DockerStateStore(self.client.api)
+                self._state.start()
+            return self._state
+
+    # 状态缓存可用时直接读取，否则直接查询docker
+    def _summaries(self):
+        state = self.state()
+        live = state.is_live()
+        cache_lookup('docker_state', live)
+        if live:
+            return state.snapshot()
+        return None
+
+    @staticmethod
+    def _image_tags(images):
+        return {image['Id']: [tag for tag in image.get('RepoTags') or [] if tag != '<none>:<none>']
+                for image in images}
+
+    @staticmethod
+    def _state_response(data, etag):
+        response = jsonify(data)
+        # 按 ?fields=/?compact= 裁剪过的内容与状态版本不再一一对应，不使用版本号作为ETag
+        if etag and not is_shaped():
+            response.headers['ETag'] = etag
+        return response
+
+    # 列表接口中容器的command（Config.Cmd列表）、created（docker的RFC 3339时间）和ports（HostConfig.PortBindings）
+    # containers/json中没有这些字段，它们在容器创建后不再变化，每个容器只inspect一次并按id缓存
+    # 缓存为空时（进程启动后的第一次列表）需要对每个容器inspect一次（并发INSPECT_CONCURRENCY个），
+    # 之后只有新出现的容器需要inspect，订阅了变化时新容器在收到事件时就已经inspect（见watch_changes）
+    # 返回 {id: (cmd, created, port_bindings)}，已经不存在的容器不在其中
+    def _inspect_fields(self, container_ids):
+        with self._container_fields_lock:
+            fields = {container_id: self._container_fields[container_id]
+                      for container_id in container_ids if container_id in self._container_fields}
+        missing = [container_id for container_id in container_ids if container_id not in fields]
+
+        def inspect(container_id):
+            try:
+                attrs = self.client.api.inspect_container(container_id)
+            except docker.errors.NotFound:
+                return None
+            return attrs['Config']['Cmd'], attrs['Created'], attrs['HostConfig']['PortBindings']
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(len(missing), INSPECT_CONCURRENCY)) as executor:
+                results = zip(missing, executor.map(inspect, missing))
+                inspected = {container_id: result for container_id, result in results if result is not None}
+            fields.update(inspected)
+            with self._container_fields_lock:
+                self._container_fields.update(inspected)
+        return fields
+
+    # 去掉已经不存在的容器的缓存
+    def _prune_container_fields(self, container_ids):
+        live = set(container_ids)
+        with self._container_fields_lock:
+            for container_id in [container_id for container_id in self._container_fields if container_id not in live]:
+                del self._container_fields[container_id]
+
+    # 列表接口中的一个容器，tags为容器所用镜像的tag，fields为_inspect_fields的结果
+    @staticmethod
+    def _container_item(container, tags, fields):
+        command, created, ports = fields
+        return {
+            'id': container['Id'],
+            'name': container['Names'][0].lstrip('/') if container['Names'] else '',
+            'image': tags[0] if tags else '<none>',
+            'command': command,
+            'created': created,
+            'status': container['State'],
+            'ports': ports
+        }
+
+    # 列表接口中一个镜像对应的行，每个tag一行
+    @staticmethod
+    def _image_rows(image, tags):
+        rows = []
+        for tag in tags or ['<none>']:  # 如果没有标签，则设置为 '<none>'
+            rows.append({
+                'repository': tag.split(':')[0],
+                'tag': tag.split(':')[1] if len(tag.split(':')) > 1 else '<none>',
+                'image_id': image['Id'],
+                'created': image['Created'],
+                'size': image['Size']
+            })
+        return rows
 
     # 所有的containers
+    # 优先从事件维护的状态缓存读取；否则一次containers/json + 一次images/json，在内存中关联镜像tag
     def list_containers(self):
-        containers = self.client.containers.list(all=True)
-        container_list = []
-        for container in containers:
-            image_tag = container.image.tags[0] if container.image.tags else '<none>'
-            container_list.append({
-                'id': container.id,
-                'name': container.name,
-                'image': image_tag,
-                'command': container.attrs['Config']['Cmd'],
-                'created': container.attrs['Created'],
-                'status': container.status,
-                'ports': container.attrs['HostConfig']['PortBindings']
-            })
-        return jsonify(container_list)
+        return self._state_response(*self.container_items())
+
+    # containers列表数据，返回 (container_list, etag)
+    def container_items(self):
+        summaries = self._summaries()
+        if summaries:
+            containers, images, _, etag = summaries
+        else:
+            containers, images, etag = self.client.api.containers(all=True), self.client.api.images(), None
+        image_tags = self._image_tags(images)
+        container_ids = [container['Id'] for container in containers]
+        fields = self._inspect_fields(container_ids)
+        self._prune_container_fields(container_ids)
+        container_list = [self._container_item(container, image_tags.get(container['ImageID']), fields[container['Id']])
+                          for container in containers if container['Id'] in fields]
+        return container_list, etag
 
     # 所有的images
     def list_images(self):
-        images = self.client.images.list()
+        return self._state_response(*self.image_items())
+
+    # images列表数据，返回 (image_list, etag)
+    def image_items(self):
+        summaries = self._summaries()
+        if summaries:
+            _, images, _, etag = summaries
+        else:
+            images, etag = self.client.api.images(), None
+        image_tags = self._image_tags(images)
         image_list = []
         for image in images:
-            tags = image.tags
-            if not tags:  # 如果没有标签，则设置为 '<none>'
-                tags = ['<none>']
-            for tag in tags:
-                image_list.append({
-                    'repository': tag.split(':')[0],
-                    'tag': tag.split(':')[1] if len(tag.split(':')) > 1 else '<none>',
-                    'image_id': image.id,
-                    'created': image.attrs['Created'],
-                    'size': image.attrs['Size']
-                })
-        return jsonify(image_list)
+            image_list.extend(self._image_rows(image, image_tags[image['Id']]))
+        return image_list, etag
+
+    # 订阅containers/images的变化，callback(event_type, key, obj)，obj与列表接口中的数据格式相同
+    # （images为该镜像的所有行），所有订阅者共用状态缓存的一个docker事件流；全量同步后通知RESYNC
+    def watch_changes(self, kind, callback):
+        state = self.state()
+
+        def listener(changed_kind, event_type, obj):
+            if changed_kind != kind:
+                return
+            if event_type == 'RESYNC':
+                callback(event_type, None, None)
+            elif kind == 'containers':
+                image = state.image(obj['ImageID'])
+                tags = self._image_tags([image])[image['Id']] if image else None
+                if event_type == 'DELETED':
+                    with self._container_fields_lock:
+                        fields = self._container_fields.pop(obj['Id'], (None, None, None))
+                else:
+                    fields = self._inspect_fields([obj['Id']]).get(obj['Id'])
+                    if fields is None:
+                        # 容器已经被删除，之后会收到DELETED
+                        return
+                callback(event_type, obj['Id'], self._container_item(obj, tags, fields))
+            else:
+                callback(event_type, obj['Id'], self._image_rows(obj, self._image_tags([obj])[obj['Id']]))
+        state.add_listener(listener)
 
     # 启动指定容器
     def start_container(self, container_id):
@@ -73,22 +237,153 @@ class DockerClient:
         container = self.client.containers.get(container_id)
         return jsonify(container.stats(stream=False))
 
+    # 运行中的容器id，状态缓存可用时不再查询docker
+    def _running_container_ids(self):
+        state = self.state()
+        containers = state.containers() if state.is_live() else self.client.api.containers()
+        return [container['Id'] for container in containers if container['State'] == 'running']
+
+    # 后台stats采样器，首次使用时启动
+    def stats_sampler(self):
+        with self._state_lock:
+            if self._stats_sampler is None:
+                self._stats_sampler = StatsSampler(self.client.api, self._running_container_ids)
+                self._stats_sampler.start()
+            return self._stats_sampler
+
+    # 所有运行中容器的最新stats样本
+    def list_container_stats(self):
+        return jsonify(self.stats_sampler().latest())
+
+    # 指定容器最近window秒的stats样本，不指定window时返回缓冲区中的全部样本
+    def get_container_stats(self, container_id, window=None):
+        sampler = self.stats_sampler()
+        samples = sampler.window(container_id, window)
+        if samples is None:
+            # 允许使用容器名或短id查询
+            try:
+                container_id = self.client.api.inspect_container(container_id)['Id']
+            except docker.errors.NotFound:
+                return jsonify({'error': 'Container not found'}), 404
+            samples = sampler.window(container_id, window)
+        if samples is None:
+            return jsonify({'error': 'Container is not running or not sampled yet'}), 404
+        return jsonify({'id': container_id, 'samples': samples})
+
     # 查看容器日志接口
     def get_container_logs(self, container_id):
         container = self.client.containers.get(container_id)
         strLog = str(container.logs(), encoding='utf-8')
         return strLog
 
+    # 流式查看容器日志，逐块转发docker返回的日志流
+    def stream_container_logs(self, container_id, tail_lines=None, since_seconds=None, timestamps=False,
+                              follow=False, fmt='sse'):
+        try:
+            container = self.client.containers.get(container_id)
+            since = int(time.time()) - since_seconds if since_seconds else None
+            logs = container.logs(stream=True, follow=follow, timestamps=timestamps,
+                                  tail=tail_lines if tail_lines is not None else 'all', since=since)
+        except docker.errors.NotFound:
+            return jsonify({'error': 'Container not found'}), 404
+        except docker.errors.APIError as e:
+            return jsonify({'error': str(e)}), 500
+        return log_response(logs, fmt, logs.close)
+
     # 删除容器接口
     def delete_container(self, container_id):
         container = self.client.containers.get(container_id)
         container.remove()
         return jsonify({'message': 'Container deleted successfully'})
 
+    # 根据label选择容器，labels如 {"app": "web"} 或 ["app=web", "tier"]
+    def _containers_by_labels(self, labels):
+        if isinstance(labels, dict):
+            labels = [f"{key}={value}" for key, value in labels.items()]
+        return [container['Id'] for container in self.client.api.containers(all=True, filters={'label': labels})]
+
+    # 对单个容器执行操作，每个容器只调用一次docker api
+    def _container_action(self, action, container_id, timeout, force):
+        api = self.client.api
+        started = time.time()
+        try:
+            if action == 'start':
+                api.start(container_id)
+            elif action == 'stop':
+                api.stop(container_id, timeout=timeout)
+            elif action == 'restart':
+                api.restart(container_id, timeout=timeout)
+            else:
+                api.remove_container(container_id, force=force)
+            result = {'id': container_id, 'action': action, 'status': 'success'}
+        except docker.errors.NotFound:
+            result = {'id': container_id, 'action': action, 'status': 'error', 'error': 'Container not found'}
+        except docker.errors.APIError as e:
+            result = {'id': container_id, 'action': action, 'status': 'error', 'error': str(e)}
+        result['duration'] = round(time.time() - started, 3)
+        return result
+
+    # 批量启动/停止/重启/删除容器，在有上限的线程池中并发执行
+    # data: {"action": "stop", "ids": [...] 或 "labels": {...}, "concurrency": 16, "timeout": 10,
+    #        "force": false, "stream": false}
+    # stream为true时按完成顺序逐条返回NDJSON，否则全部完成后一次返回
+    def bulk_containers(self, data):
+        action = data.get('action')
+        if action not in ('start', 'stop', 'restart', 'delete'):
+            return jsonify({'error': 'action must be one of start, stop, restart, delete'}), 400
+        if data.get('ids'):
+            ids = data['ids']
+            if not isinstance(ids, list) or not all(isinstance(container_id, str) for container_id in ids):
+                return jsonify({'error': 'ids must be a list of container ids'}), 400
+            container_ids = list(dict.fromkeys(ids))
+        elif data.get('labels'):
+            try:
+                container_ids = self._containers_by_labels(data['labels'])
+            except docker.errors.APIError as e:
+                return jsonify({'error': str(e)}), 500
+        else:
+            return jsonify({'error': 'ids or labels is required'}), 400
+        try:
+            concurrency = min(max(int(data.get('concurrency', BULK_CONCURRENCY)), 1), BULK_MAX_CONCURRENCY)
+            timeout = int(data.get('timeout', BULK_STOP_TIMEOUT))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'concurrency and timeout must be integers'}), 400
+        force = bool(data.get('force', False))
+
+        executor = ThreadPoolExecutor(max_workers=min(concurrency, len(container_ids) or 1))
+        futures = [executor.submit(self._container_action, action, container_id, timeout, force)
+                   for container_id in container_ids]
+
+        # 客户端断开或出错时取消还没开始的操作，正在执行的操作执行完为止
+        def shutdown():
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+        if data.get('stream'):
+            def generate():
+                try:
+                    for future in as_completed(futures):
+                        yield json.dumps(future.result()) + '\n'
+                finally:
+                    shutdown()
+
+            return Response(generate(), mimetype='application/x-ndjson')
+        try:
+            results = [future.result() for future in futures]
+        finally:
+            shutdown()
+        failed = sum(1 for result in results if result['status'] != 'success')
+        return jsonify({'action': action, 'total': len(results), 'failed': failed, 'results': results})
+
     # 查看docker网络接口
     def list_networks(self):
-        networks = self.client.networks.list()
-        return jsonify([network.attrs for network in networks])
+        summaries = self._summaries()
+        if summaries:
+            _, _, networks, etag = summaries
+        else:
+            networks, etag = self.client.api.networks(), None
+        return self._state_response(networks, etag)
 
     # 增加镜像
     def add_images(self, data):
@@ -98,31 +393,96 @@ class DockerClient:
         tar_file = data.files['tar_file']
         container_name = data.form['container_name']
 
-        tar_path = os.path.join('./', tar_file.filename)
-        tar_file.save(tar_path)
-
         try:
-            with open(tar_path, 'rb') as f:
-                self.client.images.load(f)
-            os.remove(tar_path)
+            # 直接把上传的文件流分块转发给docker，不在工作目录中另存一份
+            self.client.images.load(self._read_chunks(tar_file.stream))
             # self.client.containers.run(tar_file.filename.split('.')[0], name=container_name, detach=True)
             return jsonify({'message': 'Container added successfully'}), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
-    def download_image(self, image_id, tar_name):
+    # 按固定大小分块读取流，counter记录已读取的字节数
+    @staticmethod
+    def _read_chunks(stream, counter=None, chunk_size=UPLOAD_CHUNK_SIZE):
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            if counter is not None:
+                counter['bytes'] += len(chunk)
+            yield chunk
+
+    # 流式加载镜像：请求体（支持chunked传输）按块直接转发给docker的images/load，内存和磁盘占用与镜像大小无关
+    # 以NDJSON返回进度：上传期间定时返回已上传字节数，之后返回docker的加载输出和最终结果
+    def load_image_stream(self, stream):
+        counter = {'bytes': 0}
+        result = {'output': []}
+
+        def load():
+            try:
+                for message in self.client.api.load_image(self._read_chunks(stream, counter)):
+                    result['output'].append(message)
+            except Exception as e:
+                result['error'] = str(e)
+
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+
+        def generate():
+            while thread.is_alive():
+                thread.join(UPLOAD_PROGRESS_INTERVAL)
+                yield json.dumps({'status': 'uploading', 'bytes': counter['bytes']}) + '\n'
+            images = []
+            for message in result['output']:
+                if 'error' in message:
+                    result.setdefault('error', message['error'])
+                elif message.get('stream', '').startswith('Loaded image'):
+                    images.append(message['stream'].split(':', 1)[1].strip())
+                yield json.dumps(message) + '\n'
+            if 'error' in result:
+                yield json.dumps({'status': 'error', 'bytes': counter['bytes'], 'error': result['error']}) + '\n'
+            else:
+                yield json.dumps({'status': 'success', 'bytes': counter['bytes'], 'images': images}) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    # 下载镜像
+    # compression: 指定gzip/zstd时返回压缩文件（.tar.gz/.tar.zst）；
+    # 不指定时按Accept-Encoding协商，以Content-Encoding返回，文件仍是.tar
+    # chunk_size: 从docker读取导出流的块大小
+    # 导出结果按镜像digest缓存在磁盘上，再次下载时直接返回缓存文件，并支持Range断点续传
+    def download_image(self, image_id, tar_name, compression=None, accept_encoding=None, chunk_size=None):
         if not image_id:
             return jsonify({'error': 'Image name is required'}), 400
+        if compression == 'none':
+            compression = None
+        if compression is not None and compression not in supported_compressions():
+            return jsonify({'error': f'Unsupported compression: {compression}'}), 400
+        content_encoding = None
+        if compression is None:
+            content_encoding = negotiate_compression(accept_encoding)
+        encoding = compression or content_encoding
+        filename = f"{tar_name or 'image'}{EXTENSIONS[compression]}"
+        mimetype = MIMETYPES[compression]
         try:
             image = self.client.images.get(image_id)
-            image_tar = image.save(named=True)
-
-            def generate():
-                for chunk in image_tar:
-                    yield chunk
-
-            response = Response(generate(), mimetype='application/x-tar')
-            response.headers.set('Content-Disposition', 'attachment', filename=f"{tar_name}.tar")
+            key = self.export_cache.key(image)
+            cached_path = self.export_cache.lookup(key, encoding)
+            cache_lookup('image_export', cached_path is not None)
+            if cached_path:
+                response = send_file(cached_path, mimetype=mimetype, as_attachment=True,
+                                     download_name=filename, conditional=True)
+            else:
+                if chunk_size:
+                    image_tar = image.save(chunk_size=chunk_size, named=True)
+                else:
+                    image_tar = image.save(named=True)
+                chunks = self.export_cache.tee(compress_chunks(image_tar, encoding), key, encoding)
+                response = Response(chunks, mimetype=mimetype)
+                response.headers.set('Content-Disposition', 'attachment', filename=filename)
+            if content_encoding:
+                response.headers['Content-Encoding'] = content_encoding
+            response.headers['Vary'] = 'Accept-Encoding'
             return response
         except docker.errors.ImageNotFound:
             return jsonify({"error": "Image not found"}), 404
@@ -132,18 +492,90 @@ class DockerClient:
     # 删除镜像
     def delete_image(self, image_id):
         try:
-            # 删除镜像之前需要先删除所有使用该镜像的容器
-            for container in self.client.containers.list(all=True):
-                if container.image.id == image_id:
-                    container.remove(force=True)
+            full_id = self.client.api.inspect_image(image_id)['Id']
+            # 删除镜像之前需要先删除所有使用该镜像的容器，一次查询找出这些容器，并发删除
+            container_ids = [container['Id'] for container in
+                             self.client.api.containers(all=True, filters={'ancestor': full_id})
+                             if container['ImageID'] == full_id]
+            with ThreadPoolExecutor(max_workers=min(len(container_ids), BULK_CONCURRENCY) or 1) as executor:
+                for result in executor.map(lambda container_id: self._remove_object('container', container_id),
+                                           container_ids):
+                    if result['status'] != 'success':
+                        return jsonify({'error': result['error']}), 500
             # 删除镜像
-            self.client.images.remove(image_id)
+            self.client.api.remove_image(image_id)
             return jsonify({'message': 'Image deleted successfully'})
         except docker.errors.ImageNotFound:
             return jsonify({'error': 'Image not found'}), 404
         except docker.errors.APIError as e:
             return jsonify({'error': str(e)}), 500
 
+    # 一次查询镜像和容器，构建镜像引用关系
+    # APIClient.images()不支持shared-size参数，直接请求 /images/json，带上shared-size=1以得到各镜像的SharedSize
+    # （不支持该参数的docker版本忽略它，SharedSize仍为-1，可回收空间按上限返回）
+    def image_graph(self):
+        api = self.client.api
+        images = api._result(api._get(api._url('/images/json'), params={'all': 1, 'shared-size': 1}), True)
+        return ImageGraph(images, api.containers(all=True))
+
+    # 删除单个容器或镜像，每个对象只调用一次docker api
+    def _remove_object(self, kind, object_id, force=False):
+        api = self.client.api
+        try:
+            if kind == 'container':
+                api.remove_container(object_id, force=True)
+            else:
+                api.remove_image(object_id, force=force)
+            return {'type': kind, 'id': object_id, 'status': 'success'}
+        except docker.errors.NotFound:
+            return {'type': kind, 'id': object_id, 'status': 'success', 'error': 'Already removed'}
+        except docker.errors.APIError as e:
+            return {'type': kind, 'id': object_id, 'status': 'error', 'error': str(e)}
+
+    # 按计划删除：先并发删除容器，再按层级（先子镜像后父镜像）逐批并发删除镜像
+    def _execute_gc_plan(self, plan, concurrency):
+        results = []
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results.extend(executor.map(lambda container: self._remove_object('container', container['id']),
+                                        plan['containers']))
+            tiers = {}
+            for image in plan['images']:
+                tiers.setdefault(image['order'], []).append(image)
+            for order in sorted(tiers):
+                # 有多个tag的镜像需要force才能按id删除
+                results.extend(executor.map(
+                    lambda image: self._remove_object('image', image['id'], force=len(image['tags']) > 1),
+                    tiers[order]))
+        return results
+
+    # 镜像清理
+    # data: {"mode": "dangling"|"unused", "older_than": 86400, "include_stopped": false,
+    #        "dry_run": true, "concurrency": 16}
+    # dry_run（默认）只返回计划：要删除的镜像、容器和可回收的空间；否则按计划执行并返回每个对象的结果
+    # 无法得到共享层大小时（见image_graph）reclaimable_upper_bound为true，可回收空间是上限
+    def image_gc(self, data):
+        mode = data.get('mode', 'dangling')
+        if mode not in GC_MODES:
+            return jsonify({'error': 'mode must be one of dangling, unused'}), 400
+        try:
+            older_than = int(data['older_than']) if data.get('older_than') is not None else None
+            concurrency = min(max(int(data.get('concurrency', BULK_CONCURRENCY)), 1), BULK_MAX_CONCURRENCY)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'older_than and concurrency must be integers'}), 400
+        try:
+            plan = self.image_graph().plan(mode, older_than, bool(data.get('include_stopped', False)))
+        except docker.errors.APIError as e:
+            return jsonify({'error': str(e)}), 500
+        plan['dry_run'] = data.get('dry_run', True) is not False
+        if plan['dry_run']:
+            return jsonify(plan)
+        results = self._execute_gc_plan(plan, concurrency)
+        removed = {result['id'] for result in results if result['type'] == 'image' and result['status'] == 'success'}
+        plan['results'] = results
+        plan['failed'] = sum(1 for result in results if result['status'] != 'success')
+        plan['reclaimed_bytes'] = sum(image['reclaimable'] for image in plan['images'] if image['id'] in removed)
+        return jsonify(plan)
+
     def create_container(self, container_info):
         data = container_info
         container_name = data.get('name')
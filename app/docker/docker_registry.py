@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+DOCKER_HOSTS_FILE = "app/config/docker_hosts.yaml"
+# 默认主机，即本机的docker
+DEFAULT_HOST = 'local'
+# 并发查询多个主机时的最大线程数
+FANOUT_MAX_WORKERS = 16
+# 连接主机失败后，这段时间（秒）内直接返回上次的错误，不再重新连接
+CONNECT_RETRY_INTERVAL = 10
+
+
+class DockerHostRegistry:
+    # 配置文件中每个host对应一个docker endpoint，每个endpoint一个长期复用的DockerClient（带连接池）
+    # 客户端在第一次使用时创建（docker包也在那时才导入）；配置文件不存在时只有本机一个主机
+    def __init__(self, config_file=DOCKER_HOSTS_FILE):
+        self.hosts = {DEFAULT_HOST: {}}
+        if os.path.exists(config_file):
+            with open(config_file) as f:
+                self.hosts.update((yaml.safe_load(f) or {}).get('hosts') or {})
+        self._clients = {}
+        # 每个主机一把锁，创建客户端（docker-py会请求一次版本号）时不阻塞其他主机
+        self._host_locks = {}
+        # 连接失败的主机：{host: (重试时间, 异常)}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        return list(self.hosts)
+
+    @staticmethod
+    def _tls_config(tls):
+        if not tls:
+            return False
+        from docker.tls import TLSConfig
+        client_cert = (tls['cert'], tls['key']) if tls.get('cert') else None
+        return TLSConfig(client_cert=client_cert, ca_cert=tls.get('ca'), verify=tls.get('verify', True))
+
+    def _create_client(self, host):
+        from app.docker.docker_client import DockerClient, POOL_MAXSIZE, DOCKER_TIMEOUT
+        options = self.hosts[host]
+        base_url = options.get('base_url')
+        # ssh主机默认使用系统的ssh命令，不依赖paramiko
+        is_ssh = bool(base_url and base_url.startswith('ssh://'))
+        return DockerClient(host=host,
+                            base_url=base_url,
+                            tls=self._tls_config(options.get('tls')),
+                            max_pool_size=options.get('pool_size', POOL_MAXSIZE),
+                            timeout=options.get('timeout', DOCKER_TIMEOUT),
+                            use_ssh_client=options.get('use_ssh_client', is_ssh))
+
+    def _host_lock(self, host):
+        with self._lock:
+            return self._host_locks.setdefault(host, threading.Lock())
+
+    # 获取指定主机的客户端，host为空时使用本机，主机不存在时返回None
+    # 连接失败时抛出DockerException，CONNECT_RETRY_INTERVAL秒内再次获取直接抛出同一个错误
+    def get(self, host=None):
+        host = host or DEFAULT_HOST
+        if host not in self.hosts:
+            return None
+        docker_client = self._clients.get(host)
+        if docker_client is not None:
+            return docker_client
+        with self._host_lock(host):
+            docker_client = self._clients.get(host)
+            if docker_client is None:
+                failure = self._failures.get(host)
+                if failure is not None and time.monotonic() < failure[0]:
+                    raise failure[1]
+                try:
+                    docker_client = self._create_client(host)
+                except Exception as e:
+                    self._failures[host] = (time.monotonic() + CONNECT_RETRY_INTERVAL, e)
+                    raise
+                self._failures.pop(host, None)
+                self._clients[host] = docker_client
+            return docker_client
+
+    # 在所有主机上并发执行func(docker_client)，返回 {host: (result, error, latency)}
+    def fan_out(self, func, hosts=None):
+        hosts = hosts or self.names()
+
+        def call(host):
+            started = time.time()
+            try:
+                return host, func(self.get(host)), None, time.time() - started
+            except Exception as e:
+                return host, None, str(e), time.time() - started
+
+        with ThreadPoolExecutor(max_workers=min(len(hosts), FANOUT_MAX_WORKERS) or 1) as executor:
+            return {host: (result, error, latency) for host, result, error, latency in executor.map(call, hosts)}
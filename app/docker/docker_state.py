@@ -0,0 +1,263 @@
+import re
+import threading
+import uuid
+
+# 事件触发的刷新在这段时间（秒）内合并：同一时间窗口内变化的容器/网络一次查询，镜像列表只重新获取一次
+REFRESH_DEBOUNCE = 0.2
+# 不改变容器列表信息的事件
+IGNORED_CONTAINER_ACTIONS = ('exec_', 'top', 'attach', 'resize', 'export', 'commit', 'copy', 'archive-path',
+                             'extract-to-dir')
+# 容器列表Status末尾的健康状态，如 "Up 2 hours (healthy)"、"Up 1 second (health: starting)"
+_HEALTH_SUFFIX = re.compile(r'\s*\((?:healthy|unhealthy|health: starting)\)$')
+
+
+class DockerStateStore:
+    # 通过订阅docker的/events，在进程内维护containers、images、networks的最新状态
+    # api: docker.APIClient（即 docker.from_env().api），测试时可以传入假的api和事件流
+    # 每次重连都会先订阅事件再全量同步一次，version在每次变化后递增
+    # 事件只标记需要刷新的对象，由另一个线程每debounce秒合并刷新一次，事件密集时不会逐条查询docker
+    def __init__(self, api, retry_interval=1, debounce=REFRESH_DEBOUNCE):
+        self.api = api
+        self.retry_interval = retry_interval
+        self.debounce = debounce
+        self.version = 0
+        self._instance = uuid.uuid4().hex[:8]
+        self._containers = {}
+        self._images = {}
+        self._networks = {}
+        self._live = False
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._synced = threading.Event()
+        self._events = None
+        self._thread = None
+        self._flush_thread = None
+        self._listeners = []
+        self._pending = {'containers': set(), 'networks': set()}
+        self._pending_images = False
+        self._pending_event = threading.Event()
+        # 正在刷新（已经查询、还没有写入缓存）的对象，这期间直接修改缓存的事件需要再刷新一次，否则会被查询结果覆盖
+        self._refreshing = {'containers': set(), 'networks': set()}
+
+    # 注册变化通知：listener(kind, event_type, obj)，kind为containers/images/networks，
+    # event_type为ADDED/MODIFIED/DELETED，obj为docker返回的原始对象；全量同步后通知RESYNC（obj为None）
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _notify(self, kind, event_type, obj):
+        for listener in list(self._listeners):
+            try:
+                listener(kind, event_type, obj)
+            except Exception as e:
+                print(f"Docker state listener failed: {e}")
+
+    # 按id替换或删除一个对象并通知变化
+    def _replace(self, kind, object_id, obj):
+        with self._lock:
+            items = getattr(self, '_' + kind)
+            previous = items.pop(object_id, None)
+            if obj is not None:
+                items[object_id] = obj
+            self._bump()
+        if obj is not None:
+            self._notify(kind, 'MODIFIED' if previous is not None else 'ADDED', obj)
+        elif previous is not None:
+            self._notify(kind, 'DELETED', previous)
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flush_thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._pending_event.set()
+        if self._events is not None:
+            self._events.close()
+
+    # 事件订阅正常并且已经完成全量同步时，缓存的数据才可以直接使用
+    def is_live(self):
+        return self._live
+
+    def wait_for_sync(self, timeout=None):
+        return self._synced.wait(timeout)
+
+    def etag(self):
+        return f'"{self._instance}-{self.version}"'
+
+    def containers(self):
+        with self._lock:
+            return list(self._containers.values())
+
+    def images(self):
+        with self._lock:
+            return list(self._images.values())
+
+    def image(self, image_id):
+        with self._lock:
+            return self._images.get(image_id)
+
+    def networks(self):
+        with self._lock:
+            return list(self._networks.values())
+
+    # 同一版本下的containers、images、networks和etag
+    def snapshot(self):
+        with self._lock:
+            return self.containers(), self.images(), self.networks(), self.etag()
+
+    def _bump(self):
+        self.version += 1
+
+    # 全量同步，之前标记的刷新已经包含在内
+    def resync(self):
+        with self._lock:
+            self._pending = {'containers': set(), 'networks': set()}
+            self._pending_images = False
+        containers = {container['Id']: container for container in self.api.containers(all=True)}
+        images = {image['Id']: image for image in self.api.images()}
+        networks = {network['Id']: network for network in self.api.networks()}
+        with self._lock:
+            self._containers = containers
+            self._images = images
+            self._networks = networks
+            self._bump()
+        self._synced.set()
+        for kind in ('containers', 'images', 'networks'):
+            self._notify(kind, 'RESYNC', None)
+
+    # 标记需要刷新的对象，kind为images时刷新整个镜像列表
+    def _schedule(self, kind, object_id=None):
+        with self._lock:
+            if kind == 'images':
+                self._pending_images = True
+            else:
+                self._pending[kind].add(object_id)
+        self._pending_event.set()
+
+    # 刷新所有标记过的对象：容器和网络按id一次查询，镜像列表只获取一次
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {'containers': set(), 'networks': set()}
+            images, self._pending_images = self._pending_images, False
+        if pending['containers']:
+            self._refresh_containers(pending['containers'])
+        if images:
+            self._refresh_images()
+        if pending['networks']:
+            self._refresh_networks(pending['networks'])
+
+    def _flush_loop(self):
+        while not self._stopped.is_set():
+            self._pending_event.wait()
+            # 等待debounce秒，让这段时间内的事件合并到一次刷新中
+            if self._stopped.wait(self.debounce):
+                return
+            self._pending_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # docker不可用时事件订阅也会断开，重连后全量同步
+                print(f"Docker state refresh failed: {e}")
+
+    def _refresh_containers(self, container_ids):
+        with self._lock:
+            self._refreshing['containers'] = container_ids
+        try:
+            found = {container['Id']: container
+                     for container in self.api.containers(all=True, filters={'id': list(container_ids)})
+                     if container['Id'] in container_ids}
+            for container_id in container_ids:
+                self._replace('containers', container_id, found.get(container_id))
+        finally:
+            with self._lock:
+                self._refreshing['containers'] = set()
+
+    # 镜像事件（tag、untag、delete等）可能影响多个镜像，重新获取列表后对比出变化的镜像
+    def _refresh_images(self):
+        images = {image['Id']: image for image in self.api.images()}
+        with self._lock:
+            previous = self._images
+            self._images = images
+            self._bump()
+        for image_id, image in images.items():
+            if image_id not in previous:
+                self._notify('images', 'ADDED', image)
+            elif image != previous[image_id]:
+                self._notify('images', 'MODIFIED', image)
+        for image_id, image in previous.items():
+            if image_id not in images:
+                self._notify('images', 'DELETED', image)
+
+    def _refresh_networks(self, network_ids):
+        with self._lock:
+            self._refreshing['networks'] = network_ids
+        try:
+            found = {network['Id']: network for network in self.api.networks(ids=list(network_ids))
+                     if network['Id'] in network_ids}
+            for network_id in network_ids:
+                self._replace('networks', network_id, found.get(network_id))
+        finally:
+            with self._lock:
+                self._refreshing['networks'] = set()
+
+    # 事件直接修改缓存（删除、健康状态）
+    def _apply(self, kind, object_id, obj):
+        with self._lock:
+            if object_id in self._refreshing[kind]:
+                self._schedule(kind, object_id)
+        self._replace(kind, object_id, obj)
+
+    # health_status事件只改变列表中Status末尾的健康状态，直接在缓存中修改，不查询docker
+    def _patch_health(self, container_id, health):
+        with self._lock:
+            container = self._containers.get(container_id)
+            if container is None or health not in ('healthy', 'unhealthy', 'starting'):
+                self._schedule('containers', container_id)
+                return
+            label = 'health: starting' if health == 'starting' else health
+            status = _HEALTH_SUFFIX.sub('', container.get('Status') or '') + f' ({label})'
+            if status == container.get('Status'):
+                return
+        self._apply('containers', container_id, dict(container, Status=status))
+
+    # 处理一条docker事件：标记发生变化的对象等待合并刷新，删除事件直接从缓存移除
+    def handle_event(self, event):
+        event_type = event.get('Type')
+        action = event.get('Action', '')
+        object_id = event.get('Actor', {}).get('ID') or event.get('id')
+        if event_type == 'container':
+            if action.startswith(IGNORED_CONTAINER_ACTIONS):
+                return
+            if action.startswith('health_status'):
+                self._patch_health(object_id, action.partition(':')[2].strip())
+            elif action == 'destroy':
+                self._apply('containers', object_id, None)
+            else:
+                self._schedule('containers', object_id)
+        elif event_type == 'image':
+            self._schedule('images')
+        elif event_type == 'network':
+            if action == 'destroy':
+                self._apply('networks', object_id, None)
+            else:
+                self._schedule('networks', object_id)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                # 先订阅再同步，同步期间发生的事件会在之后被处理
+                self._events = self.api.events(decode=True,
+                                               filters={'type': ['container', 'image', 'network']})
+                self.resync()
+                self._live = True
+                for event in self._events:
+                    self.handle_event(event)
+            except Exception as e:
+                print(f"Docker events subscription failed: {e}")
+            finally:
+                self._live = False
+            self._stopped.wait(self.retry_interval)
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd为可选依赖，没有安装时只支持gzip
+    zstandard = None
+
+# 导出缓存目录和总大小上限，超过上限时删除最久未使用的文件
+EXPORT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'image-export-cache')
+EXPORT_CACHE_MAX_BYTES = 20 * 1024 * 1024 * 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+# 从docker读取导出流的块大小上限（chunk_size参数）
+MAX_EXPORT_CHUNK_SIZE = 64 * 1024 * 1024
+
+EXTENSIONS = {None: '.tar', 'gzip': '.tar.gz', 'zstd': '.tar.zst'}
+MIMETYPES = {None: 'application/x-tar', 'gzip': 'application/gzip', 'zstd': 'application/zstd'}
+
+
+# 校验chunk_size参数，不合法时抛出ValueError，未指定时返回None
+def export_chunk_size(value):
+    if value is None or value == '':
+        return None
+    try:
+        chunk_size = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid chunk_size: {value}")
+    if isinstance(value, bool) or not 0 < chunk_size <= MAX_EXPORT_CHUNK_SIZE:
+        raise ValueError(f"chunk_size must be between 1 and {MAX_EXPORT_CHUNK_SIZE}")
+    return chunk_size
+
+
+def supported_compressions():
+    return ('gzip', 'zstd') if zstandard is not None else ('gzip',)
+
+
+# 根据Accept-Encoding选择压缩方式，优先zstd
+def negotiate_compression(accept_encoding):
+    accepted = [item.split(';')[0].strip() for item in (accept_encoding or '').split(',')]
+    for compression in ('zstd', 'gzip'):
+        if compression in accepted and compression in supported_compressions():
+            return compression
+    return None
+
+
+# 对块流做实时压缩，compression为None时原样输出
+def compress_chunks(chunks, compression):
+    if compression is None:
+        yield from chunks
+        return
+    if compression == 'gzip':
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    else:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class ImageExportCache:
+    # 按镜像digest（以及导出的tag）缓存导出结果，命中后可以直接按文件返回并支持Range续传
+    def __init__(self, cache_dir=EXPORT_CACHE_DIR, max_bytes=EXPORT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 文件 -> 最近访问时间，用于淘汰；不修改文件的mtime，否则send_file生成的ETag/Last-Modified每次都会变化，
+        # 续传时带If-Range的请求得到的是完整的200而不是206
+        self._accessed = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # image.save(named=True)导出的manifest中包含tag，所以tag也是缓存key的一部分
+    @staticmethod
+    def key(image):
+        tags = ','.join(sorted(image.tags))
+        return image.id.split(':')[-1] + '-' + hashlib.sha256(tags.encode('utf-8')).hexdigest()[:12]
+
+    def path(self, key, compression):
+        return os.path.join(self.cache_dir, key + EXTENSIONS[compression])
+
+    def lookup(self, key, compression):
+        path = self.path(key, compression)
+        if os.path.exists(path):
+            self._accessed[path] = time.time()
+            return path
+        return None
+
+    # 边向客户端输出边写入缓存，全部输出成功后才放入缓存，客户端中途断开时丢弃临时文件
+    def tee(self, chunks, key, compression):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.partial')
+        completed = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            path = self.path(key, compression)
+            os.replace(tmp_path, path)
+            self._accessed[path] = time.time()
+            completed = True
+            self._evict()
+        finally:
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self):
+        with self._lock:
+            files = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.partial'):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                # 重启后还没有访问过的文件按mtime
+                files.append((self._accessed.get(path, stat.st_mtime), stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._accessed.pop(path, None)
+                total -= size
@@ -0,0 +1,139 @@
+import time
+from collections import defaultdict
+
+# 清理模式：dangling 只清理没有tag且没有子镜像的镜像；unused 清理没有被任何容器使用的镜像
+GC_MODES = ('dangling', 'unused')
+# 这些状态的容器认为镜像正在使用，其余状态（created、exited、dead）的容器在 include_stopped 时一并删除
+ACTIVE_STATES = ('running', 'paused', 'restarting')
+
+
+def image_tags(image):
+    return [tag for tag in image.get('RepoTags') or [] if tag != '<none>:<none>']
+
+
+class ImageGraph:
+    # 由一次 images/json?all=1 和一次 containers/json?all=1 构建的引用关系：镜像 -> 父镜像 -> 容器
+    def __init__(self, images, containers):
+        self.images = {image['Id']: image for image in images}
+        self.children = defaultdict(list)
+        for image in images:
+            parent = image.get('ParentId')
+            if parent in self.images:
+                self.children[parent].append(image['Id'])
+        self.containers = defaultdict(list)
+        for container in containers:
+            self.containers[container['ImageID']].append(container)
+        self._heights = {}
+
+    def tags(self, image_id):
+        return image_tags(self.images[image_id])
+
+    # 构建缓存的中间镜像：没有tag但有子镜像，删除子镜像时docker会一并清理
+    def is_intermediate(self, image_id):
+        return not self.tags(image_id) and bool(self.children[image_id])
+
+    def is_dangling(self, image_id):
+        return not self.tags(image_id) and not self.children[image_id]
+
+    def descendants(self, image_id):
+        stack = list(self.children[image_id])
+        while stack:
+            child = stack.pop()
+            yield child
+            stack.extend(self.children[child])
+
+    # 镜像到最深子镜像的层数，删除时按从小到大的顺序（先子后父）
+    def height(self, image_id):
+        if image_id not in self._heights:
+            stack = [(image_id, False)]
+            while stack:
+                current, expanded = stack.pop()
+                if current in self._heights:
+                    continue
+                children = self.children[current]
+                if expanded or not children:
+                    self._heights[current] = 1 + max((self._heights[child] for child in children), default=-1)
+                else:
+                    stack.append((current, True))
+                    stack.extend((child, False) for child in children if child not in self._heights)
+        return self._heights[image_id]
+
+    # 没有父镜像时按SharedSize减去共享的层，SharedSize只有查询时带 shared-size=1 才会返回（否则为-1），
+    # 这时无法知道共享的层，unique_size是上限
+    def is_upper_bound(self, image_id):
+        image = self.images[image_id]
+        return image.get('ParentId') not in self.images and image.get('SharedSize', -1) < 0
+
+    # 删除该镜像可以回收的空间（估算）：减去父镜像的大小和与其他镜像共享的层
+    def unique_size(self, image_id):
+        image = self.images[image_id]
+        parent = self.images.get(image.get('ParentId'))
+        if parent is not None:
+            return max(image['Size'] - parent['Size'], 0)
+        return image['Size'] - max(image.get('SharedSize', -1), 0)
+
+    def _containers_of(self, image_id, include_stopped):
+        containers = self.containers[image_id]
+        if include_stopped:
+            return [container for container in containers if container['State'] in ACTIVE_STATES], \
+                [container for container in containers if container['State'] not in ACTIVE_STATES]
+        return containers, []
+
+    # 生成清理计划
+    # mode: dangling/unused；older_than: 只清理创建时间早于该秒数之前的镜像
+    # include_stopped: 只被已停止容器使用的镜像也视为未使用，这些容器一并删除
+    # 有未被清理的子镜像的镜像无法删除，放入skipped
+    def plan(self, mode='dangling', older_than=None, include_stopped=False, now=None):
+        now = now or time.time()
+        selected = {}
+        for image_id, image in self.images.items():
+            if self.is_intermediate(image_id):
+                continue
+            if mode == 'dangling' and not self.is_dangling(image_id):
+                continue
+            if older_than is not None and image['Created'] > now - older_than:
+                continue
+            active, stopped = self._containers_of(image_id, include_stopped)
+            if active:
+                continue
+            selected[image_id] = stopped
+
+        skipped = []
+        for image_id in list(selected):
+            kept = [child for child in self.descendants(image_id)
+                    if child not in selected and not self.is_intermediate(child)]
+            if kept:
+                skipped.append({'id': image_id, 'tags': self.tags(image_id),
+                                'reason': f'{len(kept)} dependent child image(s) are kept'})
+                del selected[image_id]
+
+        images = []
+        containers = []
+        for image_id in sorted(selected, key=lambda image_id: (self.height(image_id), image_id)):
+            image = self.images[image_id]
+            images.append({
+                'id': image_id,
+                'tags': self.tags(image_id),
+                'created': image['Created'],
+                'size': image['Size'],
+                'reclaimable': self.unique_size(image_id),
+                'reclaimable_upper_bound': self.is_upper_bound(image_id),
+                'order': self.height(image_id),
+                'containers': [container['Id'] for container in selected[image_id]]
+            })
+            containers.extend({
+                'id': container['Id'],
+                'name': container['Names'][0].lstrip('/') if container.get('Names') else '',
+                'image': image_id,
+                'status': container['State']
+            } for container in selected[image_id])
+        return {
+            'mode': mode,
+            'older_than': older_than,
+            'include_stopped': include_stopped,
+            'images': images,
+            'containers': containers,
+            'skipped': skipped,
+            'reclaimable_bytes': sum(image['reclaimable'] for image in images),
+            'reclaimable_upper_bound': any(image['reclaimable_upper_bound'] for image in images)
+        }
@@ -0,0 +1,172 @@
+import threading
+import time
+from array import array
+
+# 每个容器保留的样本数，docker的stats流大约每秒一个样本，即保留最近10分钟
+SAMPLE_CAPACITY = 600
+# 对比运行中的容器与已有订阅的间隔（秒）
+RECONCILE_INTERVAL = 5
+
+FIELDS = ('timestamp', 'cpu_percent', 'memory_usage', 'memory_limit', 'memory_percent',
+          'net_rx_rate', 'net_tx_rate', 'block_read_rate', 'block_write_rate')
+
+
+class RingBuffer:
+    # 定长环形缓冲区，每个字段一个array('d')，写满后覆盖最旧的样本
+    def __init__(self, capacity=SAMPLE_CAPACITY, fields=FIELDS):
+        self.capacity = capacity
+        self.fields = fields
+        self._columns = [array('d', [0.0]) * capacity for _ in fields]
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def append(self, values):
+        with self._lock:
+            for column, value in zip(self._columns, values):
+                column[self._next] = value
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def __len__(self):
+        return self._size
+
+    def _row(self, index):
+        return dict(zip(self.fields, (column[index] for column in self._columns)))
+
+    def latest(self):
+        with self._lock:
+            if not self._size:
+                return None
+            return self._row((self._next - 1) % self.capacity)
+
+    # 最近window秒内的样本，按时间从旧到新
+    def window(self, seconds=None):
+        since = time.time() - seconds if seconds else 0
+        with self._lock:
+            start = (self._next - self._size) % self.capacity
+            rows = [self._row((start + offset) % self.capacity) for offset in range(self._size)]
+        return [row for row in rows if row['timestamp'] >= since]
+
+
+def cpu_percent(stats):
+    cpu_stats = stats.get('cpu_stats') or {}
+    precpu_stats = stats.get('precpu_stats') or {}
+    cpu_delta = cpu_stats.get('cpu_usage', {}).get('total_usage', 0) - \
+        precpu_stats.get('cpu_usage', {}).get('total_usage', 0)
+    system_delta = cpu_stats.get('system_cpu_usage', 0) - precpu_stats.get('system_cpu_usage', 0)
+    online_cpus = cpu_stats.get('online_cpus') or len(cpu_stats.get('cpu_usage', {}).get('percpu_usage') or []) or 1
+    if cpu_delta > 0 and system_delta > 0:
+        return cpu_delta / system_delta * online_cpus * 100.0
+    return 0.0
+
+
+def memory_usage(stats):
+    memory_stats = stats.get('memory_stats') or {}
+    details = memory_stats.get('stats') or {}
+    # 与docker stats一致：cgroup v1减去cache，cgroup v2减去inactive_file
+    cache = details.get('cache', details.get('inactive_file', 0))
+    return max(memory_stats.get('usage', 0) - cache, 0), memory_stats.get('limit', 0)
+
+
+def network_bytes(stats):
+    networks = (stats.get('networks') or {}).values()
+    return sum(network.get('rx_bytes', 0) for network in networks), \
+        sum(network.get('tx_bytes', 0) for network in networks)
+
+
+def block_io_bytes(stats):
+    read = write = 0
+    for entry in (stats.get('blkio_stats') or {}).get('io_service_bytes_recursive') or []:
+        op = entry.get('op', '').lower()
+        if op == 'read':
+            read += entry.get('value', 0)
+        elif op == 'write':
+            write += entry.get('value', 0)
+    return read, write
+
+
+class StatsSampler:
+    # 对每个运行中的容器保持一个stats(stream=True)订阅，增量计算CPU%、内存、网络和块IO速率，
+    # 样本保存在每个容器的环形缓冲区中，查询时直接读取，不再阻塞等待docker计算
+    # api: docker.APIClient；list_running: 返回运行中容器id列表的函数
+    def __init__(self, api, list_running, capacity=SAMPLE_CAPACITY, reconcile_interval=RECONCILE_INTERVAL):
+        self.api = api
+        self.list_running = list_running
+        self.capacity = capacity
+        self.reconcile_interval = reconcile_interval
+        self._buffers = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        with self._lock:
+            streams = list(self._streams.values())
+        for stream in streams:
+            if stream is not None:
+                stream.close()
+
+    def latest(self):
+        with self._lock:
+            buffers = dict(self._buffers)
+        return {container_id: buffer.latest() for container_id, buffer in buffers.items() if len(buffer)}
+
+    def window(self, container_id, seconds=None):
+        with self._lock:
+            buffer = self._buffers.get(container_id)
+        return None if buffer is None else buffer.window(seconds)
+
+    def reconcile(self):
+        running = set(self.list_running())
+        with self._lock:
+            for container_id in running - set(self._streams):
+                self._streams[container_id] = None
+                self._buffers.setdefault(container_id, RingBuffer(self.capacity))
+                threading.Thread(target=self._sample, args=(container_id,), daemon=True).start()
+            for container_id in set(self._buffers) - running - set(self._streams):
+                del self._buffers[container_id]
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"Stats reconcile failed: {e}")
+            self._stopped.wait(self.reconcile_interval)
+
+    # 订阅单个容器的stats流，容器停止或流断开后退出，下次reconcile时重新订阅
+    def _sample(self, container_id):
+        buffer = self._buffers[container_id]
+        previous = None
+        try:
+            stream = self.api.stats(container_id, stream=True, decode=True)
+            with self._lock:
+                self._streams[container_id] = stream
+            for stats in stream:
+                if self._stopped.is_set():
+                    break
+                now = time.time()
+                usage, limit = memory_usage(stats)
+                rx, tx = network_bytes(stats)
+                read, write = block_io_bytes(stats)
+                rates = (0.0, 0.0, 0.0, 0.0)
+                if previous is not None:
+                    elapsed = max(now - previous[0], 1e-6)
+                    rates = tuple(max(current - last, 0) / elapsed
+                                  for current, last in zip((rx, tx, read, write), previous[1:]))
+                previous = (now, rx, tx, read, write)
+                buffer.append((now, cpu_percent(stats), usage, limit,
+                               usage / limit * 100.0 if limit else 0.0) + rates)
+        except Exception as e:
+            print(f"Stats stream for {container_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._streams.pop(container_id, None)
@@ -0,0 +1,213 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.metrics import EVENT_SUBSCRIBERS, EVENT_QUEUE_EVENTS
+
+# 每个订阅者最多缓存的未发送事件数（合并后）
+SUBSCRIBER_QUEUE_SIZE = 256
+# 订阅者队列满时的处理方式：drop 丢弃最早的事件并通知丢弃数量；resync 清空队列，之后重新发送一次全量快照
+SUBSCRIBER_POLICIES = ('drop', 'resync')
+# 没有事件时发送心跳的间隔（秒），同时用于检测客户端断开
+HEARTBEAT_INTERVAL = 15
+
+
+class Topic:
+    # 一种资源（如某个集群的pods、某个docker主机的containers）的事件源，所有订阅者共用一个上游
+    # start(publish): 在第一次订阅时调用一次，之后上游的每次变化调用 publish(event_type, key, obj)
+    # snapshot(): 返回当前的全量数据，用于新订阅者和resync
+    def __init__(self, name, start, snapshot):
+        self.name = name
+        self.snapshot = snapshot
+        self._start = start
+        self._started = False
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.coalesced = EVENT_QUEUE_EVENTS.labels(name, 'coalesced')
+        self.dropped = EVENT_QUEUE_EVENTS.labels(name, 'dropped')
+        self.resynced = EVENT_QUEUE_EVENTS.labels(name, 'resync')
+
+    def ensure_started(self):
+        with self._lock:
+            if self._started:
+                return
+            self._start(self.publish)
+            self._started = True
+
+    def add(self, subscription):
+        with self._lock:
+            self._subscribers.add(subscription)
+            EVENT_SUBSCRIBERS.labels(self.name).set(len(self._subscribers))
+
+    def remove(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            EVENT_SUBSCRIBERS.labels(self.name).set(len(self._subscribers))
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    # 上游的一次变化，分发给所有订阅者；RESYNC表示上游重新同步过，订阅者需要重新获取全量数据
+    def publish(self, event_type, key, obj):
+        subscribers = list(self._subscribers)
+        if event_type == 'RESYNC':
+            for subscription in subscribers:
+                subscription.request_resync(self.name)
+            return
+        event = {"topic": self.name, "type": event_type, "key": key, "object": obj}
+        for subscription in subscribers:
+            subscription.put(self, event)
+
+
+class Subscription:
+    # 一个订阅者的有界队列，按 (topic, key) 合并同一对象的多次变化，只保留最新状态
+    # match(obj): 只接收返回True的对象（如按namespace过滤）
+    # notify(): 有新事件时调用，供事件循环中的WebSocket连接使用
+    def __init__(self, hub, topics, match=None, policy='drop', max_size=SUBSCRIBER_QUEUE_SIZE, notify=None):
+        self.hub = hub
+        self.topics = topics
+        self.match = match
+        self.policy = policy
+        self.max_size = max_size
+        self.notify = notify
+        self.closed = False
+        self._pending = OrderedDict()
+        # 新订阅者先收到所有topic的全量数据
+        self._resync = set(topic.name for topic in topics)
+        self._dropped = 0
+        self._condition = threading.Condition()
+
+    def put(self, topic, event):
+        if self.match is not None and not self.match(event["object"]):
+            return
+        key = (topic.name, event["key"])
+        with self._condition:
+            if topic.name in self._resync:
+                # 之后发送的全量数据已经包含这次变化
+                return
+            previous = self._pending.get(key)
+            if previous is not None:
+                topic.coalesced.inc()
+                if previous["type"] == 'ADDED' and event["type"] == 'DELETED':
+                    del self._pending[key]
+                    return
+                if previous["type"] == 'ADDED':
+                    event = dict(event, type='ADDED')
+                self._pending[key] = event
+            else:
+                if len(self._pending) >= self.max_size:
+                    self._overflow()
+                    if topic.name in self._resync:
+                        self._condition.notify()
+                        return
+                self._pending[key] = event
+            self._condition.notify()
+        if self.notify is not None:
+            self.notify()
+
+    # 队列已满：drop丢弃最早的事件；resync清空队列，之后重新发送所有topic的全量数据
+    def _overflow(self):
+        if self.policy == 'resync':
+            for topic in self.topics:
+                topic.resynced.inc()
+            self._pending.clear()
+            self._dropped = 0
+            self._resync.update(topic.name for topic in self.topics)
+        else:
+            (topic_name, _), _ = self._pending.popitem(last=False)
+            self._topic(topic_name).dropped.inc()
+            self._dropped += 1
+
+    def _topic(self, name):
+        for topic in self.topics:
+            if topic.name == name:
+                return topic
+
+    def request_resync(self, topic):
+        with self._condition:
+            self._resync.add(topic)
+            for key in [key for key in self._pending if key[0] == topic]:
+                del self._pending[key]
+            if not self._pending:
+                self._dropped = 0
+            self._condition.notify()
+        if self.notify is not None:
+            self.notify()
+
+    def _snapshot(self, topic):
+        items = topic.snapshot()
+        if self.match is not None:
+            items = [item for item in items if self.match(item)]
+        return {"topic": topic.name, "type": "SNAPSHOT", "items": items}
+
+    # 取出当前所有待发送的事件，没有事件时最多等待timeout秒，返回事件列表（可能为空）
+    # 需要resync的topic先发送全量数据（在锁外获取）
+    def drain(self, timeout=None):
+        with self._condition:
+            if not self._pending and not self._resync and not self._dropped and not self.closed:
+                self._condition.wait(timeout)
+            resync = [topic for topic in self.topics if topic.name in self._resync]
+            self._resync.clear()
+            events = list(self._pending.values())
+            self._pending.clear()
+            dropped, self._dropped = self._dropped, 0
+        batch = [self._snapshot(topic) for topic in resync]
+        if dropped:
+            batch.append({"type": "DROPPED", "count": dropped})
+        batch.extend(events)
+        return batch
+
+    # 阻塞式的事件迭代器（SSE等WSGI流式响应使用），空闲时每HEARTBEAT_INTERVAL秒产生一次心跳
+    def events(self, heartbeat=HEARTBEAT_INTERVAL):
+        try:
+            while not self.closed:
+                batch = self.drain(heartbeat)
+                if not batch:
+                    batch = [{"type": "HEARTBEAT", "time": int(time.time())}]
+                yield from batch
+        finally:
+            self.close()
+
+    def close(self):
+        with self._condition:
+            if self.closed:
+                return
+            self.closed = True
+            self._condition.notify()
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    # 进程内的发布/订阅：每个topic只有一个上游（informer的watch、docker的/events），分发给任意多个订阅者
+    # 订阅者各自有有界队列，慢的订阅者按自己的策略丢弃或重新同步，不影响上游和其他订阅者
+    def __init__(self):
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def topic(self, name, start, snapshot):
+        with self._lock:
+            topic = self._topics.get(name)
+            if topic is None:
+                topic = Topic(name, start, snapshot)
+                self._topics[name] = topic
+            return topic
+
+    def subscribe(self, topics, match=None, policy='drop', max_size=SUBSCRIBER_QUEUE_SIZE, notify=None):
+        for topic in topics:
+            topic.ensure_started()
+        subscription = Subscription(self, topics, match, policy, max_size, notify)
+        for topic in topics:
+            topic.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for topic in subscription.topics:
+            topic.remove(subscription)
+
+    def stats(self):
+        with self._lock:
+            topics = list(self._topics.values())
+        return {topic.name: {"subscribers": topic.subscriber_count()} for topic in topics}
+
+
+event_hub = EventHub()
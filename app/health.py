@@ -0,0 +1,71 @@
+import threading
+import time
+
+# 后端状态的检查间隔（秒）
+CHECK_INTERVAL = 10
+
+
+class BackendStatus:
+    __slots__ = ('state', 'error', 'latency', 'checked_at')
+
+    def __init__(self):
+        self.state = 'pending'
+        self.error = None
+        self.latency = None
+        self.checked_at = None
+
+    def to_dict(self):
+        return {
+            "state": self.state,
+            "error": self.error,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "checked_at": self.checked_at
+        }
+
+
+class BackendMonitor:
+    # 在后台线程中定期检查各个后端（docker、kubernetes）
+    # 第一次检查同时完成预热：创建默认客户端、导入docker/kubernetes包，之后的请求不再承担这部分开销
+    # checks: {name: func}，func抛出异常即认为后端不可用
+    def __init__(self, checks, interval=CHECK_INTERVAL):
+        self.checks = checks
+        self.interval = interval
+        self.statuses = {name: BackendStatus() for name in checks}
+        self.started_at = time.time()
+        self._started = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # 每个后端一个线程，一个后端不可用（请求超时）不影响其他后端的检查
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for name in self.checks:
+            threading.Thread(target=self._run, args=(name,), name=f'backend-monitor-{name}', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self, name):
+        status = self.statuses[name]
+        started = time.time()
+        try:
+            self.checks[name]()
+            status.state, status.error = 'ready', None
+        except Exception as e:
+            status.state, status.error = 'error', str(e)
+        status.latency = time.time() - started
+        status.checked_at = int(time.time())
+
+    def _run(self, name):
+        while not self._stop.is_set():
+            self.check(name)
+            self._stop.wait(self.interval)
+
+    def ready(self):
+        return all(status.state == 'ready' for status in self.statuses.values())
+
+    def report(self):
+        return {name: status.to_dict() for name, status in self.statuses.items()}
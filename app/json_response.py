@@ -0,0 +1,199 @@
+import gzip
+import json
+from datetime import date
+
+from flask import g, has_request_context, request
+from flask.json import JSONEncoder
+
+from app.metrics import RESPONSE_BODY_BYTES, SERIALIZATION_LATENCY
+
+try:
+    import orjson
+except ImportError:  # 没有安装orjson（见requirements.txt）时使用标准库json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，没有安装时只支持gzip
+    brotli = None
+
+# 响应体超过该大小（字节）时按Accept-Encoding压缩
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html')
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+# 不带?compact参数时是否去掉值为null、{}、[]的字段
+COMPACT_DEFAULT = False
+
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+# 根据Accept-Encoding选择压缩方式，优先br
+def negotiate_encoding(accept_encoding):
+    accepted = [item.split(';')[0].strip() for item in (accept_encoding or '').split(',')]
+    for encoding in supported_encodings():
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def _default(o):
+    if isinstance(o, date):
+        return o.isoformat()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+# 紧凑格式序列化，返回bytes
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class FastJSONEncoder(JSONEncoder):
+    # jsonify使用的编码器：安装了orjson时由orjson完成整个对象的编码（to_dict()产生的大对象快数倍），
+    # 否则使用标准库；输出与Flask默认的编码器相同，datetime等orjson能直接处理的类型也交给Flask的default
+    # （datetime为HTTP日期格式，如 Wed, 01 Jan 2020 00:00:00 GMT）
+    # 请求带有 ?fields=、?compact=true 时在编码之前裁剪数据（见shape），裁剪和编码的耗时计入SERIALIZATION_LATENCY
+    def encode(self, o):
+        with SERIALIZATION_LATENCY.labels('encode').time():
+            return self._encode(o)
+
+    def _encode(self, o):
+        o = shape(o)
+        if orjson is None:
+            return super().encode(o)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent is not None:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(o, default=self.default, option=option).decode('utf-8')
+        except TypeError:
+            # orjson不支持的情况（如超过64位的整数）交给标准库
+            return super().encode(o)
+
+
+# 解析 ?fields=metadata.name,status.phase 为路径列表
+def parse_fields(value):
+    paths = []
+    for field in (value or '').split(','):
+        path = tuple(part for part in field.strip().split('.') if part)
+        if path:
+            paths.append(path)
+    return paths
+
+
+# 只保留指定路径的字段，路径经过列表时对列表中的每个元素继续选择（如 items.metadata.name）
+def select_fields(data, paths):
+    if isinstance(data, list):
+        return [select_fields(item, paths) for item in data]
+    if not isinstance(data, dict):
+        return data
+    selected = {}
+    for key in dict.fromkeys(path[0] for path in paths):
+        if key not in data:
+            continue
+        rest = [path[1:] for path in paths if path[0] == key]
+        selected[key] = data[key] if not all(rest) else select_fields(data[key], rest)
+    return selected
+
+
+# 去掉值为null、{}、[]的字段（kubernetes对象的to_dict()中大部分字段为null）
+def compact(data):
+    if isinstance(data, dict):
+        result = {}
+        for key, value in data.items():
+            value = compact(value)
+            if value is not None and value != {} and value != []:
+                result[key] = value
+        return result
+    if isinstance(data, list):
+        return [compact(item) for item in data]
+    return data
+
+
+# 当前请求的裁剪参数 (paths, compact)，每个请求只解析一次
+def _shape_options():
+    options = g.get('json_shape_options')
+    if options is None:
+        paths = parse_fields(request.args.get('fields'))
+        compact_mode = request.args.get('compact', 'true' if COMPACT_DEFAULT else 'false') == 'true'
+        options = g.json_shape_options = (paths, compact_mode)
+    return options
+
+
+# 按请求参数裁剪要返回的数据：?fields=a.b,c 字段选择，?compact=true 去掉空字段
+# 错误响应（带error字段的对象）原样返回
+def shape(data):
+    if not has_request_context():
+        return data
+    paths, compact_mode = _shape_options()
+    if not paths and not compact_mode:
+        return data
+    if isinstance(data, dict) and 'error' in data:
+        return data
+    g.json_shaped = True
+    if paths:
+        data = select_fields(data, paths)
+    if compact_mode:
+        data = compact(data)
+    return data
+
+
+# 当前请求的响应是否经过了裁剪，这时视图按完整数据生成的ETag不再适用
+def is_shaped():
+    return has_request_context() and g.get('json_shaped', False)
+
+
+# 达到大小阈值的JSON/文本响应才压缩
+def compressible(mimetype, size):
+    return mimetype in COMPRESS_MIMETYPES and size >= COMPRESS_MIN_SIZE
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    RESPONSE_BODY_BYTES.labels(encoding, 'identity').inc(len(body))
+    RESPONSE_BODY_BYTES.labels(encoding, 'encoded').inc(len(compressed))
+    return compressed
+
+
+# 压缩响应体；响应缓存的命中已经按Accept-Encoding返回了缓存的压缩结果（带Content-Encoding），这里不再处理
+def _compress(response):
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return
+    body = response.get_data()
+    if not compressible(response.mimetype, len(body)):
+        return
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # 压缩后的内容与未压缩的不再逐字节相同，ETag改为弱校验，If-None-Match仍然可以命中
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+# 所有蓝图的JSON响应：jsonify使用FastJSONEncoder（按参数裁剪后编码），非流式响应按大小压缩
+# 流式响应（ndjson列表、日志、事件流、镜像下载）不经过这里的处理
+def install_json(app):
+    app.json_encoder = FastJSONEncoder
+
+    @app.after_request
+    def compress_response(response):
+        if not response.is_streamed and not response.direct_passthrough:
+            _compress(response)
+        return response
@@ -0,0 +1,77 @@
+import json
+
+import yaml
+
+# 按依赖顺序分批apply：同一批内的对象互不依赖，可以并发执行
+# 0: namespace和CRD；1: 其他对象会引用的配置、权限、存储；2: 其余所有资源（工作负载、service、自定义资源等）
+APPLY_TIERS = (
+    ('Namespace', 'CustomResourceDefinition'),
+    ('PriorityClass', 'StorageClass', 'PersistentVolume', 'ClusterRole', 'ClusterRoleBinding',
+     'ResourceQuota', 'LimitRange', 'ServiceAccount', 'Role', 'RoleBinding', 'Secret', 'ConfigMap',
+     'PersistentVolumeClaim'),
+)
+
+
+def apply_tier(manifest):
+    for tier, kinds in enumerate(APPLY_TIERS):
+        if manifest.get('kind') in kinds:
+            return tier
+    return len(APPLY_TIERS)
+
+
+# 展开 kind: List（以及 *List）中的items，跳过空文档
+def flatten_manifests(documents):
+    manifests = []
+    for document in documents:
+        if not document:
+            continue
+        if isinstance(document, list):
+            manifests.extend(flatten_manifests(document))
+        elif isinstance(document, dict) and str(document.get('kind', '')).endswith('List') and 'items' in document:
+            manifests.extend(flatten_manifests(document['items']))
+        else:
+            manifests.append(document)
+    return manifests
+
+
+# 解析请求体：JSON（单个对象、对象列表或 {"items": [...]}）或多文档YAML
+# 每个对象都必须有apiVersion、kind和metadata.name，否则抛出ValueError
+def load_manifests(data, is_json=False):
+    if is_json:
+        manifests = flatten_manifests([json.loads(data)])
+    else:
+        manifests = flatten_manifests(list(yaml.safe_load_all(data)))
+    for index, manifest in enumerate(manifests):
+        if not isinstance(manifest, dict) or not manifest.get('apiVersion') or not manifest.get('kind') \
+                or not (manifest.get('metadata') or {}).get('name'):
+            raise ValueError(f"Manifest {index} must have apiVersion, kind and metadata.name")
+    return manifests
+
+
+# 按依赖顺序分组，返回 [[manifest, ...], ...]，保持组内原有顺序
+def group_by_tier(manifests):
+    tiers = [[] for _ in range(len(APPLY_TIERS) + 1)]
+    for manifest in manifests:
+        tiers[apply_tier(manifest)].append(manifest)
+    return [tier for tier in tiers if tier]
+
+
+# 同一批manifest中由CRD定义的 (apiVersion, kind)，这些自定义资源要等CRD apply之后才能解析
+def crd_kinds(manifests):
+    kinds = set()
+    for manifest in manifests:
+        if manifest.get('kind') != 'CustomResourceDefinition':
+            continue
+        spec = manifest.get('spec') or {}
+        kind = (spec.get('names') or {}).get('kind')
+        for version in spec.get('versions') or []:
+            kinds.add((f"{spec.get('group')}/{version.get('name')}", kind))
+    return kinds
+
+
+# 从apiserver的错误响应中取出可读的错误信息
+def api_error_message(e):
+    try:
+        return json.loads(e.body)['message']
+    except (TypeError, ValueError, KeyError):
+        return e.reason
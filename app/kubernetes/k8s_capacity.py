@@ -0,0 +1,241 @@
+import re
+import threading
+import time
+from array import array
+from functools import lru_cache
+
+try:
+    import numpy
+except ImportError:  # numpy为可选依赖，没有安装时分组汇总逐个元素累加
+    numpy = None
+
+# 重新获取nodes、pods和metrics并汇总的间隔（秒），metrics-server默认每15秒采集一次
+CAPACITY_REFRESH_INTERVAL = 15
+# 获取nodes和metrics的请求超时（秒），metrics-server不可用或很慢时不会一直阻塞刷新
+CAPACITY_REQUEST_TIMEOUT = 10
+# 接口等待第一次汇总完成的最长时间（秒），超时返回503
+CAPACITY_SYNC_TIMEOUT = 5
+# requests或实际使用量超过allocatable的这个比例即认为饱和
+SATURATION_THRESHOLD = 0.9
+
+# 按列保存的pod数据，每列一个array('d')，同一下标对应同一个pod
+COLUMNS = ('cpu_requests', 'cpu_limits', 'memory_requests', 'memory_limits', 'cpu_usage', 'memory_usage')
+
+_QUANTITY = re.compile(r'^([+-]?[0-9.]+(?:[eE][+-]?[0-9]+)?)([a-zA-Z]*)$')
+_SUFFIXES = {
+    'n': 1e-9, 'u': 1e-6, 'm': 1e-3, '': 1.0,
+    'k': 1e3, 'M': 1e6, 'G': 1e9, 'T': 1e12, 'P': 1e15, 'E': 1e18,
+    'Ki': 2.0 ** 10, 'Mi': 2.0 ** 20, 'Gi': 2.0 ** 30, 'Ti': 2.0 ** 40, 'Pi': 2.0 ** 50, 'Ei': 2.0 ** 60,
+}
+
+
+# kubernetes的资源数量（"250m"、"1.5Gi"、"2"）转换为浮点数，cpu单位为核，memory单位为字节
+# 大量pod使用相同的写法，按字符串缓存解析结果
+@lru_cache(maxsize=4096)
+def parse_quantity(quantity):
+    if not quantity:
+        return 0.0
+    match = _QUANTITY.match(str(quantity))
+    if match is None or match.group(2) not in _SUFFIXES:
+        return 0.0
+    return float(match.group(1)) * _SUFFIXES[match.group(2)]
+
+
+def _container_resources(container):
+    resources = container.get('resources')
+    if not resources:
+        return 0.0, 0.0, 0.0, 0.0
+    requests = resources.get('requests') or {}
+    limits = resources.get('limits') or {}
+    return (parse_quantity(requests.get('cpu')), parse_quantity(limits.get('cpu')),
+            parse_quantity(requests.get('memory')), parse_quantity(limits.get('memory')))
+
+
+# pod的有效requests/limits：所有容器之和与最大的init容器取大者，再加上pod overhead
+# 返回值与COLUMNS的前四列一一对应
+def pod_resources(pod):
+    spec = pod.get('spec') or {}
+    totals = [0.0, 0.0, 0.0, 0.0]
+    for container in spec.get('containers') or ():
+        for index, value in enumerate(_container_resources(container)):
+            totals[index] += value
+    for container in spec.get('initContainers') or ():
+        for index, value in enumerate(_container_resources(container)):
+            if value > totals[index]:
+                totals[index] = value
+    overhead = spec.get('overhead')
+    if overhead:
+        cpu, memory = parse_quantity(overhead.get('cpu')), parse_quantity(overhead.get('memory'))
+        totals[0] += cpu
+        totals[1] += cpu
+        totals[2] += memory
+        totals[3] += memory
+    return totals
+
+
+# 按分组编号求和，groups中为-1的元素（不属于任何分组）不计入
+# 安装了numpy时直接在array的缓冲区上用bincount汇总，否则逐个元素累加；两者结果相同
+def group_sum(values, groups, size):
+    if numpy is not None:
+        groups = numpy.asarray(groups)
+        mask = groups >= 0
+        sums = numpy.bincount(groups[mask], weights=numpy.asarray(values)[mask], minlength=size)
+        return array('d', sums.tolist())
+    sums = array('d', [0.0]) * size
+    for group, value in zip(groups, values):
+        if group >= 0:
+            sums[group] += value
+    return sums
+
+
+def group_count(groups, size):
+    if numpy is not None:
+        groups = numpy.asarray(groups)
+        return array('l', numpy.bincount(groups[groups >= 0], minlength=size).tolist())
+    counts = array('l', [0]) * size
+    for group in groups:
+        if group >= 0:
+            counts[group] += 1
+    return counts
+
+
+def _ratio(value, total):
+    return round(value / total, 4) if total else None
+
+
+class PodColumns:
+    # 所有pod的requests/limits/usage按列保存，node和namespace用编号表示，用于一次性分组汇总
+    def __init__(self, pods, pod_metrics, node_names):
+        node_index = {name: index for index, name in enumerate(node_names)}
+        usage = {}
+        for item in pod_metrics or []:
+            metadata = item.get('metadata') or {}
+            containers = item.get('containers') or []
+            usage[(metadata.get('namespace'), metadata.get('name'))] = (
+                sum(parse_quantity((container.get('usage') or {}).get('cpu')) for container in containers),
+                sum(parse_quantity((container.get('usage') or {}).get('memory')) for container in containers))
+        self.namespaces = sorted({pod.namespace for pod in pods})
+        namespace_index = {name: index for index, name in enumerate(self.namespaces)}
+        self.columns = {column: array('d') for column in COLUMNS}
+        self.node = array('l')
+        self.namespace = array('l')
+        for pod in pods:
+            for column, value in zip(COLUMNS, pod.resources):
+                self.columns[column].append(value)
+            cpu_usage, memory_usage = usage.get((pod.namespace, pod.name), (0.0, 0.0))
+            self.columns['cpu_usage'].append(cpu_usage)
+            self.columns['memory_usage'].append(memory_usage)
+            self.node.append(node_index.get(pod.node_name, -1))
+            self.namespace.append(namespace_index[pod.namespace])
+
+    def rollup(self, groups, size):
+        sums = {column: group_sum(values, groups, size) for column, values in self.columns.items()}
+        return sums, group_count(groups, size)
+
+
+def _resources(sums, index, prefix):
+    return {"cpu": round(sums[f'cpu_{prefix}'][index], 3), "memory": int(sums[f'memory_{prefix}'][index])}
+
+
+# 汇总节点和namespace的容量与使用情况
+# nodes/node_metrics/pod_metrics为apiserver返回的原始JSON items，metrics不可用时为None
+# pods为pods informer缓存中的PodSummary（带有node_name和resources）
+def build_capacity(nodes, pods, node_metrics=None, pod_metrics=None):
+    # 已结束的pod不再占用资源
+    pods = [pod for pod in pods if pod.phase not in ('Succeeded', 'Failed')]
+    node_names = [node['metadata']['name'] for node in nodes]
+    columns = PodColumns(pods, pod_metrics, node_names)
+    has_usage = pod_metrics is not None
+    node_usage = {item['metadata']['name']: item.get('usage') or {} for item in node_metrics or []}
+
+    node_sums, node_pods = columns.rollup(columns.node, len(node_names))
+    node_list = []
+    for index, node in enumerate(nodes):
+        allocatable = (node.get('status') or {}).get('allocatable') or {}
+        cpu = parse_quantity(allocatable.get('cpu'))
+        memory = parse_quantity(allocatable.get('memory'))
+        usage = node_usage.get(node_names[index])
+        utilization = {
+            "cpu_requests": _ratio(node_sums['cpu_requests'][index], cpu),
+            "memory_requests": _ratio(node_sums['memory_requests'][index], memory),
+            "cpu_usage": _ratio(parse_quantity(usage.get('cpu')), cpu) if usage is not None else None,
+            "memory_usage": _ratio(parse_quantity(usage.get('memory')), memory) if usage is not None else None,
+        }
+        node_list.append({
+            "name": node_names[index],
+            "allocatable": {"cpu": cpu, "memory": int(memory), "pods": int(parse_quantity(allocatable.get('pods')))},
+            "requests": _resources(node_sums, index, 'requests'),
+            "limits": _resources(node_sums, index, 'limits'),
+            "usage": {"cpu": round(parse_quantity(usage.get('cpu')), 3),
+                      "memory": int(parse_quantity(usage.get('memory')))} if usage is not None else None,
+            "pods": node_pods[index],
+            "utilization": utilization,
+            "saturated": any(value is not None and value >= SATURATION_THRESHOLD for value in utilization.values())
+        })
+
+    cluster_cpu = sum(node["allocatable"]["cpu"] for node in node_list)
+    cluster_memory = sum(node["allocatable"]["memory"] for node in node_list)
+    namespace_sums, namespace_pods = columns.rollup(columns.namespace, len(columns.namespaces))
+    namespace_list = []
+    for index, name in enumerate(columns.namespaces):
+        namespace_list.append({
+            "name": name,
+            "pods": namespace_pods[index],
+            "requests": _resources(namespace_sums, index, 'requests'),
+            "limits": _resources(namespace_sums, index, 'limits'),
+            "usage": _resources(namespace_sums, index, 'usage') if has_usage else None,
+            # 占整个集群allocatable的比例
+            "share": {
+                "cpu_requests": _ratio(namespace_sums['cpu_requests'][index], cluster_cpu),
+                "memory_requests": _ratio(namespace_sums['memory_requests'][index], cluster_memory),
+                "cpu_usage": _ratio(namespace_sums['cpu_usage'][index], cluster_cpu) if has_usage else None,
+                "memory_usage": _ratio(namespace_sums['memory_usage'][index], cluster_memory) if has_usage else None,
+            }
+        })
+
+    # 最饱和的排在前面
+    node_list.sort(key=lambda node: max(value or 0 for value in node["utilization"].values()), reverse=True)
+    namespace_list.sort(key=lambda namespace: max(value or 0 for value in namespace["share"].values()), reverse=True)
+    return {"nodes": node_list, "namespaces": namespace_list}
+
+
+class CapacityMonitor:
+    # 后台定期获取nodes、pods、node/pod metrics（fetch返回这四项和errors），汇总后保存最新结果
+    # 接口直接读取最新结果，不再按请求逐个访问pod
+    def __init__(self, fetch, interval=CAPACITY_REFRESH_INTERVAL):
+        self.fetch = fetch
+        self.interval = interval
+        self.snapshot = None
+        self.error = None
+        self._synced = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='k8s-capacity', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self):
+        started = time.time()
+        try:
+            nodes, pods, node_metrics, pod_metrics, errors = self.fetch()
+            snapshot = build_capacity(nodes, pods, node_metrics, pod_metrics)
+            snapshot["errors"] = errors
+            snapshot["updated_at"] = int(time.time())
+            snapshot["duration"] = round(time.time() - started, 3)
+            self.snapshot, self.error = snapshot, None
+        except Exception as e:
+            self.error = str(e)
+        self._synced.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    # 等待第一次汇总完成
+    def wait_for_sync(self, timeout=None):
+        return self._synced.wait(timeout)
@@ -1,137 +1,387 @@
+import datetime
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import urllib3
 from kubernetes import config, client
-from flask import jsonify
+from flask import jsonify, Response
 from kubernetes.client import ApiException
+from kubernetes.dynamic import DynamicClient
+from kubernetes.dynamic.exceptions import ResourceNotFoundError, ResourceNotUniqueError
+
+from app.kubernetes.k8s_apply import group_by_tier, crd_kinds, api_error_message
+from app.kubernetes.k8s_capacity import CapacityMonitor, CAPACITY_REQUEST_TIMEOUT, CAPACITY_SYNC_TIMEOUT
+from app.kubernetes.k8s_informer import ResourceInformer, RawWatch
+from app.kubernetes.k8s_overview import build_overview, OVERVIEW_REQUEST_TIMEOUT
+from app.kubernetes.k8s_registry import KUBECONFIG_FILE
+from app.kubernetes.k8s_rollout import rollout_patch, RolloutTracker, ROLLOUT_CONCURRENCY, ROLLOUT_TIMEOUT, \
+    ROLLOUT_WATCH_GRACE
+from app.kubernetes.pod_summary import PodSummary, project_pod
+from app.json_response import dumps, loads
+from app.log_stream import log_response, event_response, LOG_CHUNK_SIZE
+from app.metrics import cache_lookup, instrument_kubernetes_api, SERIALIZATION_LATENCY
+
+# 每个集群的ApiClient连接池大小，即同时向一个apiserver发起的最大请求数，连接保持keep-alive复用
+POOL_MAXSIZE = 32
+# 流式返回时每次向apiserver分页获取的条数
+LIST_PAGE_SIZE = 500
+# 以原始JSON方式LIST，只投影出列表需要的字段的资源类型
+PROJECTIONS = {'pods': project_pod}
+# 批量apply时同一批内的默认/最大并发数
+APPLY_CONCURRENCY = 16
+APPLY_MAX_CONCURRENCY = 64
+# server-side apply使用的field manager
+FIELD_MANAGER = 'kubernetes-management-service'
+# apply CRD后等待其Established的最长时间（秒）
+CRD_ESTABLISH_TIMEOUT = 30
+
+
+# kubernetes模型对象转为dict，耗时计入序列化直方图
+def model_dict(obj):
+    with SERIALIZATION_LATENCY.labels('to_dict').time():
+        return obj.to_dict()
 
 
 class KubernetesClient:
     # 初始化，需要k8s的配置文件
-    # ~/.kube中的config文件
-    def __init__(self):
-        config.load_kube_config(config_file="app/config/kubeconfig")
+    # ~/.kube中的config文件，context为空时使用current-context
+    # 每个实例持有一个长期复用的ApiClient，不修改全局默认配置，多个集群的实例可以同时存在
+    def __init__(self, context=None, config_file=KUBECONFIG_FILE):
+        self.context = context
+        configuration = client.Configuration()
+        config.load_kube_config(config_file=config_file, context=context, client_configuration=configuration)
+        configuration.connection_pool_maxsize = POOL_MAXSIZE
+        self.api_client = instrument_kubernetes_api(client.ApiClient(configuration), context or 'default')
+        self._informers = {}
+        self._informers_lock = threading.Lock()
+        self._informer_locks = {}
+        self._dynamic_client = None
+        self._dynamic_client_lock = threading.Lock()
+        self._capacity = None
+        self._capacity_lock = threading.Lock()
+
+    # apiserver版本，同时用于检查apiserver是否可用
+    def version(self):
+        return client.VersionApi(self.api_client).get_code(_request_timeout=5).git_version
 
     def k8s_core_api(self):
-        v1 = client.CoreV1Api()
+        v1 = client.CoreV1Api(self.api_client)
         return v1
 
     def k8s_apps_api(self):
-        appsv1 = client.AppsV1Api()
+        appsv1 = client.AppsV1Api(self.api_client)
         return appsv1
 
-    # 获取所有的pods
-    def list_pods(self):
-        v1 = self.k8s_core_api()
-        pods = []
-        pod_list = v1.list_pod_for_all_namespaces().items
-        for pod in pod_list:
-            pod_info = {
-                "namespace": pod.metadata.namespace,
-                "name": pod.metadata.name,
-                "ready": pod.status.phase,
-                "status": pod.status.phase,
-                "restarts": pod.status.container_statuses[0].restart_count,
-                "age": pod.metadata.creation_timestamp.strftime("%Y-%m-%d %H:%M:%S")
+    # 动态客户端，按apiVersion/kind通过discovery解析任意资源（包括CRD），首次使用时创建
+    def dynamic_client(self):
+        with self._dynamic_client_lock:
+            if self._dynamic_client is None:
+                self._dynamic_client = DynamicClient(self.api_client)
+            return self._dynamic_client
+
+    # 指定资源类型的list方法，namespace为空时列出所有namespace
+    def _list_func(self, kind, namespace=None):
+        if namespace is None:
+            list_funcs = {
+                'pods': self.k8s_core_api().list_pod_for_all_namespaces,
+                'deployments': self.k8s_apps_api().list_deployment_for_all_namespaces,
+                'services': self.k8s_core_api().list_service_for_all_namespaces,
             }
-            pods.append(pod_info)
-        return jsonify(pods)
+            return list_funcs[kind]
+        list_funcs = {
+            'pods': self.k8s_core_api().list_namespaced_pod,
+            'deployments': self.k8s_apps_api().list_namespaced_deployment,
+            'services': self.k8s_core_api().list_namespaced_service,
+        }
+        func = list_funcs[kind]
+        return lambda **kwargs: func(namespace, **kwargs)
+
+    # 获取指定资源类型的本地缓存，首次使用时做一次全量LIST并启动WATCH
+    # 全量LIST只持有该类型自己的锁，一个类型的LIST很慢时不影响其他类型；LIST失败时下次调用重试
+    def informer(self, kind):
+        with self._informers_lock:
+            informer = self._informers.get(kind)
+            lock = self._informer_locks.setdefault(kind, threading.Lock())
+        cache_lookup('k8s_informer', informer is not None)
+        if informer is not None:
+            return informer
+        with lock:
+            informer = self._informers.get(kind)
+            if informer is None:
+                informer = ResourceInformer(self._list_func(kind), project=PROJECTIONS.get(kind))
+                informer.start()
+                with self._informers_lock:
+                    self._informers[kind] = informer
+            return informer
+
+    @staticmethod
+    def _deployment_info(deployment):
+        return {
+            "namespace": deployment.metadata.namespace,
+            "name": deployment.metadata.name,
+            "ready": f"{deployment.status.ready_replicas}/{deployment.spec.replicas}",
+            "up_to_date": deployment.status.updated_replicas,
+            "available": deployment.status.available_replicas,
+            "age": deployment.metadata.creation_timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    @staticmethod
+    def _service_info(service):
+        return {
+            "namespace": service.metadata.namespace,
+            "name": service.metadata.name,
+            "type": service.spec.type,
+            "cluster_ip": service.spec.cluster_ip,
+            "ports": [{"port": port.port, "protocol": port.protocol} for port in service.spec.ports]
+        }
+
+    def _info_func(self, kind):
+        return {
+            'pods': PodSummary.to_dict,
+            'deployments': self._deployment_info,
+            'services': self._service_info,
+        }[kind]
+
+    # 订阅指定资源类型的变化，callback(event_type, key, obj)，obj与列表接口中的数据格式相同
+    # 所有订阅者共用informer的一个watch；重新LIST后通知RESYNC
+    def watch_changes(self, kind, callback):
+        info_func = self._info_func(kind)
+
+        def listener(event_type, obj):
+            if obj is None:
+                callback(event_type, None, None)
+                return
+            info = info_func(obj)
+            callback(event_type, f'{info["namespace"]}/{info["name"]}', info)
+        self.informer(kind).add_listener(listener)
+
+    # 获取一页数据，返回 (items, continue token)
+    def _list_page(self, kind, namespace=None, limit=None, continue_token=None):
+        list_func = self._list_func(kind, namespace)
+        project = PROJECTIONS.get(kind)
+        if project:
+            resp = list_func(limit=limit, _continue=continue_token, _preload_content=False)
+            result = loads(resp.data)
+            return [project(item) for item in result.get('items') or []], result['metadata'].get('continue')
+        result = list_func(limit=limit, _continue=continue_token)
+        return result.items, result.metadata._continue
+
+    # 流式返回列表：stream=ndjson每行一个对象，stream=json写出JSON数组
+    # 按limit（默认LIST_PAGE_SIZE）逐页向apiserver获取，从continue_token开始，只在内存中保留当前一页，每页写出一块
+    # 第一页在返回响应之前获取，这时的错误（如403、continue过期的410）以对应的状态码返回；
+    # 之后某一页失败时写出一条 {"error": ..., "continue": token} 记录后结束，可以用该token继续获取
+    def _stream_list(self, kind, namespace, stream, limit=None, continue_token=None):
+        info_func = self._info_func(kind)
+        page_size = limit or LIST_PAGE_SIZE
+        try:
+            items, next_token = self._list_page(kind, namespace, page_size, continue_token)
+        except ApiException as e:
+            return jsonify({"error": e.reason}), e.status
+        separator = b'\n' if stream == 'ndjson' else b','
+
+        def generate(items, next_token):
+            written = False
+            if stream == 'json':
+                yield b'['
+            while True:
+                records = [dumps(info_func(item)) for item in items]
+                if records:
+                    prefix = separator if written and stream == 'json' else b''
+                    suffix = separator if stream == 'ndjson' else b''
+                    yield prefix + separator.join(records) + suffix
+                    written = True
+                if not next_token:
+                    break
+                try:
+                    items, next_token = self._list_page(kind, namespace, page_size, next_token)
+                except Exception as e:
+                    error = {"error": e.reason if isinstance(e, ApiException) else str(e), "continue": next_token}
+                    prefix = separator if written and stream == 'json' else b''
+                    yield prefix + dumps(error) + (separator if stream == 'ndjson' else b'')
+                    break
+            if stream == 'json':
+                yield b']'
+
+        mimetype = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+        return Response(generate(items, next_token), mimetype=mimetype)
+
+    # 列出指定类型的资源
+    # limit/continue_token: 透传给apiserver做分页，返回 {"items": [...], "continue": token}
+    # stream: json/ndjson，分页读取并逐页写出响应，此时limit为每页的条数，continue_token为开始的位置
+    # 都不指定时从本地informer缓存读取
+    def _list_resource(self, kind, namespace=None, limit=None, continue_token=None, stream=None):
+        info_func = self._info_func(kind)
+        if stream:
+            return self._stream_list(kind, namespace, stream, limit, continue_token)
+        if limit or continue_token:
+            try:
+                items, continue_token = self._list_page(kind, namespace, limit, continue_token)
+            except ApiException as e:
+                return jsonify({"error": e.reason}), e.status
+            return jsonify({
+                "items": [info_func(item) for item in items],
+                "continue": continue_token
+            })
+        return jsonify(self.list_items(kind, namespace))
+
+    # 从informer缓存中读取指定类型资源的列表数据
+    def list_items(self, kind, namespace=None):
+        info_func = self._info_func(kind)
+        return [info_func(item) for item in self.informer(kind).list(namespace)]
+
+    # 获取所有的pods
+    def list_pods(self, limit=None, continue_token=None, stream=None):
+        return self._list_resource('pods', None, limit, continue_token, stream)
 
     # 获取所有的deployment
-    def list_deployments(self):
-        appsv1 = self.k8s_apps_api()
-        deployments = []
-        deployment_list = appsv1.list_deployment_for_all_namespaces().items
-        for deployment in deployment_list:
-            deployment_info = {
-                "namespace": deployment.metadata.namespace,
-                "name": deployment.metadata.name,
-                "ready": f"{deployment.status.ready_replicas}/{deployment.spec.replicas}",
-                "up_to_date": deployment.status.updated_replicas,
-                "available": deployment.status.available_replicas,
-                "age": deployment.metadata.creation_timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            deployments.append(deployment_info)
-        return jsonify(deployments)
+    def list_deployments(self, limit=None, continue_token=None, stream=None):
+        return self._list_resource('deployments', None, limit, continue_token, stream)
 
     # 获取所有的services
-    def list_services(self):
-        v1 = self.k8s_core_api()
-        services = []
-        service_list = v1.list_service_for_all_namespaces().items
-        for service in service_list:
-            service_info = {
-                "namespace": service.metadata.namespace,
-                "name": service.metadata.name,
-                "type": service.spec.type,
-                "cluster_ip": service.spec.cluster_ip,
-                "ports": [{"port": port.port, "protocol": port.protocol} for port in service.spec.ports]
-            }
-            services.append(service_info)
-        return jsonify(services)
+    def list_services(self, limit=None, continue_token=None, stream=None):
+        return self._list_resource('services', None, limit, continue_token, stream)
 
     # 获取所有的namespace
     def list_namespaces(self):
+        return jsonify(self.namespace_names())
+
+    def namespace_names(self):
         v1 = self.k8s_core_api()
         namespaces = []
         namespace_list = v1.list_namespace().items
         for namespace in namespace_list:
             namespaces.append(namespace.metadata.name)
-        return jsonify(namespaces)
+        return namespaces
 
     # 获取指定namespace下的pods
-    def list_namespace_pods(self, namespace):
-        v1 = self.k8s_core_api()
-        pods = []
-        pod_list = v1.list_namespaced_pod(namespace).items
-        for pod in pod_list:
-            pod_info = {
-                "namespace": pod.metadata.namespace,
-                "name": pod.metadata.name,
-                "ready": pod.status.phase,
-                "status": pod.status.phase,
-                "restarts": pod.status.container_statuses[0].restart_count,
-                "age": pod.metadata.creation_timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            pods.append(pod_info)
-        return jsonify(pods)
+    def list_namespace_pods(self, namespace, limit=None, continue_token=None, stream=None):
+        return self._list_resource('pods', namespace, limit, continue_token, stream)
 
     # 获取指定namespace下的deployments
-    def list_namespace_deployments(self, namespace):
-        appv1 = self.k8s_apps_api()
-        deployments = []
-        deployment_list = appv1.list_namespaced_deployment(namespace).items
-        for deployment in deployment_list:
-            deployment_info = {
-                "namespace": deployment.metadata.namespace,
-                "name": deployment.metadata.name,
-                "ready": f"{deployment.status.ready_replicas}/{deployment.spec.replicas}",
-                "up_to_date": deployment.status.updated_replicas,
-                "available": deployment.status.available_replicas,
-                "age": deployment.metadata.creation_timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            deployments.append(deployment_info)
-        return jsonify(deployments)
+    def list_namespace_deployments(self, namespace, limit=None, continue_token=None, stream=None):
+        return self._list_resource('deployments', namespace, limit, continue_token, stream)
 
     # 获取指定namespace下的services
-    def list_namespace_service(self, namespace):
+    def list_namespace_service(self, namespace, limit=None, continue_token=None, stream=None):
+        return self._list_resource('services', namespace, limit, continue_token, stream)
+
+    # namespace概览：并发获取pods、deployments、services、replicasets、endpoints和events，
+    # 在服务端关联（deployment通过label selector关联pods，service关联endpoints），一次返回
+    def namespace_overview(self, namespace):
         v1 = self.k8s_core_api()
-        services = []
-        service_list = v1.list_namespaced_service(namespace).items
-        for service in service_list:
-            service_info = {
-                "namespace": service.metadata.namespace,
-                "name": service.metadata.name,
-                "type": service.spec.type,
-                "cluster_ip": service.spec.cluster_ip,
-                "ports": [{"port": port.port, "protocol": port.protocol} for port in service.spec.ports]
-            }
-            services.append(service_info)
-        return jsonify(services)
+        appsv1 = self.k8s_apps_api()
+        list_funcs = {
+            'pods': v1.list_namespaced_pod,
+            'deployments': appsv1.list_namespaced_deployment,
+            'services': v1.list_namespaced_service,
+            'replicasets': appsv1.list_namespaced_replica_set,
+            'endpoints': v1.list_namespaced_endpoints,
+            'events': v1.list_namespaced_event,
+        }
+
+        def fetch(func):
+            resp = func(namespace, _preload_content=False, _request_timeout=OVERVIEW_REQUEST_TIMEOUT)
+            return json.loads(resp.data).get('items') or []
+
+        with ThreadPoolExecutor(max_workers=len(list_funcs)) as executor:
+            futures = {kind: executor.submit(fetch, func) for kind, func in list_funcs.items()}
+        results = {}
+        errors = {}
+        for kind, future in futures.items():
+            try:
+                results[kind] = future.result()
+            except ApiException as e:
+                results[kind] = []
+                errors[kind] = (e.reason, e.status)
+            except urllib3.exceptions.HTTPError as e:
+                # 连接失败、超时
+                results[kind] = []
+                errors[kind] = (str(e), 503)
+        # 全部失败时（如namespace不存在、无权限、apiserver不可达）直接返回错误
+        if len(errors) == len(list_funcs):
+            reason, status = errors['pods']
+            return jsonify({"error": reason}), status
+        errors = {kind: reason for kind, (reason, _) in errors.items()}
+        overview = build_overview(namespace, **results)
+        overview["errors"] = errors
+        return jsonify(overview)
+
+    # 并发获取容量汇总需要的nodes和metrics.k8s.io的node/pod metrics（原始JSON），pods直接读取pods informer的缓存
+    # 未安装metrics-server时metrics为None，错误记录在errors中，仍然返回requests/limits的汇总
+    def _capacity_sources(self):
+        v1 = self.k8s_core_api()
+        custom = client.CustomObjectsApi(self.api_client)
+        list_funcs = {
+            'nodes': v1.list_node,
+            'node_metrics': lambda **kwargs: custom.list_cluster_custom_object('metrics.k8s.io', 'v1beta1',
+                                                                               'nodes', **kwargs),
+            'pod_metrics': lambda **kwargs: custom.list_cluster_custom_object('metrics.k8s.io', 'v1beta1',
+                                                                              'pods', **kwargs),
+        }
+
+        def fetch(func):
+            resp = func(_preload_content=False, _request_timeout=CAPACITY_REQUEST_TIMEOUT)
+            return json.loads(resp.data).get('items') or []
+
+        with ThreadPoolExecutor(max_workers=len(list_funcs)) as executor:
+            futures = {kind: executor.submit(fetch, func) for kind, func in list_funcs.items()}
+            pods = self.informer('pods').list()
+        # nodes获取失败时本次汇总失败，保留上一次的结果
+        nodes = futures['nodes'].result()
+        metrics = {}
+        errors = {}
+        for kind in ('node_metrics', 'pod_metrics'):
+            try:
+                metrics[kind] = futures[kind].result()
+            except ApiException as e:
+                metrics[kind] = None
+                errors[kind] = e.reason
+            except Exception as e:
+                # 超时、连接失败
+                metrics[kind] = None
+                errors[kind] = str(e)
+        return nodes, pods, metrics['node_metrics'], metrics['pod_metrics'], errors
+
+    # 容量汇总，首次使用时启动后台定期刷新，最多等待CAPACITY_SYNC_TIMEOUT秒的第一次汇总
+    def capacity(self):
+        with self._capacity_lock:
+            if self._capacity is None:
+                self._capacity = CapacityMonitor(self._capacity_sources)
+                self._capacity.start()
+            monitor = self._capacity
+        monitor.wait_for_sync(CAPACITY_SYNC_TIMEOUT)
+        return monitor
+
+    # 节点的allocatable、requests/limits、实际使用量和利用率，最饱和的节点排在前面
+    def capacity_nodes(self):
+        return self._capacity_view('nodes')
+
+    # 各namespace的requests/limits、实际使用量及占集群的比例
+    def capacity_namespaces(self):
+        return self._capacity_view('namespaces')
+
+    def _capacity_view(self, view):
+        monitor = self.capacity()
+        snapshot = monitor.snapshot
+        if snapshot is None:
+            return jsonify({"error": monitor.error or "Capacity rollup is not ready yet"}), 503
+        return jsonify({
+            view: snapshot[view],
+            "errors": snapshot["errors"],
+            "updated_at": snapshot["updated_at"],
+            "duration": snapshot["duration"],
+            "stale": monitor.error
+        })
 
     # 获取指定pod的详细信息
     def get_pod_details(self, namespace, pod_name):
         v1 = self.k8s_core_api()
         try:
             pod = v1.read_namespaced_pod(name=pod_name, namespace=namespace)
-            return jsonify(pod.to_dict())
+            return jsonify(model_dict(pod))
         except client.exceptions.ApiException as e:
             return jsonify({"error": e.reason}), e.status
 
@@ -140,13 +390,13 @@ class KubernetesClient:
         appsv1 = self.k8s_apps_api()
         try:
             deployment = appsv1.read_namespaced_deployment(name=deployment_name, namespace=namespace)
-            return jsonify(deployment.to_dict())
+            return jsonify(model_dict(deployment))
         except client.exceptions.ApiException as e:
             return jsonify({"error": e.reason}), e.status
 
     # 获取指定资源的详细信息
     def describe_resource(self, namespace, resource_type, resource_name):
-        v1 = self.k8s_core_api
+        v1 = self.k8s_core_api()
         appsv1 = self.k8s_apps_api()
         try:
             if resource_type == 'pod':
@@ -157,7 +407,7 @@ class KubernetesClient:
                 resource = v1.read_namespaced_service(name=resource_name, namespace=namespace)
             else:
                 return jsonify({"error": "Invalid resource type"}), 400
-            return jsonify(resource.to_dict())
+            return jsonify(model_dict(resource))
         except client.exceptions.ApiException as e:
             return jsonify({"error": e.reason}), e.status
 
@@ -170,6 +420,23 @@ class KubernetesClient:
         except client.exceptions.ApiException as e:
             return jsonify({"error": e.reason}), e.status
 
+    # 流式获取指定pod的日志，直接转发apiserver返回的日志块，不在内存中保存完整日志
+    def stream_pod_logs(self, namespace, pod_name, container=None, tail_lines=None, since_seconds=None,
+                        timestamps=False, follow=False, fmt='sse'):
+        v1 = self.k8s_core_api()
+        try:
+            resp = v1.read_namespaced_pod_log(name=pod_name, namespace=namespace, container=container,
+                                              tail_lines=tail_lines, since_seconds=since_seconds,
+                                              timestamps=timestamps, follow=follow, _preload_content=False)
+        except client.exceptions.ApiException as e:
+            return jsonify({"error": e.reason}), e.status
+
+        def close():
+            resp.close()
+            resp.release_conn()
+
+        return log_response(resp.stream(LOG_CHUNK_SIZE), fmt, close)
+
     # 创建资源
     def create_resource(self, resource):
         v1 = self.k8s_core_api()
@@ -184,7 +451,204 @@ class KubernetesClient:
             created_resource = v1.create_namespaced_service(body=resource, namespace=resource['metadata']['namespace'])
         else:
             return jsonify({"error": "Unsupported resource type"}), 400
-        return jsonify(created_resource.to_dict()), 201
+        return jsonify(model_dict(created_resource)), 201
+
+    # 解析manifest对应的API资源，结果按(apiVersion, kind)缓存在resources中
+    # 找不到时刷新一次discovery缓存再重试（刚创建的CRD）
+    def _resolve_resource(self, manifest, resources, refreshed):
+        key = (manifest.get('apiVersion'), manifest.get('kind'))
+        if key not in resources:
+            discoverer = self.dynamic_client().resources
+            try:
+                resources[key] = discoverer.get(api_version=key[0], kind=key[1])
+            except ResourceNotFoundError:
+                if refreshed[0]:
+                    raise
+                refreshed[0] = True
+                discoverer.invalidate_cache()
+                resources[key] = discoverer.get(api_version=key[0], kind=key[1])
+        return resources[key]
+
+    @staticmethod
+    def _apply_result(manifest, namespace, dry_run, error=None):
+        return {
+            "kind": manifest.get('kind'),
+            "apiVersion": manifest.get('apiVersion'),
+            "namespace": namespace,
+            "name": (manifest.get('metadata') or {}).get('name'),
+            "dry_run": dry_run,
+            "status": "error" if error else "applied",
+            "error": error
+        }
+
+    # 对单个对象执行server-side apply（创建或更新），返回该对象的结果
+    def _apply_manifest(self, resource, manifest, dry_run=False, force_conflicts=False):
+        namespace = None
+        if resource.namespaced:
+            namespace = (manifest.get('metadata') or {}).get('namespace') or 'default'
+        try:
+            self.dynamic_client().server_side_apply(resource, body=manifest, namespace=namespace,
+                                                    field_manager=FIELD_MANAGER, force_conflicts=force_conflicts,
+                                                    dry_run='All' if dry_run else None)
+        except ApiException as e:
+            return self._apply_result(manifest, namespace, dry_run, api_error_message(e))
+        except ValueError as e:
+            return self._apply_result(manifest, namespace, dry_run, str(e))
+        return self._apply_result(manifest, namespace, dry_run)
+
+    # 等待刚apply的CRD进入Established状态，之后才能apply对应的自定义资源
+    def _wait_crds_established(self, names, timeout=CRD_ESTABLISH_TIMEOUT):
+        api = client.ApiextensionsV1Api(self.api_client)
+        deadline = time.time() + timeout
+        pending = set(names)
+        while pending and time.time() < deadline:
+            for name in list(pending):
+                try:
+                    crd = json.loads(api.read_custom_resource_definition(name, _preload_content=False).data)
+                except ApiException:
+                    continue
+                conditions = (crd.get('status') or {}).get('conditions') or []
+                if any(c.get('type') == 'Established' and c.get('status') == 'True' for c in conditions):
+                    pending.discard(name)
+            if pending:
+                time.sleep(0.5)
+        self.dynamic_client().resources.invalidate_cache()
+
+    # 批量apply：按依赖顺序分批（namespace和CRD最先），同一批内的对象并发执行server-side apply
+    # 返回每个对象的结果，单个对象失败不影响其他对象
+    # 开始之前先解析所有不是由本批CRD定义的类型，apiVersion/kind不存在或不唯一时返回400，不apply任何对象
+    def apply_manifests(self, manifests, dry_run=False, force_conflicts=False, concurrency=APPLY_CONCURRENCY):
+        concurrency = max(1, min(concurrency or APPLY_CONCURRENCY, APPLY_MAX_CONCURRENCY))
+        resources = {}
+        refreshed = [False]
+        pending_kinds = crd_kinds(manifests)
+        for manifest in manifests:
+            if (manifest.get('apiVersion'), manifest.get('kind')) in pending_kinds:
+                continue
+            try:
+                self._resolve_resource(manifest, resources, refreshed)
+            except (ResourceNotFoundError, ResourceNotUniqueError) as e:
+                kind = f"{manifest.get('apiVersion')} {manifest.get('kind')}"
+                return jsonify({"error": f"Cannot resolve resource type {kind}: {e}"}), 400
+        results = []
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for tier in group_by_tier(manifests):
+                futures = []
+                for manifest in tier:
+                    try:
+                        resource = self._resolve_resource(manifest, resources, refreshed)
+                    except (ResourceNotFoundError, ResourceNotUniqueError) as e:
+                        # 本批CRD定义的类型（dry_run时CRD没有真正创建）
+                        namespace = (manifest.get('metadata') or {}).get('namespace')
+                        futures.append(self._apply_result(manifest, namespace, dry_run, str(e)))
+                        continue
+                    futures.append(executor.submit(self._apply_manifest, resource, manifest, dry_run, force_conflicts))
+                tier_results = [future if isinstance(future, dict) else future.result() for future in futures]
+                results.extend(tier_results)
+                crds = [result["name"] for result in tier_results
+                        if result["kind"] == 'CustomResourceDefinition' and result["status"] == "applied"]
+                if crds and not dry_run:
+                    self._wait_crds_established(crds)
+                    resources.clear()
+                    refreshed[0] = False
+        failed = sum(1 for result in results if result["status"] == "error")
+        return jsonify({"total": len(results), "failed": failed, "dry_run": dry_run, "results": results})
+
+    # 对一个deployment执行rollout操作的patch
+    # image操作先检查容器是否存在，避免strategic merge patch给pod新增一个只有镜像的容器
+    def _patch_deployment(self, action, target, now):
+        appsv1 = self.k8s_apps_api()
+        result = {"namespace": target['namespace'], "name": target['name']}
+        try:
+            if action == 'image':
+                resp = appsv1.read_namespaced_deployment(target['name'], target['namespace'], _preload_content=False)
+                containers = {container['name'] for container in
+                              json.loads(resp.data)['spec']['template']['spec'].get('containers') or []}
+                missing = sorted(set(target['images']) - containers)
+                if missing:
+                    result.update({"status": "error", "error": f"Container not found: {', '.join(missing)}"})
+                    return result
+            resp = appsv1.patch_namespaced_deployment(target['name'], target['namespace'],
+                                                      rollout_patch(action, target, now), _preload_content=False)
+            deployment = json.loads(resp.data)
+            result.update({"status": "patched", "generation": deployment['metadata'].get('generation')})
+        except ApiException as e:
+            result.update({"status": "error", "error": api_error_message(e)})
+        return result
+
+    # 批量执行scale/image/restart，通过patch修改deployment，不删除重建
+    # watch: 为True时以事件流返回，patch结果之后继续推送rollout进度，直到全部完成或超时
+    def rollout(self, action, targets, concurrency=None, watch=False, timeout=ROLLOUT_TIMEOUT, fmt='sse'):
+        # 同一批restart使用相同的时间戳
+        now = datetime.datetime.utcnow()
+        with ThreadPoolExecutor(max_workers=min(concurrency or ROLLOUT_CONCURRENCY, len(targets))) as executor:
+            results = list(executor.map(lambda target: self._patch_deployment(action, target, now), targets))
+        failed = sum(1 for result in results if result["status"] == "error")
+        if not watch:
+            return jsonify({"action": action, "total": len(results), "failed": failed, "results": results})
+        keys = [(result["namespace"], result["name"]) for result in results if result["status"] == "patched"]
+        patched = {"type": "patch", "action": action, "total": len(results), "failed": failed, "results": results}
+
+        def events():
+            yield patched
+            if keys:
+                yield from self._watch_rollouts(keys, timeout)
+        return event_response(events(), fmt)
+
+    # 跟踪指定deployment的rollout进度，以事件流返回
+    def rollout_status(self, keys, timeout=ROLLOUT_TIMEOUT, fmt='sse'):
+        return event_response(self._watch_rollouts(keys, timeout), fmt)
+
+    # 每个namespace watch一次deployments和一次replicasets（不再轮询），事件汇总后输出进度
+    # 所有deployment完成、失败或超时后结束，客户端断开时关闭watch的连接，watch线程随之结束
+    def _watch_rollouts(self, keys, timeout):
+        appsv1 = self.k8s_apps_api()
+        tracker = RolloutTracker(keys)
+        events = queue.Queue()
+        watchers = []
+
+        def run(watcher, kind, list_func, namespace, **kwargs):
+            try:
+                for event in watcher.stream(list_func, namespace, timeout_seconds=timeout,
+                                            _request_timeout=timeout + ROLLOUT_WATCH_GRACE, **kwargs):
+                    events.put((kind, event['type'], event['raw_object']))
+            except ApiException as e:
+                events.put(('error', namespace, api_error_message(e)))
+            except Exception as e:
+                events.put(('error', namespace, str(e)))
+
+        for namespace in sorted({namespace for namespace, _ in keys}):
+            names = [name for key_namespace, name in keys if key_namespace == namespace]
+            # 只跟踪一个deployment时由apiserver过滤
+            selector = {'field_selector': f'metadata.name={names[0]}'} if len(names) == 1 else {}
+            for kind, list_func, kwargs in (('deployment', appsv1.list_namespaced_deployment, selector),
+                                            ('replicaset', appsv1.list_namespaced_replica_set, {})):
+                watcher = RawWatch()
+                watchers.append(watcher)
+                threading.Thread(target=run, args=(watcher, kind, list_func, namespace), kwargs=kwargs,
+                                 name=f'rollout-watch-{kind}-{namespace}', daemon=True).start()
+
+        deadline = time.time() + timeout
+        try:
+            while not tracker.done:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    yield tracker.summary(timed_out=True)
+                    return
+                try:
+                    kind, event_type, obj = events.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+                if kind == 'error':
+                    yield from tracker.fail_namespace(event_type, obj)
+                    continue
+                info = tracker.handle(kind, event_type, obj)
+                if info is not None:
+                    yield info
+            yield tracker.summary()
+        finally:
+            for watcher in watchers:
+                watcher.close()
 
     def delete_pod(self, pod_id, namespace):
         try:
@@ -198,8 +662,8 @@ class KubernetesClient:
     def delete_deployment(self, deployment_id, namespace):
         try:
             v1 = self.k8s_apps_api()
-            # 删除 Pod
+            # 删除 Deployment
             v1.delete_namespaced_deployment(deployment_id, namespace)
-            return jsonify({'message': 'Pod deleted successfully.'}), 200
+            return jsonify({'message': 'Deployment deleted successfully.'}), 200
         except ApiException as e:
             return jsonify({'error': str(e)}), e.status
@@ -0,0 +1,209 @@
+import functools
+import json
+import socket
+import threading
+
+from kubernetes import watch
+from kubernetes.client import ApiException
+
+HTTP_STATUS_GONE = 410
+
+
+class RawWatch(watch.Watch):
+    # 不把事件反序列化为model对象，event['object']直接是原始JSON的dict
+    # 记录当前watch请求的响应，close()可以在其他线程中关闭连接，使阻塞在读取上的stream立即结束
+    _response = None
+    _closed = False
+
+    def stream(self, func, *args, **kwargs):
+        @functools.wraps(func)
+        def call(*call_args, **call_kwargs):
+            self._response = func(*call_args, **call_kwargs)
+            # 请求返回之前已经close
+            if self._closed:
+                self.close()
+            return self._response
+        return super().stream(call, *args, **kwargs)
+
+    # stop()只在收到下一个事件后生效，没有事件时读取会一直阻塞，这里先shutdown socket再关闭响应
+    def close(self):
+        self._closed = True
+        self.stop()
+        response = self._response
+        if response is None:
+            return
+        sock = getattr(getattr(response, '_connection', None), 'sock', None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        response.close()
+
+    def unmarshal_event(self, data, return_type):
+        js = json.loads(data)
+        js['raw_object'] = js['object']
+        if js['type'] != 'ERROR':
+            resource_version = (js['object'].get('metadata') or {}).get('resourceVersion')
+            if resource_version:
+                self.resource_version = resource_version
+        return js
+
+
+class ResourceInformer:
+    # 本地缓存某一类资源：先做一次全量LIST，之后通过带resourceVersion的WATCH保持同步
+    # list_func: 例如 CoreV1Api().list_pod_for_all_namespaces
+    # watch_factory: 返回带有stream()/stop()的watch对象，测试时可以传入假的watch流
+    # project: 指定时以原始JSON方式LIST/WATCH，缓存中保存project(raw)的结果，而不是完整的model对象
+    def __init__(self, list_func, watch_factory=None, watch_timeout=300, retry_interval=1, project=None):
+        self.list_func = list_func
+        self.project = project
+        self.watch_factory = watch_factory or (RawWatch if project else watch.Watch)
+        self.watch_timeout = watch_timeout
+        self.retry_interval = retry_interval
+        self.resource_version = None
+        self._items = {}
+        self._namespace_index = {}
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._synced = threading.Event()
+        self._watcher = None
+        self._thread = None
+        self._listeners = []
+
+    def _key(self, obj):
+        if self.project:
+            return obj['metadata'].get('namespace') or '', obj['metadata']['name']
+        return obj.metadata.namespace or '', obj.metadata.name
+
+    def _resource_version(self, obj):
+        if self.project:
+            return obj['metadata'].get('resourceVersion')
+        return obj.metadata.resource_version
+
+    # 启动：同步执行第一次LIST（出错直接抛给调用方），然后在后台线程里WATCH
+    def start(self):
+        self._stopped.clear()
+        self.relist()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.stop()
+
+    # 注册变化通知：listener(event_type, obj)，event_type为ADDED/MODIFIED/DELETED，obj与list()返回的对象相同
+    # 重新LIST后缓存整体被替换，通知RESYNC（obj为None）
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _notify(self, event_type, obj):
+        for listener in list(self._listeners):
+            try:
+                listener(event_type, obj)
+            except Exception as e:
+                print(f"Informer listener failed: {e}")
+
+    def has_synced(self):
+        return self._synced.is_set()
+
+    # 全量LIST，替换本地缓存
+    def relist(self):
+        if self.project:
+            resp = self.list_func(_preload_content=False)
+            result = json.loads(resp.data)
+            raw_items, resource_version = result.get('items') or [], result['metadata'].get('resourceVersion')
+        else:
+            result = self.list_func()
+            raw_items, resource_version = result.items, result.metadata.resource_version
+        items = {}
+        namespace_index = {}
+        for obj in raw_items:
+            key = self._key(obj)
+            if self.project:
+                obj = self.project(obj)
+            items[key] = obj
+            namespace_index.setdefault(key[0], {})[key[1]] = obj
+        with self._lock:
+            self._items = items
+            self._namespace_index = namespace_index
+            self.resource_version = resource_version
+        self._synced.set()
+        self._notify('RESYNC', None)
+
+    # 读取缓存，namespace为空时返回全部，按namespace/name排序，与apiserver返回顺序一致
+    def list(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                source = self._items
+            else:
+                source = {(namespace, name): obj
+                          for name, obj in self._namespace_index.get(namespace, {}).items()}
+            return [source[key] for key in sorted(source)]
+
+    def get(self, namespace, name):
+        with self._lock:
+            return self._namespace_index.get(namespace or '', {}).get(name)
+
+    def namespaces(self):
+        with self._lock:
+            return sorted(self._namespace_index)
+
+    # 处理一条watch事件
+    def handle_event(self, event):
+        event_type = event['type']
+        if event_type == 'BOOKMARK':
+            with self._lock:
+                self.resource_version = event['raw_object']['metadata']['resourceVersion']
+            return
+        obj = event['raw_object'] if self.project else event['object']
+        key = self._key(obj)
+        resource_version = self._resource_version(obj)
+        if self.project:
+            obj = self.project(obj)
+        with self._lock:
+            if event_type == 'DELETED':
+                self._items.pop(key, None)
+                namespace_items = self._namespace_index.get(key[0])
+                if namespace_items is not None:
+                    namespace_items.pop(key[1], None)
+                    if not namespace_items:
+                        del self._namespace_index[key[0]]
+            else:
+                self._items[key] = obj
+                self._namespace_index.setdefault(key[0], {})[key[1]] = obj
+            self.resource_version = resource_version
+        self._notify(event_type, obj)
+
+    # 后台WATCH循环：每次watch超时后从最新的resourceVersion继续，遇到410 Gone重新LIST
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._watcher = self.watch_factory()
+                for event in self._watcher.stream(self.list_func,
+                                                  resource_version=self.resource_version,
+                                                  timeout_seconds=self.watch_timeout,
+                                                  allow_watch_bookmarks=True):
+                    if self._stopped.is_set():
+                        break
+                    self.handle_event(event)
+            except ApiException as e:
+                if e.status == HTTP_STATUS_GONE:
+                    self._relist_until_success()
+                else:
+                    print(f"Watch failed: {e.reason}")
+                    self._stopped.wait(self.retry_interval)
+            except Exception as e:
+                print(f"Watch failed: {e}")
+                self._stopped.wait(self.retry_interval)
+
+    def _relist_until_success(self):
+        while not self._stopped.is_set():
+            try:
+                self.relist()
+                return
+            except Exception as e:
+                print(f"Relist failed: {e}")
+                self._stopped.wait(self.retry_interval)
@@ -0,0 +1,113 @@
+from app.kubernetes.pod_summary import project_pod, format_timestamp
+
+# namespace概览中每个LIST请求的超时（秒），apiserver不可达或很慢时该项记为错误，其余照常返回
+OVERVIEW_REQUEST_TIMEOUT = 10
+
+
+# label selector匹配，支持matchLabels和matchExpressions（In、NotIn、Exists、DoesNotExist）
+# 空selector不匹配任何对象，与Deployment/Service的语义一致
+def selector_matches(selector, labels):
+    if not selector:
+        return False
+    labels = labels or {}
+    match_labels = selector.get('matchLabels')
+    match_expressions = selector.get('matchExpressions')
+    if match_labels is None and match_expressions is None:
+        # Service的spec.selector是普通的key/value字典
+        match_labels = selector
+    if not match_labels and not match_expressions:
+        return False
+    for key, value in (match_labels or {}).items():
+        if labels.get(key) != value:
+            return False
+    for expression in match_expressions or []:
+        key, operator, values = expression['key'], expression['operator'], expression.get('values') or []
+        if operator == 'In' and labels.get(key) not in values:
+            return False
+        if operator == 'NotIn' and key in labels and labels[key] in values:
+            return False
+        if operator == 'Exists' and key not in labels:
+            return False
+        if operator == 'DoesNotExist' and key in labels:
+            return False
+    return True
+
+
+def _labels(obj):
+    return obj['metadata'].get('labels') or {}
+
+
+def _owned_by(obj, owner):
+    return any(reference.get('uid') == owner['metadata'].get('uid')
+               for reference in obj['metadata'].get('ownerReferences') or [])
+
+
+def deployment_overview(deployment, replicasets, pods):
+    spec = deployment.get('spec') or {}
+    status = deployment.get('status') or {}
+    selector = spec.get('selector')
+    owned_replicasets = [replicaset for replicaset in replicasets if _owned_by(replicaset, deployment)]
+    return {
+        "name": deployment['metadata']['name'],
+        "ready": f"{status.get('readyReplicas')}/{spec.get('replicas')}",
+        "up_to_date": status.get('updatedReplicas'),
+        "available": status.get('availableReplicas'),
+        "age": format_timestamp(deployment['metadata'].get('creationTimestamp')),
+        "replicasets": [{
+            "name": replicaset['metadata']['name'],
+            "replicas": (replicaset.get('status') or {}).get('replicas', 0),
+            "ready": (replicaset.get('status') or {}).get('readyReplicas', 0),
+        } for replicaset in owned_replicasets],
+        "pods": [pod['metadata']['name'] for pod in pods if selector_matches(selector, _labels(pod))]
+    }
+
+
+def service_overview(service, endpoints, pods):
+    spec = service.get('spec') or {}
+    addresses = []
+    for subset in (endpoints or {}).get('subsets') or []:
+        ports = [{"port": port.get('port'), "protocol": port.get('protocol')} for port in subset.get('ports') or []]
+        for ready, key in ((True, 'addresses'), (False, 'notReadyAddresses')):
+            for address in subset.get(key) or []:
+                addresses.append({
+                    "ip": address.get('ip'),
+                    "pod": (address.get('targetRef') or {}).get('name'),
+                    "ready": ready,
+                    "ports": ports
+                })
+    return {
+        "name": service['metadata']['name'],
+        "type": spec.get('type'),
+        "cluster_ip": spec.get('clusterIP'),
+        "ports": [{"port": port.get('port'), "protocol": port.get('protocol')} for port in spec.get('ports') or []],
+        "endpoints": addresses,
+        "pods": [pod['metadata']['name'] for pod in pods if selector_matches(spec.get('selector'), _labels(pod))]
+    }
+
+
+def event_overview(event):
+    involved = event.get('involvedObject') or {}
+    return {
+        "type": event.get('type'),
+        "reason": event.get('reason'),
+        "message": event.get('message'),
+        "object": f"{involved.get('kind')}/{involved.get('name')}",
+        "count": event.get('count'),
+        "last_timestamp": format_timestamp(event.get('lastTimestamp') or event.get('eventTime')
+                                           or (event.get('metadata') or {}).get('creationTimestamp'))
+    }
+
+
+# 把同一个namespace下的各类资源（原始JSON）关联为一个结果
+def build_overview(namespace, pods, deployments, services, replicasets, endpoints, events):
+    endpoints_by_name = {item['metadata']['name']: item for item in endpoints}
+    events = [event_overview(event) for event in events]
+    events.sort(key=lambda event: event['last_timestamp'] or '', reverse=True)
+    return {
+        "namespace": namespace,
+        "pods": [project_pod(pod).to_dict() for pod in pods],
+        "deployments": [deployment_overview(deployment, replicasets, pods) for deployment in deployments],
+        "services": [service_overview(service, endpoints_by_name.get(service['metadata']['name']), pods)
+                     for service in services],
+        "events": events
+    }
@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+KUBECONFIG_FILE = "app/config/kubeconfig"
+# 并发查询多个集群时的最大线程数
+FANOUT_MAX_WORKERS = 16
+
+
+class ClusterRegistry:
+    # kubeconfig中每个context对应一个集群，每个集群一个长期复用的KubernetesClient（带连接池的ApiClient）
+    # kubeconfig在第一次使用时读取，客户端（以及kubernetes包）在第一次使用对应集群时才创建和导入
+    def __init__(self, config_file=KUBECONFIG_FILE):
+        self.config_file = config_file
+        self._contexts = None
+        self._default_context = None
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    # 只需要context列表和current-context，直接解析yaml，不导入kubernetes包
+    def _load(self):
+        if self._contexts is None:
+            with open(self.config_file) as f:
+                kubeconfig = yaml.safe_load(f) or {}
+            contexts = [context['name'] for context in kubeconfig.get('contexts') or []]
+            if not contexts:
+                raise ValueError(f"No contexts found in {self.config_file}")
+            current_context = kubeconfig.get('current-context')
+            self._default_context = current_context if current_context in contexts else contexts[0]
+            self._contexts = contexts
+        return self._contexts
+
+    @property
+    def contexts(self):
+        return self._load()
+
+    @property
+    def default_context(self):
+        self._load()
+        return self._default_context
+
+    def names(self):
+        return list(self.contexts)
+
+    # 获取指定集群的客户端，cluster为空时使用kubeconfig的current-context，集群不存在时返回None
+    def get(self, cluster=None):
+        cluster = cluster or self.default_context
+        if cluster not in self.contexts:
+            return None
+        with self._lock:
+            k8s_client = self._clients.get(cluster)
+            if k8s_client is None:
+                from app.kubernetes.k8s_client import KubernetesClient
+                k8s_client = KubernetesClient(context=cluster, config_file=self.config_file)
+                self._clients[cluster] = k8s_client
+            return k8s_client
+
+    # 在所有集群上并发执行func(k8s_client)，返回 {cluster: (result, error, latency)}
+    def fan_out(self, func, clusters=None):
+        clusters = clusters or self.names()
+
+        def call(cluster):
+            started = time.time()
+            try:
+                return cluster, func(self.get(cluster)), None, time.time() - started
+            except Exception as e:
+                return cluster, None, str(e), time.time() - started
+
+        with ThreadPoolExecutor(max_workers=min(len(clusters), FANOUT_MAX_WORKERS) or 1) as executor:
+            return {cluster: (result, error, latency)
+                    for cluster, result, error, latency in executor.map(call, clusters)}
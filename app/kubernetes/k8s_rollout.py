@@ -0,0 +1,197 @@
+import datetime
+
+# 支持的rollout操作：scale 修改副本数，image 更新容器镜像，restart 滚动重启（与kubectl rollout restart相同）
+ROLLOUT_ACTIONS = ('scale', 'image', 'restart')
+# 批量操作时同时发起的patch数
+ROLLOUT_CONCURRENCY = 16
+# 跟踪rollout进度的默认/最长时间（秒）
+ROLLOUT_TIMEOUT = 600
+ROLLOUT_MAX_TIMEOUT = 3600
+# watch请求的读超时比timeout多出的时间（秒），apiserver没有按timeout_seconds结束watch时由客户端结束
+ROLLOUT_WATCH_GRACE = 30
+RESTARTED_AT_ANNOTATION = 'kubectl.kubernetes.io/restartedAt'
+REVISION_ANNOTATION = 'deployment.kubernetes.io/revision'
+# rollout的最终状态，达到后不再跟踪
+FINAL_STATES = ('complete', 'failed', 'deleted', 'error')
+
+
+# 校验批量rollout的请求体 {"deployments": [{"namespace": "...", "name": "...", ...}]}
+# scale需要replicas，image需要images（{容器名: 镜像}），不合法时抛出ValueError
+def load_rollout_targets(data, action):
+    if action not in ROLLOUT_ACTIONS:
+        raise ValueError(f'Invalid action: {action}, expected one of {", ".join(ROLLOUT_ACTIONS)}')
+    deployments = (data or {}).get('deployments')
+    if not isinstance(deployments, list) or not deployments:
+        raise ValueError('deployments must be a non-empty list')
+    targets = []
+    seen = set()
+    for index, target in enumerate(deployments):
+        if not isinstance(target, dict) or not target.get('namespace') or not target.get('name'):
+            raise ValueError(f'deployments[{index}]: namespace and name are required')
+        key = (target['namespace'], target['name'])
+        if key in seen:
+            raise ValueError(f'deployments[{index}]: duplicate deployment {key[0]}/{key[1]}')
+        seen.add(key)
+        if action == 'scale':
+            replicas = target.get('replicas')
+            if not isinstance(replicas, int) or isinstance(replicas, bool) or replicas < 0:
+                raise ValueError(f'deployments[{index}]: replicas must be a non-negative integer')
+        if action == 'image':
+            images = target.get('images')
+            if not isinstance(images, dict) or not images or \
+                    not all(isinstance(image, str) and image for image in images.values()):
+                raise ValueError(f'deployments[{index}]: images must map container names to images')
+        targets.append(target)
+    return targets
+
+
+# 解析 ?deployment=namespace/name（可重复）为 (namespace, name) 列表
+def parse_deployment_keys(values):
+    keys = []
+    for value in values:
+        namespace, _, name = value.partition('/')
+        if not namespace or not name:
+            raise ValueError(f'Invalid deployment: {value}, expected namespace/name')
+        keys.append((namespace, name))
+    return keys
+
+
+# 对应操作的strategic merge patch，只修改相关字段，不需要删除重建deployment
+def rollout_patch(action, target, now=None):
+    if action == 'scale':
+        return {"spec": {"replicas": target['replicas']}}
+    if action == 'image':
+        containers = [{"name": name, "image": image} for name, image in target['images'].items()]
+        return {"spec": {"template": {"spec": {"containers": containers}}}}
+    now = now or datetime.datetime.utcnow()
+    return {"spec": {"template": {"metadata": {"annotations": {
+        RESTARTED_AT_ANNOTATION: now.strftime('%Y-%m-%dT%H:%M:%SZ')
+    }}}}}
+
+
+def _condition(deployment, condition_type):
+    for condition in (deployment.get('status') or {}).get('conditions') or []:
+        if condition.get('type') == condition_type:
+            return condition
+    return None
+
+
+# 根据deployment（原始JSON）计算rollout状态，判断逻辑与kubectl rollout status一致
+def rollout_status(deployment):
+    metadata = deployment.get('metadata') or {}
+    spec = deployment.get('spec') or {}
+    status = deployment.get('status') or {}
+    desired = spec.get('replicas', 1)
+    replicas = status.get('replicas', 0)
+    updated = status.get('updatedReplicas', 0)
+    available = status.get('availableReplicas', 0)
+    info = {
+        "type": "deployment",
+        "namespace": metadata.get('namespace'),
+        "name": metadata.get('name'),
+        "revision": (metadata.get('annotations') or {}).get(REVISION_ANNOTATION),
+        "desired": desired,
+        "replicas": replicas,
+        "updated": updated,
+        "ready": status.get('readyReplicas', 0),
+        "available": available,
+    }
+    if metadata.get('generation', 0) > status.get('observedGeneration', 0):
+        state, message = 'progressing', 'Waiting for deployment spec update to be observed'
+    elif (_condition(deployment, 'Progressing') or {}).get('reason') == 'ProgressDeadlineExceeded':
+        state, message = 'failed', f'Deployment {metadata.get("name")} exceeded its progress deadline'
+    elif updated < desired:
+        state, message = 'progressing', f'{updated} out of {desired} new replicas have been updated'
+    elif replicas > updated:
+        state, message = 'progressing', f'{replicas - updated} old replicas are pending termination'
+    elif available < updated:
+        state, message = 'progressing', f'{available} of {updated} updated replicas are available'
+    else:
+        state, message = 'complete', f'Deployment {metadata.get("name")} successfully rolled out'
+    info["state"] = state
+    info["message"] = message
+    return info
+
+
+# 该ReplicaSet所属的deployment名称，不属于deployment时返回None
+def owner_deployment(replica_set):
+    for owner in (replica_set.get('metadata') or {}).get('ownerReferences') or []:
+        if owner.get('kind') == 'Deployment' and owner.get('controller'):
+            return owner.get('name')
+    return None
+
+
+def replica_set_info(replica_set, deployment):
+    metadata = replica_set.get('metadata') or {}
+    status = replica_set.get('status') or {}
+    return {
+        "type": "replicaset",
+        "namespace": metadata.get('namespace'),
+        "deployment": deployment,
+        "name": metadata.get('name'),
+        "revision": (metadata.get('annotations') or {}).get(REVISION_ANNOTATION),
+        "desired": (replica_set.get('spec') or {}).get('replicas', 0),
+        "replicas": status.get('replicas', 0),
+        "ready": status.get('readyReplicas', 0),
+        "available": status.get('availableReplicas', 0),
+    }
+
+
+class RolloutTracker:
+    # 汇总deployment和ReplicaSet的watch事件，只在状态变化时输出进度事件
+    # 所有deployment都到达最终状态（complete/failed/deleted/error）后done为True
+    def __init__(self, keys):
+        self.states = {key: 'pending' for key in keys}
+        self._last = {}
+
+    @property
+    def done(self):
+        return all(state in FINAL_STATES for state in self.states.values())
+
+    def _changed(self, key, info):
+        if self._last.get(key) == info:
+            return None
+        self._last[key] = info
+        return info
+
+    # 处理一条watch事件（kind为deployment或replicaset，obj为原始JSON），返回需要输出的事件或None
+    def handle(self, kind, event_type, obj):
+        metadata = obj.get('metadata') or {}
+        namespace = metadata.get('namespace')
+        if kind == 'replicaset':
+            deployment = owner_deployment(obj)
+            key = (namespace, deployment)
+            if key not in self.states or self.states[key] in FINAL_STATES:
+                return None
+            info = replica_set_info(obj, deployment)
+            if event_type == 'DELETED':
+                info["state"] = 'deleted'
+            return self._changed(('replicaset', namespace, metadata.get('name')), info)
+        key = (namespace, metadata.get('name'))
+        if key not in self.states or self.states[key] in FINAL_STATES:
+            return None
+        if event_type == 'DELETED':
+            info = {"type": "deployment", "namespace": key[0], "name": key[1],
+                    "state": 'deleted', "message": f'Deployment {key[1]} was deleted'}
+        else:
+            info = rollout_status(obj)
+        self.states[key] = info["state"]
+        return self._changed(key, info)
+
+    # watch出错（如无权限、namespace不存在）时，该namespace下还未结束的deployment标记为error
+    def fail_namespace(self, namespace, message):
+        events = []
+        for key, state in self.states.items():
+            if key[0] == namespace and state not in FINAL_STATES:
+                self.states[key] = 'error'
+                events.append({"type": "deployment", "namespace": key[0], "name": key[1],
+                               "state": 'error', "message": message})
+        return events
+
+    def summary(self, timed_out=False):
+        return {
+            "type": "done",
+            "timed_out": timed_out,
+            "deployments": [{"namespace": key[0], "name": key[1], "state": state}
+                            for key, state in self.states.items()]
+        }
@@ -0,0 +1,54 @@
+from app.kubernetes.k8s_capacity import pod_resources
+
+
+class PodSummary:
+    # pod列表只需要的几个字段，直接从apiserver返回的原始JSON中取出，不反序列化为完整的V1Pod
+    # node_name和resources（有效的requests/limits，见pod_resources）供容量汇总直接使用informer缓存
+    __slots__ = ('namespace', 'name', 'phase', 'ready_containers', 'total_containers', 'restarts', 'created',
+                 'node_name', 'resources')
+
+    def __init__(self, namespace, name, phase, ready_containers, total_containers, restarts, created,
+                 node_name=None, resources=(0.0, 0.0, 0.0, 0.0)):
+        self.namespace = namespace
+        self.name = name
+        self.phase = phase
+        self.ready_containers = ready_containers
+        self.total_containers = total_containers
+        self.restarts = restarts
+        self.created = created
+        self.node_name = node_name
+        self.resources = resources
+
+    def to_dict(self):
+        return {
+            "namespace": self.namespace,
+            "name": self.name,
+            "ready": f"{self.ready_containers}/{self.total_containers}",
+            "status": self.phase,
+            "restarts": self.restarts,
+            "age": self.created
+        }
+
+
+# "2024-01-01T08:00:00Z" -> "2024-01-01 08:00:00"，与 creation_timestamp.strftime("%Y-%m-%d %H:%M:%S") 一致
+def format_timestamp(timestamp):
+    return timestamp[:10] + ' ' + timestamp[11:19] if timestamp else None
+
+
+# 从原始JSON中投影出PodSummary，还没有container_statuses的pod（如Pending）按0个就绪、0次重启计算
+def project_pod(raw):
+    metadata = raw.get('metadata') or {}
+    spec = raw.get('spec') or {}
+    status = raw.get('status') or {}
+    container_statuses = status.get('containerStatuses') or ()
+    return PodSummary(
+        metadata.get('namespace'),
+        metadata.get('name'),
+        status.get('phase'),
+        sum(1 for container in container_statuses if container.get('ready')),
+        len(spec.get('containers') or ()) or len(container_statuses),
+        sum(container.get('restartCount', 0) for container in container_statuses),
+        format_timestamp(metadata.get('creationTimestamp')),
+        spec.get('nodeName'),
+        tuple(pod_resources(raw))
+    )
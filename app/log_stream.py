@@ -0,0 +1,102 @@
+import json
+
+from flask import Response
+
+# 每次从apiserver读取的日志块大小
+LOG_CHUNK_SIZE = 16 * 1024
+# 单行最大长度，超过后直接切分输出，保证缓冲区大小有上限
+MAX_LINE_SIZE = 64 * 1024
+
+
+# 解析日志流接口的参数：tail_lines、since_seconds、timestamps、follow、format，参数不合法时返回None
+def log_options(args):
+    tail_lines = args.get('tail_lines', type=int)
+    since_seconds = args.get('since_seconds', type=int)
+    fmt = args.get('format', 'sse')
+    if (tail_lines is not None and tail_lines < 0) or (since_seconds is not None and since_seconds <= 0):
+        return None
+    if fmt not in ('sse', 'text'):
+        return None
+    return {
+        'tail_lines': tail_lines,
+        'since_seconds': since_seconds,
+        'timestamps': args.get('timestamps', 'false').lower() in ('1', 'true', 'yes'),
+        'follow': args.get('follow', 'false').lower() in ('1', 'true', 'yes'),
+        'fmt': fmt
+    }
+
+
+# 把日志块切分为行，只缓存最后一个不完整的行
+def iter_lines(chunks, max_line_size=MAX_LINE_SIZE):
+    buffer = bytearray()
+    for chunk in chunks:
+        start = len(buffer)
+        buffer.extend(chunk)
+        newline = buffer.find(b'\n', start)
+        while newline != -1:
+            yield bytes(buffer[:newline])
+            del buffer[:newline + 1]
+            newline = buffer.find(b'\n')
+        while len(buffer) > max_line_size:
+            yield bytes(buffer[:max_line_size])
+            del buffer[:max_line_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+# 把日志流包装为响应：fmt=sse 每行一个 server-sent event，fmt=text 原样分块输出
+# 生成器由WSGI服务器按需拉取，客户端读得慢时不会继续从上游读取，内存中最多只有一个块
+# close: 客户端断开或日志结束时关闭上游连接
+def log_response(chunks, fmt='sse', close=None):
+    def generate_sse():
+        try:
+            for line in iter_lines(chunks):
+                yield 'data: ' + line.decode('utf-8', errors='replace').rstrip('\r') + '\n\n'
+            yield 'event: end\ndata: \n\n'
+        finally:
+            if close:
+                close()
+
+    def generate_text():
+        try:
+            for chunk in chunks:
+                yield chunk
+        finally:
+            if close:
+                close()
+
+    if fmt == 'text':
+        response = Response(generate_text(), mimetype='text/plain')
+    else:
+        response = Response(generate_sse(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭nginx等反向代理的缓冲，保证日志实时到达
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# 事件流的格式：sse 每个事件一个 server-sent event（event为事件的type），ndjson 每行一个JSON
+EVENT_MIMETYPES = {'sse': 'text/event-stream', 'ndjson': 'application/x-ndjson'}
+EVENT_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def format_event(event, fmt='sse'):
+    if fmt == 'ndjson':
+        return json.dumps(event) + '\n'
+    return f'event: {event.get("type", "message")}\ndata: {json.dumps(event)}\n\n'
+
+
+# 把事件（dict）流包装为响应（格式见EVENT_MIMETYPES）
+# close: 客户端断开或事件结束时调用
+def event_response(events, fmt='sse', close=None):
+    def generate():
+        try:
+            for event in events:
+                yield format_event(event, fmt)
+        finally:
+            if close:
+                close()
+
+    response = Response(generate(), mimetype=EVENT_MIMETYPES.get(fmt, EVENT_MIMETYPES['sse']))
+    response.headers.extend(EVENT_HEADERS)
+    return response
@@ -0,0 +1,183 @@
+import time
+
+from flask import g, request
+from prometheus_client import Counter, Gauge, Histogram
+
+# 请求耗时的分桶（秒），覆盖从读缓存的毫秒级请求到导出镜像这类慢请求
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds',
+                            'Time spent handling requests, until the response headers are ready',
+                            ['method', 'endpoint', 'status'], buckets=LATENCY_BUCKETS)
+REQUESTS_IN_PROGRESS = Gauge('http_requests_in_progress', 'Requests currently being handled', ['endpoint'])
+
+# operation为去掉名称、id后的路径模板，如 /api/v1/namespaces/{namespace}/pods/{name}/log、/containers/{id}/start
+OUTBOUND_LATENCY = Histogram('outbound_request_duration_seconds',
+                             'Time spent on calls to the Docker engine and the Kubernetes apiserver',
+                             ['backend', 'target', 'method', 'operation', 'status'], buckets=LATENCY_BUCKETS)
+OUTBOUND_RESPONSE_BYTES = Counter('outbound_response_bytes',
+                                  'Response bytes received from the Docker engine and the Kubernetes apiserver',
+                                  ['backend', 'target', 'method', 'operation'])
+OUTBOUND_IN_PROGRESS = Gauge('outbound_requests_in_progress', 'Outbound calls currently in flight',
+                             ['backend', 'target'])
+
+CACHE_REQUESTS = Counter('cache_requests', 'Cache lookups, hit ratio = hit / (hit + miss)', ['cache', 'result'])
+
+EVENT_SUBSCRIBERS = Gauge('event_hub_subscribers', 'Subscribers of the event hub', ['topic'])
+EVENT_QUEUE_EVENTS = Counter('event_hub_queue_events',
+                             'Events not delivered one by one to a subscriber: coalesced, dropped or resync',
+                             ['topic', 'result'])
+
+# stage: to_dict（kubernetes模型对象转为dict）、encode（jsonify编码，包括按参数裁剪）
+SERIALIZATION_LATENCY = Histogram('response_serialization_duration_seconds',
+                                  'Time spent converting API objects to dicts and encoding JSON responses',
+                                  ['stage'], buckets=LATENCY_BUCKETS)
+
+RESPONSE_BODY_BYTES = Counter('http_response_body_bytes', 'Compressed response bodies before and after encoding',
+                              ['encoding', 'stage'])
+
+
+# 记录一次缓存查询的结果
+def cache_lookup(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+# 按蓝图路由（endpoint，如 docker.list_containers、k8s_cluster.list_pods）统计请求耗时和并发数
+# 流式响应只统计到响应头返回为止
+def instrument_app(app):
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_endpoint = request.endpoint or 'none'
+        REQUESTS_IN_PROGRESS.labels(g.metrics_endpoint).inc()
+
+    def observe(status):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            REQUEST_LATENCY.labels(request.method, g.metrics_endpoint, status).observe(time.perf_counter() - started)
+
+    @app.after_request
+    def observe_request(response):
+        observe(response.status_code)
+        return response
+
+    # 未处理的异常不会经过after_request，按500统计
+    @app.teardown_request
+    def finish_request(exc):
+        observe(500)
+        endpoint = g.pop('metrics_endpoint', None)
+        if endpoint is not None:
+            REQUESTS_IN_PROGRESS.labels(endpoint).dec()
+
+
+# docker api的路径模板：去掉版本前缀，容器、网络、卷的id和镜像名（可能带 /）替换为 {id}
+# 如 /v1.41/containers/abc/start -> /containers/{id}/start，/images/library/nginx:1/json -> /images/{id}/json
+DOCKER_COLLECTION_ACTIONS = ('json', 'create', 'prune', 'load', 'get', 'search')
+DOCKER_IMAGE_ACTIONS = ('json', 'history', 'push', 'tag', 'get')
+
+
+def docker_operation(path):
+    parts = [part for part in path.split('?', 1)[0].split('/') if part]
+    if parts and parts[0].startswith('v1.'):
+        parts = parts[1:]
+    if len(parts) <= 1 or (len(parts) == 2 and parts[1] in DOCKER_COLLECTION_ACTIONS):
+        return '/' + '/'.join(parts)
+    if parts[0] == 'images':
+        action = parts[-1] if len(parts) > 2 and parts[-1] in DOCKER_IMAGE_ACTIONS else None
+        return '/images/{id}' + (f'/{action}' if action else '')
+    return '/' + '/'.join([parts[0], '{id}'] + parts[2:])
+
+
+# kubernetes api的路径模板：/api/v1 或 /apis/<group>/<version> 之后的namespace和对象名替换为 {namespace}、{name}
+# 如 /api/v1/namespaces/default/pods/web-1/log -> /api/v1/namespaces/{namespace}/pods/{name}/log
+def kubernetes_operation(url):
+    path = url.split('?', 1)[0]
+    if '://' in path:
+        path = '/' + path.split('://', 1)[1].partition('/')[2]
+    parts = [part for part in path.split('/') if part]
+    if parts[:1] == ['api']:
+        template, parts = parts[:2], parts[2:]
+    elif parts[:1] == ['apis'] and len(parts) >= 3:
+        template, parts = parts[:3], parts[3:]
+    else:
+        return '/' + '/'.join(parts)
+    if len(parts) >= 3 and parts[0] == 'namespaces':
+        template += ['namespaces', '{namespace}']
+        parts = parts[2:]
+    if parts:
+        template.append(parts[0])
+    if len(parts) >= 2:
+        template.append('{namespace}' if parts[0] == 'namespaces' else '{name}')
+    template.extend(parts[2:])
+    return '/' + '/'.join(template)
+
+
+# 已经读完的响应按实际长度计，流式响应只能按Content-Length计（chunked的不计）
+def _response_bytes(backend, target, method, operation, body=None, headers=None):
+    if body is None:
+        length = headers.get('Content-Length') if headers is not None else None
+        if not length or not length.isdigit():
+            return
+        size = int(length)
+    else:
+        size = len(body)
+    OUTBOUND_RESPONSE_BYTES.labels(backend, target, method, operation).inc(size)
+
+
+# docker的APIClient是一个requests.Session，包装它的send统计每次调用，target为docker主机
+def instrument_docker_api(api, target='local', backend='docker'):
+    send = api.send
+    in_progress = OUTBOUND_IN_PROGRESS.labels(backend, target)
+
+    def timed_send(prepared, **kwargs):
+        started = time.perf_counter()
+        status = 'error'
+        operation = docker_operation(prepared.path_url)
+        in_progress.inc()
+        try:
+            response = send(prepared, **kwargs)
+            status = response.status_code
+            if kwargs.get('stream'):
+                _response_bytes(backend, target, prepared.method, operation, headers=response.headers)
+            else:
+                _response_bytes(backend, target, prepared.method, operation, response.content)
+            return response
+        finally:
+            in_progress.dec()
+            OUTBOUND_LATENCY.labels(backend, target, prepared.method, operation, status).observe(
+                time.perf_counter() - started)
+
+    api.send = timed_send
+    return api
+
+
+# kubernetes的ApiClient所有请求（包括动态客户端、watch）都经过ApiClient.request，包装它统计每次调用
+# target为kubeconfig中的context
+def instrument_kubernetes_api(api_client, target='default', backend='kubernetes'):
+    from kubernetes.client import ApiException
+    from kubernetes.client.rest import RESTResponse
+    send = api_client.request
+    in_progress = OUTBOUND_IN_PROGRESS.labels(backend, target)
+
+    def timed_request(method, url, *args, **kwargs):
+        started = time.perf_counter()
+        status = 'error'
+        operation = kubernetes_operation(url)
+        in_progress.inc()
+        try:
+            response = send(method, url, *args, **kwargs)
+            status = response.status
+            if isinstance(response, RESTResponse):
+                _response_bytes(backend, target, method, operation, response.data)
+            else:
+                _response_bytes(backend, target, method, operation, headers=response.headers)
+            return response
+        except ApiException as e:
+            status = e.status
+            raise
+        finally:
+            in_progress.dec()
+            OUTBOUND_LATENCY.labels(backend, target, method, operation, status).observe(time.perf_counter() - started)
+
+    api_client.request = timed_request
+    return api_client
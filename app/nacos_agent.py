@@ -0,0 +1,150 @@
+import random
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Nacos服务端地址
+NACOS_SERVER = 'http://192.168.186.1:8848'
+NACOS_NAMESPACE_ID = '3d2a526c-a80d-40d7-8754-3e9870b0b41b'
+NACOS_USERNAME = 'nacos'
+NACOS_PASSWORD = 'nacos'
+SERVICE_NAME = 'kubernetes-management-service'
+SERVICE_PORT = 31001
+# 心跳间隔（秒），Nacos返回clientBeatInterval时以服务端为准
+BEAT_INTERVAL = 5
+# 连接/读取超时（秒），保证一次心跳不会超过心跳间隔太久
+REQUEST_TIMEOUT = (2, 3)
+# 失败重试的退避时间：BACKOFF_BASE * 2^n，最大BACKOFF_MAX，带随机抖动
+BACKOFF_BASE = 1
+BACKOFF_MAX = 30
+# token在有效期（tokenTtl）过去这个比例后刷新
+TOKEN_REFRESH_RATIO = 0.8
+# Nacos心跳返回的code：实例已不存在（如被服务端摘除），需要重新注册
+INSTANCE_NOT_FOUND = 20404
+
+
+class NacosAgent:
+    # 在后台线程中完成服务注册和心跳，stop时注销实例
+    # 所有请求复用一个keep-alive的Session，失败按指数退避重试，不会因为一次网络异常退出
+    def __init__(self, server=NACOS_SERVER, namespace_id=NACOS_NAMESPACE_ID, service_name=SERVICE_NAME,
+                 port=SERVICE_PORT, username=NACOS_USERNAME, password=NACOS_PASSWORD, ip=None,
+                 beat_interval=BEAT_INTERVAL, timeout=REQUEST_TIMEOUT):
+        self.server = server.rstrip('/')
+        self.namespace_id = namespace_id
+        self.service_name = service_name
+        self.port = port
+        self.username = username
+        self.password = password
+        self.ip = ip
+        self.beat_interval = beat_interval
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.registered = False
+        self._access_token = None
+        self._token_refresh_at = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='nacos-agent', daemon=True)
+        self._thread.start()
+
+    # 停止心跳并从Nacos注销实例
+    def stop(self, deregister=True):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=sum(self.timeout) * 2)
+        if deregister and self.registered:
+            try:
+                res = self._request('DELETE', '/nacos/v1/ns/instance', self._instance_params())
+                print("从nacos注册中心注销服务，注销响应状态： {}".format(res.status_code))
+            except requests.RequestException as e:
+                print("从nacos注册中心注销服务失败： {}".format(e))
+            self.registered = False
+        self.session.close()
+
+    # 登录获取accessToken，按返回的tokenTtl决定下次刷新时间
+    def login(self):
+        res = self.session.post(self.server + '/nacos/v1/auth/login', timeout=self.timeout,
+                                data={'username': self.username, 'password': self.password})
+        res.raise_for_status()
+        body = res.json()
+        self._access_token = body.get('accessToken')
+        self._token_refresh_at = time.monotonic() + body.get('tokenTtl', 18000) * TOKEN_REFRESH_RATIO
+
+    def _token(self):
+        if self._access_token is None or time.monotonic() >= self._token_refresh_at:
+            self.login()
+        return self._access_token
+
+    # 带token发送请求，403时（token失效）重新登录后重试一次
+    def _request(self, method, path, params):
+        for attempt in range(2):
+            headers = {"Authorization": f"Bearer {self._token()}"}
+            res = self.session.request(method, self.server + path, headers=headers, params=params,
+                                       timeout=self.timeout)
+            if res.status_code != 403 or attempt:
+                return res
+            self._access_token = None
+        return res
+
+    def _instance_params(self):
+        return {
+            "serviceName": self.service_name,
+            "ip": self.ip,
+            "port": self.port,
+            "namespaceId": self.namespace_id
+        }
+
+    def register(self):
+        res = self._request('POST', '/nacos/v1/ns/instance', self._instance_params())
+        res.raise_for_status()
+        self.registered = True
+        print("向nacos注册中心，发起服务注册请求，注册响应状态： {}".format(res.status_code))
+
+    # 发送一次心跳，返回服务端要求的下次心跳间隔（秒）
+    def beat(self):
+        res = self._request('PUT', '/nacos/v1/ns/instance/beat', self._instance_params())
+        res.raise_for_status()
+        body = res.json() if res.content else {}
+        if body.get('code') == INSTANCE_NOT_FOUND:
+            print("nacos中服务实例已不存在，重新注册")
+            self.register()
+        if body.get('clientBeatInterval'):
+            return body['clientBeatInterval'] / 1000
+        return self.beat_interval
+
+    # 带抖动的指数退避：在 [delay/2, delay] 之间随机，避免多个实例同时重试
+    @staticmethod
+    def _backoff(failures):
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** min(failures, 16))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _run(self):
+        failures = 0
+        next_beat = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                # 容器中主机名可能解析不到（socket.gaierror），与注册失败一样退避重试
+                if self.ip is None:
+                    self.ip = socket.gethostbyname(socket.gethostname())
+                if not self.registered:
+                    self.register()
+                    interval = self.beat_interval
+                else:
+                    interval = self.beat()
+                failures = 0
+                # 按固定节奏发送心跳，请求耗时不累加到间隔上
+                next_beat = max(next_beat + interval, time.monotonic())
+                wait = next_beat - time.monotonic()
+            except (requests.RequestException, OSError, ValueError) as e:
+                wait = self._backoff(failures)
+                failures += 1
+                print("nacos{}失败，{:.1f}秒后重试： {}".format('心跳' if self.registered else '注册', wait, e))
+                next_beat = time.monotonic() + wait
+            self._stop.wait(wait)
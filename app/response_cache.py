@@ -0,0 +1,188 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request, Response
+
+from app.json_response import compress, compressible, negotiate_encoding
+from app.metrics import cache_lookup
+
+# 缓存的响应条数上限，超过后淘汰最久未使用的
+RESPONSE_CACHE_SIZE = 256
+# 等待同一个key正在执行的请求的最长时间（秒），超时后自己执行
+SINGLE_FLIGHT_TIMEOUT = 10
+
+
+class CachedResponse:
+    # variants: 按Content-Encoding缓存的压缩结果，第一次有客户端需要时生成，之后的命中直接返回
+    __slots__ = ('body', 'status', 'headers', 'mimetype', 'etag', 'expires', 'group', 'variants')
+
+    def __init__(self, body, status, headers, mimetype, etag, expires, group):
+        self.body = body
+        self.status = status
+        self.headers = headers
+        self.mimetype = mimetype
+        self.etag = etag
+        self.expires = expires
+        self.group = group
+        self.variants = {}
+
+    # 每个请求生成一个新的Response，按Accept-Encoding返回压缩结果，If-None-Match匹配时返回304
+    def to_response(self):
+        body = self.body
+        encoding = None
+        if compressible(self.mimetype, len(body)):
+            encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is not None:
+            body = self.variants.get(encoding)
+            if body is None:
+                body = self.variants[encoding] = compress(self.body, encoding)
+        response = Response(body, status=self.status, headers=self.headers)
+        if compressible(self.mimetype, len(self.body)):
+            response.vary.add('Accept-Encoding')
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(self.etag, weak=encoding is not None)
+        return response.make_conditional(request)
+
+
+class ResponseCache:
+    # GET接口的响应缓存：按请求路径（含query string）缓存一小段时间（每个路由单独设置TTL），LRU限制条数
+    # 同一个key的并发请求只有一个真正执行（single-flight），其余最多等待wait_timeout秒并复用其结果
+    # 修改类接口按分组使缓存失效，分组按 / 分层（如 k8s/<集群>/pods、docker/<主机>/containers），
+    # 一个分组失效时，它的上层分组（如集群级的概览、跨集群列表）和下层分组也一起失效，其他集群、主机、资源类型不受影响
+    # 分组可以是字符串，或在请求中调用、返回分组名的函数
+    # enabled为False时cached装饰的视图直接执行，既不缓存也不合并并发请求（压测对比用）
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, wait_timeout=SINGLE_FLIGHT_TIMEOUT, enabled=True):
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry, generation):
+        with self._lock:
+            # 执行期间相关的分组已失效，结果可能是旧数据，不再缓存
+            if self._generation(entry.group) != generation:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _related(group, other):
+        return group == other or group.startswith(other + '/') or other.startswith(group + '/')
+
+    @staticmethod
+    def _resolve(group):
+        return group() if callable(group) else group
+
+    # 与分组相关（本身、上层和下层）的失效次数之和，只会增加，用于判断执行期间是否有相关的失效
+    def _generation(self, group):
+        return sum(count for name, count in self._generations.items() if self._related(name, group))
+
+    # 使一个分组及其上层、下层分组的缓存失效
+    def invalidate(self, group):
+        with self._lock:
+            self._generations[group] = self._generations.get(group, 0) + 1
+            for key in [key for key, entry in self._entries.items() if self._related(entry.group, group)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # 执行视图函数，只缓存非流式的200响应，ETag使用视图已经设置的，否则用内容的hash
+    @staticmethod
+    def _render(view, args, kwargs, ttl, group):
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return response, None
+        body = response.get_data()
+        etag, _ = response.get_etag()
+        if etag is None:
+            etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        headers = [(name, value) for name, value in response.headers
+                   if name not in ('Content-Length', 'ETag', 'Set-Cookie')]
+        return response, CachedResponse(body, response.status_code, headers, response.mimetype, etag,
+                                        time.monotonic() + ttl, group)
+
+    # 装饰GET视图函数
+    def cached(self, ttl, group):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                key = request.full_path
+                entry = self._get(key)
+                cache_lookup('response', entry is not None)
+                if entry is not None:
+                    return entry.to_response()
+                group_name = self._resolve(group)
+                with self._lock:
+                    event = self._inflight.get(key)
+                    leader = event is None
+                    if leader:
+                        event = self._inflight[key] = threading.Event()
+                    generation = self._generation(group_name)
+                if not leader:
+                    if event.wait(self.wait_timeout):
+                        entry = self._get(key)
+                        if entry is not None:
+                            return entry.to_response()
+                    # 执行的请求失败、超时或结果不可缓存，自己执行一次
+                    response, _ = self._render(view, args, kwargs, ttl, group_name)
+                    return response
+                try:
+                    response, entry = self._render(view, args, kwargs, ttl, group_name)
+                    if entry is None:
+                        return response
+                    self._put(key, entry, generation)
+                    return entry.to_response()
+                finally:
+                    with self._lock:
+                        del self._inflight[key]
+                    event.set()
+            return wrapper
+        return decorator
+
+    # 装饰修改类视图函数：执行后使这些分组的缓存失效，流式响应在输出结束时再失效一次
+    def invalidates(self, *groups):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                names = [self._resolve(group) for group in groups]
+
+                def invalidate():
+                    for name in names:
+                        self.invalidate(name)
+                try:
+                    response = current_app.make_response(view(*args, **kwargs))
+                finally:
+                    invalidate()
+                if response.is_streamed:
+                    response.call_on_close(invalidate)
+                return response
+            return wrapper
+        return decorator
+
+
+# docker和k8s接口共用的缓存
+response_cache = ResponseCache()
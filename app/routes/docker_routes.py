@@ -1,68 +1,183 @@
-import docker
-from flask import jsonify, Blueprint, request
-from app.docker.docker_client import DockerClient
+from flask import jsonify, Blueprint, request, g, abort, make_response
+from werkzeug.local import LocalProxy
+from app.docker.docker_registry import DockerHostRegistry, DEFAULT_HOST
+from app.docker.image_export import export_chunk_size
+from app.log_stream import log_options
+from app.response_cache import response_cache
+
+docker_hosts = DockerHostRegistry()
+
+
+# 获取主机的客户端，连接不上docker时直接返回错误
+def host_client(host=None):
+    from docker.errors import DockerException
+    try:
+        return docker_hosts.get(host)
+    except DockerException as e:
+        abort(make_response(jsonify({"error": f"Cannot connect to docker host {host or 'local'}: {e}"}), 503))
+
+
+# 当前请求对应主机的客户端：/docker/hosts/<host>/... 使用指定主机，/docker/... 使用本机
+docker_client = LocalProxy(lambda: g.get('docker_client') or host_client())
 
 app = Blueprint('docker', __name__)
 
-docker_client = DockerClient()
+# 主机列表和跨主机查询接口
+hosts_app = Blueprint('docker_hosts', __name__)
+
+FANOUT_KINDS = ('containers', 'images')
+
+
+# 当前请求的响应缓存分组：docker/<主机>，带kind时为 docker/<主机>/<kind>，修改只使对应主机、对应资源的缓存失效
+def docker_group(kind=None):
+    def group():
+        client = g.get('docker_client')
+        group_name = f"docker/{client.host if client is not None else DEFAULT_HOST}"
+        return f"{group_name}/{kind}" if kind else group_name
+    return group
+
+
+@app.url_value_preprocessor
+def select_host(endpoint, values):
+    host = values.pop('host', None) if values else None
+    if host is None:
+        return
+    g.docker_client = host_client(host)
+    if g.docker_client is None:
+        abort(make_response(jsonify({"error": f"Unknown host: {host}"}), 404))
+
+
+# get到所有的docker主机
+@hosts_app.route('', methods=['GET'])
+def list_hosts():
+    return jsonify({"hosts": docker_hosts.names()})
+
+
+# 并发查询所有主机的containers/images并合并，每条数据带上host字段
+@hosts_app.route('/all/<kind>', methods=['GET'])
+@response_cache.cached(ttl=5, group='docker')
+def list_all_hosts(kind):
+    if kind not in FANOUT_KINDS:
+        return jsonify({"error": "Invalid resource type"}), 400
+    if kind == 'containers':
+        results = docker_hosts.fan_out(lambda client: client.container_items()[0])
+    else:
+        results = docker_hosts.fan_out(lambda client: client.image_items()[0])
+    items = []
+    hosts = []
+    for host, (result, error, latency) in results.items():
+        for item in result or []:
+            item["host"] = host
+            items.append(item)
+        hosts.append({
+            "host": host,
+            "count": len(result) if result is not None else 0,
+            "latency": round(latency, 3),
+            "error": error
+        })
+    return jsonify({"items": items, "hosts": hosts})
 
 
 # get到所有的container
 @app.route('/containers', methods=['GET'])
+@response_cache.cached(ttl=2, group=docker_group('containers'))
 def list_containers():
     return docker_client.list_containers()
 
 
 # get到所有images
 @app.route('/images', methods=['GET'])
+@response_cache.cached(ttl=2, group=docker_group('images'))
 def get_images():
     return docker_client.list_images()
 
 
 # 启动指定容器
 @app.route('/start/<container_id>', methods=['POST'])
+@response_cache.invalidates(docker_group('containers'))
 def start_container(container_id):
     return docker_client.start_container(container_id)
 
 
 # 停止指定容器
 @app.route('/stop/<container_id>', methods=['POST'])
+@response_cache.invalidates(docker_group('containers'))
 def stop_container(container_id):
     return docker_client.stop_container(container_id)
 
 
 # 重启指定容器
 @app.route('/restart/<container_id>', methods=['POST'])
+@response_cache.invalidates(docker_group('containers'))
 def restart_container(container_id):
     return docker_client.restart_container(container_id)
 
 
 # 查看指定容器的详细信息
 @app.route('/<container_id>', methods=['GET'])
+@response_cache.cached(ttl=2, group=docker_group('containers'))
 def get_container_details(container_id):
     return docker_client.get_container_details(container_id)
 
 
 # 查看 Docker 容器健康状态
 @app.route('/health/<container_id>', methods=['GET'])
+@response_cache.cached(ttl=2, group=docker_group('containers'))
 def get_container_health(container_id):
     return docker_client.get_container_health(container_id)
 
 
+# 所有运行中容器的最新stats（后台采样，立即返回）
+@app.route('/stats', methods=['GET'])
+def list_container_stats():
+    return docker_client.list_container_stats()
+
+
+# 指定容器最近一段时间的stats，?window=60 表示最近60秒
+@app.route('/stats/<container_id>', methods=['GET'])
+def get_container_stats(container_id):
+    window = request.args.get('window', type=int)
+    if window is not None and window <= 0:
+        return jsonify({'error': 'window must be a positive integer'}), 400
+    return docker_client.get_container_stats(container_id, window)
+
+
 # 查看容器日志接口
 @app.route('/logs/<container_id>', methods=['GET'])
 def get_container_logs(container_id):
     return docker_client.get_container_logs(container_id)
 
 
+# 流式查看容器日志接口
+# ?tail_lines=100&since_seconds=3600&timestamps=true&follow=true&format=sse|text
+@app.route('/logs/<container_id>/stream', methods=['GET'])
+def stream_container_logs(container_id):
+    options = log_options(request.args)
+    if options is None:
+        return jsonify({"error": "Invalid tail_lines, since_seconds or format parameter"}), 400
+    return docker_client.stream_container_logs(container_id, **options)
+
+
 # 删除容器接口
 @app.route('/delete/<container_id>', methods=['DELETE'])
+@response_cache.invalidates(docker_group('containers'))
 def delete_container(container_id):
     return docker_client.delete_container(container_id)
 
 
+# 批量操作容器接口
+@app.route('/bulk', methods=['POST'])
+@response_cache.invalidates(docker_group('containers'))
+def bulk_containers():
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'Request body is required'}), 400
+    return docker_client.bulk_containers(data)
+
+
 # 查看docker网络接口
 @app.route('/networks', methods=['GET'])
+@response_cache.cached(ttl=2, group=docker_group('networks'))
 def list_networks():
     return docker_client.list_networks()
 
@@ -70,31 +185,72 @@ def list_networks():
 # 下载镜像接口
 @app.route('/images/download', methods=['POST'])
 def download_image():
+    from docker.errors import ImageNotFound
     data = request.get_json()
     image_id = data.get('image_id')
     tar_name = data.get("tar_name")
     if not image_id:
         return jsonify({"error": "Image ID is required"}), 400
+    try:
+        chunk_size = export_chunk_size(data.get('chunk_size'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     try:
         # 保存镜像到本地路径
-        return docker_client.download_image(image_id, tar_name)
-    except docker.errors.ImageNotFound:
+        return docker_client.download_image(image_id, tar_name,
+                                            compression=data.get('compression'),
+                                            accept_encoding=request.headers.get('Accept-Encoding'),
+                                            chunk_size=chunk_size)
+    except ImageNotFound:
         return jsonify({'error': 'Image not found'}), 404
 
 
+# 下载镜像接口（GET），便于断点续传
+# ?tar_name=xxx&compression=gzip|zstd|none&chunk_size=2097152
+@app.route('/images/download/<path:image_id>', methods=['GET'])
+def download_image_get(image_id):
+    try:
+        chunk_size = export_chunk_size(request.args.get('chunk_size'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return docker_client.download_image(image_id, request.args.get('tar_name'),
+                                        compression=request.args.get('compression'),
+                                        accept_encoding=request.headers.get('Accept-Encoding'),
+                                        chunk_size=chunk_size)
+
+
 # 删除镜像接口
 @app.route('/deleteImg/<image_id>', methods=['DELETE'])
+@response_cache.invalidates(docker_group())
 def delete_image(image_id):
     return docker_client.delete_image(image_id)
 
 
+# 镜像清理接口，默认只返回清理计划（dry run）
+# {"mode": "dangling"|"unused", "older_than": 86400, "include_stopped": false, "dry_run": true, "concurrency": 16}
+@app.route('/images/gc', methods=['POST'])
+@response_cache.invalidates(docker_group())
+def image_gc():
+    return docker_client.image_gc(request.get_json(silent=True) or {})
+
+
 @app.route('/create', methods=['POST'])
+@response_cache.invalidates(docker_group('containers'))
 def create_container():
     data = request.get_json()
     return docker_client.create_container(data)
 
 
+# 加载镜像，镜像列表失效；加载的镜像可能移动已有的tag，容器列表中的镜像名也一并失效
 @app.route('/addImg', methods=['POST'])
+@response_cache.invalidates(docker_group('images'), docker_group('containers'))
 def add_container():
     data = request
     return docker_client.add_images(data)
+
+
+# 流式上传镜像接口，请求体为镜像tar（docker save的输出），支持chunked传输
+@app.route('/images/load', methods=['POST'])
+@response_cache.invalidates(docker_group())
+def load_image():
+    return docker_client.load_image_stream(request.stream)
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import time
+from urllib.parse import parse_qsl
+
+from flask import Blueprint, jsonify, request
+from werkzeug.datastructures import MultiDict
+
+from app.event_hub import event_hub, SUBSCRIBER_POLICIES, SUBSCRIBER_QUEUE_SIZE, HEARTBEAT_INTERVAL
+from app.log_stream import event_response, format_event, EVENT_MIMETYPES, EVENT_HEADERS
+from app.routes.docker_routes import docker_hosts
+from app.routes.k8s_routes import k8s_clusters
+
+app = Blueprint('events', __name__)
+
+# 可以订阅的资源类型，topic为 k8s/<kind> 或 docker/<kind>
+K8S_KINDS = ('pods', 'deployments', 'services')
+DOCKER_KINDS = ('containers', 'images')
+# 单个订阅者的队列大小上限
+MAX_QUEUE_SIZE = 10000
+
+
+def _k8s_topic(cluster, kind):
+    k8s = k8s_clusters.get(cluster)
+    if k8s is None:
+        raise LookupError(f"Unknown cluster: {cluster}")
+    return event_hub.topic(f"k8s/{cluster or k8s_clusters.default_context}/{kind}",
+                           lambda publish: k8s.watch_changes(kind, publish),
+                           lambda: k8s.list_items(kind))
+
+
+def _docker_topic(host, kind):
+    docker_client = docker_hosts.get(host)
+    if docker_client is None:
+        raise LookupError(f"Unknown host: {host}")
+    items = docker_client.container_items if kind == 'containers' else docker_client.image_items
+    return event_hub.topic(f"docker/{docker_client.host}/{kind}",
+                           lambda publish: docker_client.watch_changes(kind, publish),
+                           lambda: items()[0])
+
+
+# 解析订阅参数：?topics=k8s/pods,docker/containers&cluster=&host=&namespace=&policy=drop|resync&queue_size=256
+# 参数不合法时抛出ValueError，集群或主机不存在时抛出LookupError
+def subscription_options(args):
+    names = [name.strip() for name in args.get('topics', '').split(',') if name.strip()]
+    if not names:
+        raise ValueError("At least one topic is required")
+    policy = args.get('policy', 'drop')
+    if policy not in SUBSCRIBER_POLICIES:
+        raise ValueError(f"Invalid policy: {policy}, expected one of {', '.join(SUBSCRIBER_POLICIES)}")
+    max_size = args.get('queue_size', SUBSCRIBER_QUEUE_SIZE, type=int)
+    if max_size is None or not 0 < max_size <= MAX_QUEUE_SIZE:
+        raise ValueError(f"queue_size must be between 1 and {MAX_QUEUE_SIZE}")
+    topics = []
+    for name in dict.fromkeys(names):
+        source, _, kind = name.partition('/')
+        if source == 'k8s' and kind in K8S_KINDS:
+            topics.append(_k8s_topic(args.get('cluster'), kind))
+        elif source == 'docker' and kind in DOCKER_KINDS:
+            topics.append(_docker_topic(args.get('host'), kind))
+        else:
+            raise ValueError(f"Invalid topic: {name}")
+    namespace = args.get('namespace')
+
+    # 只过滤kubernetes对象，docker对象没有namespace
+    def match(obj):
+        return not isinstance(obj, dict) or obj.get('namespace', namespace) == namespace
+    return {'topics': topics, 'match': match if namespace else None, 'policy': policy, 'max_size': max_size}
+
+
+# 订阅资源变化（SSE或NDJSON），先收到每个topic的全量数据（SNAPSHOT），之后是合并后的变化（ADDED/MODIFIED/DELETED）
+# 队列满时按policy丢弃（DROPPED）或重新发送全量数据，空闲时定期发送HEARTBEAT
+# WSGI方式运行时每个订阅者占用一个工作线程；ASGI方式运行时该路径由 events_stream 在事件循环中处理
+@app.route('', methods=['GET'])
+def subscribe():
+    try:
+        options = subscription_options(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": f"Cannot subscribe: {e}"}), 503
+    fmt = request.args.get('format', 'sse')
+    if fmt not in ('sse', 'ndjson'):
+        return jsonify({"error": "Invalid format parameter"}), 400
+    try:
+        subscription = event_hub.subscribe(**options)
+    except Exception as e:
+        return jsonify({"error": f"Cannot subscribe: {e}"}), 503
+    return event_response(subscription.events(), fmt, subscription.close)
+
+
+# 当前的topic和订阅者数量
+@app.route('/topics', methods=['GET'])
+def list_topics():
+    return jsonify({"topics": event_hub.stats()})
+
+
+# 订阅失败时的状态码和错误信息，与 subscribe 一致
+def subscription_error(e):
+    if isinstance(e, ValueError):
+        return 400, str(e)
+    if isinstance(e, LookupError):
+        return 404, str(e)
+    return 503, f"Cannot subscribe: {e}"
+
+
+# ASGI连接的查询参数
+def query_args(scope):
+    return MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+
+
+# 在线程池中订阅，有新事件时在事件循环中设置ready
+async def subscribe_async(loop, executor, args, ready):
+    return await loop.run_in_executor(
+        executor, lambda: event_hub.subscribe(notify=lambda: loop.call_soon_threadsafe(ready.set),
+                                              **subscription_options(args)))
+
+
+# 在事件循环中逐批产生订阅的事件，空闲时每HEARTBEAT_INTERVAL秒产生一次心跳
+# 等待事件不占用工作线程，只有取出事件和获取全量数据时使用线程池
+async def event_batches(loop, executor, subscription, ready):
+    while not subscription.closed:
+        ready.clear()
+        batch = await loop.run_in_executor(executor, subscription.drain, 0)
+        if not batch:
+            try:
+                await asyncio.wait_for(ready.wait(), HEARTBEAT_INTERVAL)
+                continue
+            except asyncio.TimeoutError:
+                batch = [{"type": "HEARTBEAT", "time": int(time.time())}]
+        yield batch
+
+
+# ASGI方式运行时的 GET /events，参数、响应格式与 subscribe 相同，订阅者不占用工作线程
+async def events_stream(scope, receive, send, executor):
+    loop = asyncio.get_event_loop()
+    args = query_args(scope)
+    fmt = args.get('format', 'sse')
+    ready = asyncio.Event()
+    try:
+        if fmt not in EVENT_MIMETYPES:
+            raise ValueError("Invalid format parameter")
+        subscription = await subscribe_async(loop, executor, args, ready)
+    except Exception as e:
+        status, message = subscription_error(e)
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': json.dumps({"error": message}).encode('utf-8')})
+        return
+    headers = [(b'content-type', EVENT_MIMETYPES[fmt].encode('latin-1'))]
+    headers.extend((name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in EVENT_HEADERS.items())
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+
+    async def watch_disconnect():
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                subscription.close()
+                ready.set()
+                return
+
+    watcher = loop.create_task(watch_disconnect())
+    try:
+        async for batch in event_batches(loop, executor, subscription, ready):
+            body = ''.join(format_event(event, fmt) for event in batch).encode('utf-8')
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        watcher.cancel()
+        subscription.close()
+
+
+# WebSocket订阅（仅ASGI方式运行时可用），参数和消息格式与 /events 相同，每条消息一个JSON事件
+async def events_websocket(scope, receive, send, executor):
+    loop = asyncio.get_event_loop()
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    ready = asyncio.Event()
+    try:
+        subscription = await subscribe_async(loop, executor, query_args(scope), ready)
+    except Exception as e:
+        # 握手前关闭，客户端收到403
+        print(f"WebSocket subscription rejected: {e}")
+        await send({'type': 'websocket.close', 'code': 1008})
+        return
+    await send({'type': 'websocket.accept'})
+
+    async def watch_disconnect():
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                subscription.close()
+                ready.set()
+                return
+
+    watcher = loop.create_task(watch_disconnect())
+    try:
+        async for batch in event_batches(loop, executor, subscription, ready):
+            for event in batch:
+                await send({'type': 'websocket.send', 'text': json.dumps(event)})
+    finally:
+        watcher.cancel()
+        subscription.close()
+
+
+# ASGI方式运行时在事件循环中处理的路径
+HTTP_ROUTES = {'/events': events_stream}
+WEBSOCKET_ROUTES = {'/events/ws': events_websocket}
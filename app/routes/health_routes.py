@@ -0,0 +1,28 @@
+import time
+
+from flask import Blueprint, jsonify
+
+from app.health import BackendMonitor
+from app.routes import docker_routes, k8s_routes
+
+app = Blueprint('health', __name__)
+
+# 检查本机docker和默认集群的apiserver是否可用，第一次检查时创建客户端
+backend_monitor = BackendMonitor({
+    'docker': lambda: docker_routes.docker_hosts.get().client.api.ping(),
+    'kubernetes': lambda: k8s_routes.k8s_clusters.get().version(),
+})
+
+
+# 存活检查：进程能处理请求即可，不访问任何后端
+@app.route('/healthz', methods=['GET'])
+def liveness():
+    return jsonify({"status": "ok", "uptime": round(time.time() - backend_monitor.started_at, 3)})
+
+
+# 就绪检查：返回每个后端的状态，全部可用时200，否则503
+@app.route('/readyz', methods=['GET'])
+def readiness():
+    backend_monitor.start()
+    ready = backend_monitor.ready()
+    return jsonify({"ready": ready, "backends": backend_monitor.report()}), 200 if ready else 503
@@ -1,35 +1,131 @@
-from app.kubernetes.k8s_client import KubernetesClient
+from app.kubernetes.k8s_apply import load_manifests
+from app.kubernetes.k8s_registry import ClusterRegistry
+from app.kubernetes.k8s_rollout import load_rollout_targets, parse_deployment_keys, ROLLOUT_MAX_TIMEOUT, \
+    ROLLOUT_TIMEOUT
+from app.log_stream import log_options
+from app.response_cache import response_cache
 import yaml
-from flask import Flask, jsonify, Blueprint, request
+from flask import Flask, jsonify, Blueprint, request, g, abort, make_response
+from werkzeug.local import LocalProxy
 
-k8s_client = KubernetesClient()
+k8s_clusters = ClusterRegistry()
+
+# 当前请求对应集群的客户端：/k8s/clusters/<cluster>/... 使用指定集群，/k8s/... 使用默认集群
+k8s_client = LocalProxy(lambda: g.get('k8s_client') or k8s_clusters.get())
 
 app = Blueprint('k8s', __name__)
 
+# 集群列表和跨集群查询接口
+clusters_app = Blueprint('k8s_clusters', __name__)
+
+FANOUT_KINDS = ('pods', 'deployments', 'services', 'namespaces')
+
+
+# 当前请求的响应缓存分组：k8s/<集群>，带kind时为 k8s/<集群>/<kind>，修改只使对应集群、对应资源的缓存失效
+def k8s_group(kind=None):
+    def group():
+        client = g.get('k8s_client')
+        group_name = f"k8s/{client.context if client is not None else k8s_clusters.default_context}"
+        return f"{group_name}/{kind}" if kind else group_name
+    return group
+
+
+@app.url_value_preprocessor
+def select_cluster(endpoint, values):
+    cluster = values.pop('cluster', None) if values else None
+    if cluster is None:
+        return
+    g.k8s_client = k8s_clusters.get(cluster)
+    if g.k8s_client is None:
+        abort(make_response(jsonify({"error": f"Unknown cluster: {cluster}"}), 404))
+
+
+# get到所有的集群（kubeconfig中的context）
+@clusters_app.route('', methods=['GET'])
+def list_clusters():
+    return jsonify({"default": k8s_clusters.default_context, "clusters": k8s_clusters.names()})
+
+
+# 并发查询所有集群的pods/deployments/services/namespaces并合并，每条数据带上cluster字段
+@clusters_app.route('/all/<kind>', methods=['GET'])
+@response_cache.cached(ttl=5, group='k8s')
+def list_all_clusters(kind):
+    if kind not in FANOUT_KINDS:
+        return jsonify({"error": "Invalid resource type"}), 400
+    if kind == 'namespaces':
+        results = k8s_clusters.fan_out(lambda k8s: [{"name": name} for name in k8s.namespace_names()])
+    else:
+        results = k8s_clusters.fan_out(lambda k8s: k8s.list_items(kind))
+    items = []
+    clusters = []
+    for cluster, (result, error, latency) in results.items():
+        for item in result or []:
+            item["cluster"] = cluster
+            items.append(item)
+        clusters.append({
+            "cluster": cluster,
+            "count": len(result) if result is not None else 0,
+            "latency": round(latency, 3),
+            "error": error
+        })
+    return jsonify({"items": items, "clusters": clusters})
+
+
+# 列表接口的分页/流式参数：?limit=500&continue=<token>&stream=json|ndjson（流式时limit为每页的条数）
+def list_options():
+    limit = request.args.get('limit', type=int)
+    stream = request.args.get('stream')
+    if limit is not None and limit <= 0:
+        return None
+    if stream not in (None, 'json', 'ndjson'):
+        return None
+    return {
+        'limit': limit,
+        'continue_token': request.args.get('continue'),
+        'stream': stream
+    }
+
+
+def invalid_list_options():
+    return jsonify({"error": "Invalid limit or stream parameter"}), 400
+
 
 # get到所有的k8s中的pods
 @app.route('/pods', methods=['GET'])
+@response_cache.cached(ttl=2, group=k8s_group('pods'))
 def list_pods():
-    pods = k8s_client.list_pods()
+    options = list_options()
+    if options is None:
+        return invalid_list_options()
+    pods = k8s_client.list_pods(**options)
     return pods
 
 
 # get到所有的k8s中的deployment
 @app.route('/deployments', methods=['GET'])
+@response_cache.cached(ttl=2, group=k8s_group('deployments'))
 def list_deployments():
-    deployments = k8s_client.list_deployments()
+    options = list_options()
+    if options is None:
+        return invalid_list_options()
+    deployments = k8s_client.list_deployments(**options)
     return deployments
 
 
 # get到所有的k8s中的services
 @app.route('/services', methods=['GET'])
+@response_cache.cached(ttl=2, group=k8s_group('services'))
 def list_services():
-    services = k8s_client.list_services()
+    options = list_options()
+    if options is None:
+        return invalid_list_options()
+    services = k8s_client.list_services(**options)
     return services
 
 
 # get到所有k8s中的namespace
 @app.route('/namespaces', methods=['GET'])
+@response_cache.cached(ttl=10, group=k8s_group('namespaces'))
 def list_namespaces():
     namespaces = k8s_client.list_namespaces()
     return namespaces
@@ -37,27 +133,59 @@ def list_namespaces():
 
 # get到指定namespace下面的pods
 @app.route('/<namespace>/pods', methods=['GET'])
+@response_cache.cached(ttl=2, group=k8s_group('pods'))
 def list_namespace_pods(namespace):
-    pods = k8s_client.list_namespace_pods(namespace)
+    options = list_options()
+    if options is None:
+        return invalid_list_options()
+    pods = k8s_client.list_namespace_pods(namespace, **options)
     return pods
 
 
 # get到指定namespace下面的deployments
 @app.route('/<namespace>/deployments', methods=['GET'])
+@response_cache.cached(ttl=2, group=k8s_group('deployments'))
 def list_namespace_deployments(namespace):
-    deployments = k8s_client.list_namespace_deployments(namespace)
+    options = list_options()
+    if options is None:
+        return invalid_list_options()
+    deployments = k8s_client.list_namespace_deployments(namespace, **options)
     return deployments
 
 
 # get到指定namespace下面的services
 @app.route('/<namespace>/services', methods=['GET'])
+@response_cache.cached(ttl=2, group=k8s_group('services'))
 def list_namespace_services(namespace):
-    services = k8s_client.list_namespace_deployments(namespace)
+    options = list_options()
+    if options is None:
+        return invalid_list_options()
+    services = k8s_client.list_namespace_service(namespace, **options)
     return services
 
 
+# get到指定namespace的概览（pods、deployments、services、replicasets、events并发获取并关联）
+@app.route('/<namespace>/overview', methods=['GET'])
+@response_cache.cached(ttl=2, group=k8s_group())
+def namespace_overview(namespace):
+    return k8s_client.namespace_overview(namespace)
+
+
+# 节点容量和利用率汇总（后台定期刷新，立即返回）
+@app.route('/capacity/nodes', methods=['GET'])
+def capacity_nodes():
+    return k8s_client.capacity_nodes()
+
+
+# namespace资源用量汇总
+@app.route('/capacity/namespaces', methods=['GET'])
+def capacity_namespaces():
+    return k8s_client.capacity_namespaces()
+
+
 # get到指定pod的详细信息
 @app.route('/<namespace>/<pod_name>', methods=['GET'])
+@response_cache.cached(ttl=2, group=k8s_group('pods'))
 def get_pod_details(namespace, pod_name):
     pod_details = k8s_client.get_pod_details(namespace, pod_name)
     return pod_details
@@ -65,6 +193,7 @@ def get_pod_details(namespace, pod_name):
 
 # get到指定deployment的详细信息
 @app.route('/<namespace>/<deployment_name>', methods=['GET'])
+@response_cache.cached(ttl=2, group=k8s_group('deployments'))
 def get_deployment_details(namespace, deployment_name):
     deployment_details = k8s_client.get_deployment_details(namespace, deployment_name)
     return deployment_details
@@ -72,6 +201,7 @@ def get_deployment_details(namespace, deployment_name):
 
 # 获取指定资源的describe信息
 @app.route('/describe/<resource_type>/<namespace>/<resource_name>', methods=['GET'])
+@response_cache.cached(ttl=5, group=k8s_group())
 def describe_resource(namespace, resource_type, resource_name):
     resource_description = k8s_client.describe_resource(namespace, resource_type, resource_name)
     return resource_description
@@ -84,8 +214,19 @@ def get_pod_logs(namespace, pod_name):
     return pod_logs
 
 
+# 流式获取指定pod的logs
+# ?tail_lines=100&since_seconds=3600&timestamps=true&container=app&follow=true&format=sse|text
+@app.route('/logs/<namespace>/<pod_name>/stream', methods=['GET'])
+def stream_pod_logs(namespace, pod_name):
+    options = log_options(request.args)
+    if options is None:
+        return jsonify({"error": "Invalid tail_lines, since_seconds or format parameter"}), 400
+    return k8s_client.stream_pod_logs(namespace, pod_name, container=request.args.get('container'), **options)
+
+
 # 根据yaml来创建资源
 @app.route('/create', methods=['POST'])
+@response_cache.invalidates(k8s_group())
 def create_resource():
     try:
         data = request.get_data().decode('utf-8')
@@ -98,7 +239,76 @@ def create_resource():
         return jsonify({"error": str(e)}), 500
 
 
+# 批量apply：请求体为多文档YAML或JSON（对象、对象列表、List），支持任意资源类型
+# ?dry_run=true&force_conflicts=true&concurrency=16
+@app.route('/apply', methods=['POST'])
+@response_cache.invalidates(k8s_group())
+def apply_resources():
+    try:
+        manifests = load_manifests(request.get_data().decode('utf-8'), is_json=request.is_json)
+    except (ValueError, yaml.YAMLError) as e:
+        return jsonify({"error": str(e)}), 400
+    if not manifests:
+        return jsonify({"error": "No manifests provided"}), 400
+    concurrency = request.args.get('concurrency', type=int)
+    if concurrency is not None and concurrency <= 0:
+        return jsonify({"error": "Invalid concurrency parameter"}), 400
+    return k8s_client.apply_manifests(manifests,
+                                      dry_run=request.args.get('dry_run') == 'true',
+                                      force_conflicts=request.args.get('force_conflicts') == 'true',
+                                      concurrency=concurrency)
+
+
+# rollout事件流的参数：?timeout=600&format=sse|ndjson，参数不合法时返回None
+def rollout_options():
+    timeout = request.args.get('timeout', ROLLOUT_TIMEOUT, type=int)
+    fmt = request.args.get('format', 'sse')
+    if timeout is None or timeout <= 0 or timeout > ROLLOUT_MAX_TIMEOUT or fmt not in ('sse', 'ndjson'):
+        return None
+    return {'timeout': timeout, 'fmt': fmt}
+
+
+def invalid_rollout_options():
+    return jsonify({"error": f"Invalid timeout (1-{ROLLOUT_MAX_TIMEOUT}) or format parameter"}), 400
+
+
+# 批量rollout操作：scale、image、restart
+# {"deployments": [{"namespace": "default", "name": "web", "replicas": 3, "images": {"web": "nginx:1.25"}}]}
+# ?watch=true 时以事件流返回rollout进度，直到全部完成；&timeout=600&format=sse|ndjson&concurrency=16
+@app.route('/rollout/<action>', methods=['POST'])
+@response_cache.invalidates(k8s_group('deployments'), k8s_group('pods'))
+def rollout(action):
+    try:
+        targets = load_rollout_targets(request.get_json(silent=True), action)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    options = rollout_options()
+    if options is None:
+        return invalid_rollout_options()
+    concurrency = request.args.get('concurrency', type=int)
+    if concurrency is not None and concurrency <= 0:
+        return jsonify({"error": "Invalid concurrency parameter"}), 400
+    return k8s_client.rollout(action, targets, concurrency=concurrency,
+                              watch=request.args.get('watch') == 'true', **options)
+
+
+# 跟踪deployment的rollout进度（事件流），?deployment=namespace/name 可以重复指定多个
+@app.route('/rollout/status', methods=['GET'])
+def rollout_status():
+    try:
+        keys = parse_deployment_keys(request.args.getlist('deployment'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not keys:
+        return jsonify({"error": "At least one deployment is required"}), 400
+    options = rollout_options()
+    if options is None:
+        return invalid_rollout_options()
+    return k8s_client.rollout_status(list(dict.fromkeys(keys)), **options)
+
+
 @app.route('/deletePod', methods=['POST'])
+@response_cache.invalidates(k8s_group('pods'))
 def delete_pod():
     data = request.get_json()
     namespace = data.get('namespace')
@@ -107,6 +317,7 @@ def delete_pod():
 
 
 @app.route('/deleteDeployment', methods=['POST'])
+@response_cache.invalidates(k8s_group('deployments'), k8s_group('pods'))
 def delete_deployment():
     data = request.get_json()
     namespace = data.get('namespace')
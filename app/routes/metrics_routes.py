@@ -0,0 +1,10 @@
+from flask import Blueprint, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+app = Blueprint('metrics', __name__)
+
+
+# Prometheus抓取接口
+@app.route("", methods=['GET'])
+def metrics():
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,108 @@
+# 对比Flask自带服务器和ASGI模式在慢请求下的并发能力
+# 使用本地假的Docker客户端：stats(stream=False)固定耗时STATS_DELAY秒，模拟docker计算CPU差值的阻塞
+# 运行：python benchmarks/asgi_concurrency.py [并发请求数]
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STATS_DELAY = 0.5
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+
+class FakeContainer:
+    def stats(self, stream=False):
+        time.sleep(STATS_DELAY)
+        return {'cpu_stats': {}, 'memory_stats': {}}
+
+
+class FakeContainers:
+    def get(self, container_id):
+        return FakeContainer()
+
+
+class FakeDocker:
+    containers = FakeContainers()
+    api = requests.Session()
+
+
+# docker客户端在第一次使用时才创建，这里在patch范围内提前创建好
+def load_app():
+    with mock.patch('docker.from_env', return_value=FakeDocker()):
+        from app import app
+        from app.routes import docker_routes
+        docker_routes.docker_hosts.get()
+    return app
+
+
+def run_werkzeug(app, port, threaded):
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', port, app, threaded=threaded)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def run_asgi(app, port):
+    import uvicorn
+    from app.asgi import AsgiApp
+    server = uvicorn.Server(uvicorn.Config(AsgiApp(app), host='127.0.0.1', port=port, log_level='error'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+    return stop
+
+
+# 每个请求使用不同的容器id，避免被响应缓存合并
+def measure(port, concurrency):
+    latencies = []
+
+    def call(index):
+        started = time.time()
+        requests.get(f'http://127.0.0.1:{port}/docker/health/c{index}', timeout=600).raise_for_status()
+        latencies.append(time.time() - started)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(concurrency)))
+    elapsed = time.time() - started
+    latencies.sort()
+    return {
+        'elapsed': elapsed,
+        'throughput': concurrency / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p99': latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def main():
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = load_app()
+    modes = [
+        ('flask dev server (threaded=False)', lambda port: run_werkzeug(app, port, False)),
+        ('flask dev server (threaded=True)', lambda port: run_werkzeug(app, port, True)),
+        ('asgi (uvicorn + executor)', lambda port: run_asgi(app, port)),
+    ]
+    print(f'{CONCURRENCY} concurrent requests, {STATS_DELAY}s per docker stats call')
+    for index, (name, start) in enumerate(modes):
+        port = 31100 + index
+        stop = start(port)
+        # 单线程服务器只测少量请求，否则耗时过长
+        concurrency = min(CONCURRENCY, 10) if 'threaded=False' in name else CONCURRENCY
+        result = measure(port, concurrency)
+        stop()
+        print(f"{name:38s} requests={concurrency:4d} elapsed={result['elapsed']:.2f}s "
+              f"throughput={result['throughput']:.1f}/s p50={result['p50']:.2f}s p99={result['p99']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
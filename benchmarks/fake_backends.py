@@ -0,0 +1,303 @@
+# 压测用的进程内假后端：假的Docker Engine API和Kubernetes apiserver，返回可配置规模的合成数据
+# 只实现服务会调用到的接口，列表数据启动时预先序列化，请求时只做切片和拼接，尽量不成为压测瓶颈
+# 不需要网络、docker或集群，笔记本上即可运行
+import json
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs, unquote
+
+# 镜像导出时每次写出的块大小
+EXPORT_CHUNK_SIZE = 1024 * 1024
+CREATED = '2024-01-01T08:00:00Z'
+
+
+def synthetic_pod(index):
+    containers = [{
+        'name': f'c{n}',
+        'image': f'registry.local/app-{index % 50}:1.{n}',
+        'ports': [{'containerPort': 8080 + n, 'protocol': 'TCP'}],
+        'env': [{'name': f'ENV_{k}', 'value': str(k)} for k in range(5)],
+        'resources': {'requests': {'cpu': '100m', 'memory': '128Mi'}, 'limits': {'cpu': '500m', 'memory': '512Mi'}},
+    } for n in range(2)]
+    return {
+        'metadata': {
+            'name': f'pod-{index}', 'namespace': f'ns-{index % 40}', 'uid': f'uid-{index}',
+            'resourceVersion': str(index), 'creationTimestamp': CREATED,
+            'labels': {'app': f'app-{index % 50}', 'pod-template-hash': 'abc123'},
+        },
+        'spec': {'containers': containers, 'nodeName': f'node-{index % 100}', 'restartPolicy': 'Always'},
+        'status': {
+            'phase': 'Running', 'podIP': '10.0.0.1', 'hostIP': '192.168.0.1', 'startTime': '2024-01-01T08:00:01Z',
+            'conditions': [{'type': 'Ready', 'status': 'True', 'lastTransitionTime': '2024-01-01T08:00:05Z'}],
+            'containerStatuses': [{
+                'name': f'c{n}', 'ready': True, 'restartCount': index % 3, 'image': 'img', 'imageID': 'id',
+                'containerID': 'containerd://x', 'state': {'running': {'startedAt': '2024-01-01T08:00:02Z'}},
+            } for n in range(2)],
+        },
+    }
+
+
+def synthetic_deployment(index):
+    labels = {'app': f'app-{index}'}
+    return {
+        'metadata': {'name': f'app-{index}', 'namespace': f'ns-{index % 40}', 'uid': f'deploy-{index}',
+                     'resourceVersion': str(index), 'creationTimestamp': CREATED, 'generation': 1},
+        'spec': {'replicas': 10, 'selector': {'matchLabels': labels},
+                 'template': {'metadata': {'labels': labels},
+                              'spec': {'containers': [{'name': 'app', 'image': f'registry.local/app-{index}:1.0'}]}}},
+        'status': {'observedGeneration': 1, 'replicas': 10, 'readyReplicas': 10, 'updatedReplicas': 10,
+                   'availableReplicas': 10},
+    }
+
+
+def synthetic_service(index):
+    return {
+        'metadata': {'name': f'app-{index}', 'namespace': f'ns-{index % 40}', 'uid': f'svc-{index}',
+                     'resourceVersion': str(index), 'creationTimestamp': CREATED},
+        'spec': {'type': 'ClusterIP', 'clusterIP': f'10.96.{index // 250}.{index % 250}',
+                 'selector': {'app': f'app-{index}'}, 'ports': [{'port': 80, 'protocol': 'TCP', 'targetPort': 8080}]},
+    }
+
+
+def synthetic_image(index):
+    return {
+        'Id': f'sha256:{index:064x}', 'ParentId': '', 'RepoTags': [f'registry.local/app-{index}:latest'],
+        'RepoDigests': [], 'Created': 1704096000 + index, 'Size': 200 * 1024 * 1024, 'SharedSize': -1,
+        'VirtualSize': 200 * 1024 * 1024, 'Labels': {}, 'Containers': -1,
+    }
+
+
+def synthetic_container(index, image_count):
+    image = synthetic_image(index % image_count)
+    return {
+        'Id': f'{index:064x}', 'Names': [f'/app-{index}'], 'Image': image['RepoTags'][0], 'ImageID': image['Id'],
+        'Command': '/bin/app --serve', 'Created': 1704096000 + index, 'State': 'running' if index % 5 else 'exited',
+        'Status': 'Up 2 hours', 'Ports': [{'IP': '0.0.0.0', 'PrivatePort': 8080, 'PublicPort': 20000 + index,
+                                             'Type': 'tcp'}],
+        'Labels': {'app': f'app-{index % 50}'}, 'HostConfig': {'NetworkMode': 'bridge'},
+    }
+
+
+class EncodedList:
+    # 预先序列化的列表，按limit/continue切片后拼接成apiserver的List响应
+    def __init__(self, kind, items):
+        self.kind = kind
+        self.items = [json.dumps(item).encode('utf-8') for item in items]
+
+    def page(self, limit=None, continue_token=None):
+        start = int(continue_token or 0)
+        end = len(self.items) if not limit else min(start + limit, len(self.items))
+        metadata = {'resourceVersion': '1'}
+        if end < len(self.items):
+            metadata['continue'] = str(end)
+        return b''.join([b'{"kind":"', self.kind.encode(), b'","apiVersion":"v1","metadata":',
+                         json.dumps(metadata).encode(), b',"items":[', b','.join(self.items[start:end]), b']}'])
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    # 使用HTTP/1.1保持连接，与服务的连接池行为一致
+    protocol_version = 'HTTP/1.1'
+    routes = ()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type='application/json', status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data, status=200):
+        self.send_body(json.dumps(data).encode('utf-8'), status=status)
+
+    # 长连接的流式接口（docker events、kubernetes watch）：不发送数据，直到超时或服务器关闭
+    def hold(self, timeout=None):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self.wfile.flush()
+        self.server.stopped.wait(timeout)
+        try:
+            self.wfile.write(b'0\r\n\r\n')
+        except OSError:
+            pass
+        self.close_connection = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        for pattern, handler in self.routes:
+            match = re.fullmatch(pattern, url.path)
+            if match:
+                return handler(self, query, *[unquote(group) for group in match.groups()])
+        self.send_json({'message': f'{url.path} not found'}, status=404)
+
+
+class FakeKubernetesHandler(FakeHandler):
+    def version(self, query):
+        self.send_json({'major': '1', 'minor': '29', 'gitVersion': 'v1.29.0-fake', 'gitCommit': 'fake',
+                        'gitTreeState': 'clean', 'buildDate': CREATED, 'goVersion': 'go1.21', 'compiler': 'gc',
+                        'platform': 'linux/amd64'})
+
+    def list_resource(self, query, kind):
+        if query.get('watch') in ('true', '1'):
+            return self.hold(int(query.get('timeoutSeconds') or 300))
+        limit = int(query['limit']) if query.get('limit') else None
+        self.send_body(self.server.lists[kind].page(limit, query.get('continue')))
+
+    def namespaces(self, query):
+        self.send_json({'kind': 'NamespaceList', 'apiVersion': 'v1', 'metadata': {'resourceVersion': '1'},
+                        'items': [{'metadata': {'name': f'ns-{index}', 'creationTimestamp': CREATED},
+                                   'status': {'phase': 'Active'}} for index in range(40)]})
+
+    def pod_log(self, query, namespace, name):
+        self.send_body(self.server.log, content_type='text/plain')
+
+    routes = (
+        (r'/version/?', version),
+        (r'/api/v1/(pods)', list_resource),
+        (r'/api/v1/(services)', list_resource),
+        (r'/apis/apps/v1/(deployments)', list_resource),
+        (r'/api/v1/namespaces', namespaces),
+        (r'/api/v1/namespaces/([^/]+)/pods/([^/]+)/log', pod_log),
+    )
+
+
+class FakeDockerHandler(FakeHandler):
+    def ping(self, query):
+        self.send_body(b'OK', content_type='text/plain')
+
+    def version(self, query):
+        self.send_json({'ApiVersion': '1.41', 'Version': '20.10.0-fake', 'Os': 'linux', 'Arch': 'amd64'})
+
+    def containers(self, query):
+        self.send_body(self.server.containers)
+
+    def images(self, query):
+        self.send_body(self.server.images)
+
+    def networks(self, query):
+        self.send_json([])
+
+    def events(self, query):
+        self.hold()
+
+    # 容器详情中列表接口用到的字段：Config.Cmd、Created、HostConfig.PortBindings
+    def inspect_container(self, query, container_id):
+        container = self.server.container_index.get(container_id)
+        if container is None:
+            return self.send_json({'message': f'No such container: {container_id}'}, status=404)
+        ports = {f"{port['PrivatePort']}/{port['Type']}": [{'HostIp': '', 'HostPort': str(port['PublicPort'])}]
+                 for port in container['Ports']}
+        self.send_json({'Id': container['Id'], 'Name': container['Names'][0], 'Created': CREATED,
+                        'Config': {'Cmd': container['Command'].split(), 'Image': container['Image']},
+                        'State': {'Status': container['State']}, 'HostConfig': {'PortBindings': ports}})
+
+    def inspect_image(self, query, name):
+        image = self.server.image_index.get(name)
+        if image is None:
+            return self.send_json({'message': f'No such image: {name}'}, status=404)
+        self.send_json(image)
+
+    # 镜像导出：按块写出image_size字节，不在内存中生成完整的tar
+    def export_image(self, query, name):
+        if name not in self.server.image_index:
+            return self.send_json({'message': f'No such image: {name}'}, status=404)
+        size = self.server.image_size
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-tar')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        chunk = self.server.export_chunk
+        try:
+            while size > 0:
+                self.wfile.write(chunk[:size])
+                size -= len(chunk)
+        except OSError:
+            self.close_connection = True
+
+    routes = (
+        (r'(?:/v[0-9.]+)?/_ping', ping),
+        (r'(?:/v[0-9.]+)?/version', version),
+        (r'(?:/v[0-9.]+)?/containers/json', containers),
+        (r'(?:/v[0-9.]+)?/containers/([0-9a-f]+)/json', inspect_container),
+        (r'(?:/v[0-9.]+)?/images/json', images),
+        (r'(?:/v[0-9.]+)?/networks', networks),
+        (r'(?:/v[0-9.]+)?/events', events),
+        (r'(?:/v[0-9.]+)?/images/(.+)/json', inspect_image),
+        (r'(?:/v[0-9.]+)?/images/(.+)/get', export_image),
+    )
+
+
+class FakeServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.stopped = threading.Event()
+
+    # 服务端关闭连接池中的空闲连接属于正常情况，不打印异常
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.shutdown()
+        self.server_close()
+
+
+class FakeKubernetes(FakeServer):
+    # pods个pod，pods/10个deployment和service，每个pod的日志为log_lines行
+    def __init__(self, pods=10000, log_lines=10000):
+        super().__init__(FakeKubernetesHandler)
+        workloads = max(pods // 10, 1)
+        self.lists = {
+            'pods': EncodedList('PodList', (synthetic_pod(index) for index in range(pods))),
+            'deployments': EncodedList('DeploymentList', (synthetic_deployment(index) for index in range(workloads))),
+            'services': EncodedList('ServiceList', (synthetic_service(index) for index in range(workloads))),
+        }
+        self.log = b''.join(f'2024-01-01T08:00:00.{index:06d}Z INFO request handled path=/api/items/{index} '
+                            f'status=200 duration=3ms\n'.encode() for index in range(log_lines))
+
+    # 指向该假apiserver的kubeconfig
+    def kubeconfig(self, context='bench'):
+        return {
+            'apiVersion': 'v1', 'kind': 'Config', 'current-context': context,
+            'clusters': [{'name': 'fake', 'cluster': {'server': self.url}}],
+            'users': [{'name': 'fake', 'user': {'token': 'bench'}}],
+            'contexts': [{'name': context, 'context': {'cluster': 'fake', 'user': 'fake'}}],
+        }
+
+
+class FakeDocker(FakeServer):
+    # containers个容器，images个镜像，每个镜像导出image_size字节
+    def __init__(self, containers=1000, images=100, image_size=1024 * 1024 * 1024):
+        super().__init__(FakeDockerHandler)
+        image_list = [synthetic_image(index) for index in range(images)]
+        self.image_ids = [image['Id'] for image in image_list]
+        self.images = json.dumps(image_list).encode('utf-8')
+        container_list = [synthetic_container(index, images) for index in range(containers)]
+        self.containers = json.dumps(container_list).encode()
+        self.container_index = {container['Id']: container for container in container_list}
+        self.image_index = {}
+        for image in image_list:
+            for name in [image['Id'], image['Id'].split(':')[1]] + image['RepoTags']:
+                self.image_index[name] = image
+        self.image_size = image_size
+        self.export_chunk = bytes(EXPORT_CHUNK_SIZE)
@@ -0,0 +1,79 @@
+# 对比pod列表的两种处理方式在合成的10k pod列表上的CPU时间和内存峰值：
+#   model:   反序列化为完整的V1PodList，再取出列表需要的字段（原来的 list_pods 路径）
+#   project: json.loads原始JSON，只投影出PodSummary（_preload_content=False 路径）
+# 运行：python benchmarks/pod_listing.py [pod数量]
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kubernetes import client  # noqa: E402
+
+# 导入app包时会创建Docker/Kubernetes客户端，这里不需要连接真实的后端
+with mock.patch('docker.from_env'), mock.patch('kubernetes.config.load_kube_config'):
+    from app.kubernetes.pod_summary import project_pod  # noqa: E402
+
+from fake_backends import synthetic_pod  # noqa: E402
+
+POD_COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+
+def model_path(data):
+    api_client = client.ApiClient()
+    pod_list = api_client.deserialize(SimpleNamespace(data=data), 'V1PodList')
+    pods = []
+    for pod in pod_list.items:
+        statuses = pod.status.container_statuses or []
+        pods.append({
+            "namespace": pod.metadata.namespace,
+            "name": pod.metadata.name,
+            "ready": f"{sum(1 for s in statuses if s.ready)}/{len(pod.spec.containers)}",
+            "status": pod.status.phase,
+            "restarts": sum(s.restart_count for s in statuses),
+            "age": pod.metadata.creation_timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        })
+    return pods
+
+
+def project_path(data):
+    result = json.loads(data)
+    return [project_pod(item).to_dict() for item in result['items']]
+
+
+# CPU时间和内存峰值分开测量，避免tracemalloc的开销影响CPU时间
+def measure(func, data):
+    gc.collect()
+    started = time.process_time()
+    result = func(data)
+    elapsed = time.process_time() - started
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    data = json.dumps({
+        'kind': 'PodList', 'apiVersion': 'v1', 'metadata': {'resourceVersion': '1'},
+        'items': [synthetic_pod(index) for index in range(POD_COUNT)],
+    })
+    print(f'{POD_COUNT} pods, {len(data) / 1024 / 1024:.1f} MiB of JSON')
+    results = {}
+    for name, func in (('model', model_path), ('project', project_path)):
+        result, elapsed, peak = measure(func, data)
+        results[name] = result
+        print(f'{name:8s} cpu={elapsed:.3f}s peak_memory={peak / 1024 / 1024:.1f} MiB')
+    assert results['model'] == results['project']
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+# 路由压测：进程内启动假的Docker Engine和Kubernetes apiserver（见fake_backends.py），
+# 服务在子进程中运行并连接这两个假后端，对每个路由并发发起请求，
+# 统计吞吐量、p50/p99延迟，并在压测期间采样服务进程的内存，记录每个路由的RSS峰值
+# 不需要网络、docker或集群
+# 运行：python benchmarks/route_load.py --pods 50000 --containers 1000 --image-size 2G --concurrency 32
+#      python benchmarks/route_load.py --routes list_pods,list_pods_page --server werkzeug
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import yaml
+
+from fake_backends import FakeDocker, FakeKubernetes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 内存采样间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.02
+# 读取响应体的块大小，镜像下载按块读取后丢弃
+READ_CHUNK_SIZE = 1024 * 1024
+
+SERVER = """
+import logging, sys
+sys.path.insert(0, {root!r})
+from app import app
+from app.docker.image_export import ImageExportCache
+from app.response_cache import response_cache
+from app.routes import docker_routes, k8s_routes
+k8s_routes.k8s_clusters.config_file = {kubeconfig!r}
+docker_routes.docker_hosts.hosts['local'] = {{'base_url': {docker_url!r}}}
+# 导出缓存写完即淘汰，每次下载都完整地从docker导出
+docker_routes.docker_hosts.get().export_cache = ImageExportCache(cache_dir={export_dir!r}, max_bytes=0)
+# 不带--response-cache时完全绕过响应缓存（包括single-flight合并），每个请求都真正执行
+if not {response_cache!r}:
+    response_cache.enabled = False
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+if {server!r} == 'asgi':
+    import uvicorn
+    from app.asgi import AsgiApp
+    uvicorn.run(AsgiApp(app), host='127.0.0.1', port={port}, log_level='error')
+else:
+    app.run(host='127.0.0.1', port={port}, threaded=True)
+"""
+
+
+# 路由名称 -> 第i个请求的路径
+def build_routes(fake_docker, pods):
+    image_ids = fake_docker.image_ids
+    return {
+        'list_pods': lambda i: '/k8s/pods',
+        'list_pods_page': lambda i: '/k8s/pods?limit=500',
+        'list_pods_ndjson': lambda i: '/k8s/pods?stream=ndjson',
+        'list_deployments': lambda i: '/k8s/deployments',
+        'get_pod_logs': lambda i: f'/k8s/logs/ns-{i % pods % 40}/pod-{i % pods}',
+        'list_containers': lambda i: '/docker/containers',
+        'list_images': lambda i: '/docker/images',
+        'download_image': lambda i: f'/docker/images/download/{image_ids[i % len(image_ids)]}?compression=none',
+    }
+
+
+def parse_size(value):
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper().rstrip('B')
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# 进程当前的RSS（字节），Linux读取/proc，其他系统（macOS）使用ps
+def rss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        output = subprocess.run(['ps', '-o', 'rss=', '-p', str(pid)], stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+        return int(output.strip() or 0) * 1024
+
+
+class RssSampler:
+    # 在后台线程中定期采样进程的RSS，记录峰值
+    def __init__(self, pid, interval=RSS_SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.peak = rss_bytes(pid)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes(self.pid))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes(self.pid))
+
+
+def percentile(values, ratio):
+    return values[min(int(len(values) * ratio), len(values) - 1)]
+
+
+# 对一个路由并发发起count个请求，每个线程复用一个连接
+def run_route(base_url, path, count, concurrency):
+    local = threading.local()
+    latencies = []
+    errors = []
+    received = [0]
+    lock = threading.Lock()
+
+    def call(index):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            with session.get(base_url + path(index), stream=True, timeout=600) as response:
+                size = sum(len(chunk) for chunk in response.iter_content(READ_CHUNK_SIZE))
+                status = response.status_code
+        except requests.RequestException as e:
+            errors.append(str(e))
+            return
+        elapsed = time.perf_counter() - started
+        with lock:
+            received[0] += size
+            if status >= 400:
+                errors.append(f'HTTP {status}')
+            else:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(count)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': count,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed,
+        'mb_per_second': received[0] / elapsed / 1024 / 1024,
+        'p50': percentile(latencies, 0.5) if latencies else None,
+        'p99': percentile(latencies, 0.99) if latencies else None,
+    }
+
+
+def wait_for(url, process, timeout=60):
+    started = time.time()
+    while time.time() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError('server exited during startup')
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(url)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Route load test against in-process fake Docker/Kubernetes backends')
+    parser.add_argument('--pods', type=int, default=10000, help='pods in the fake cluster (1k-50k)')
+    parser.add_argument('--containers', type=int, default=1000, help='containers on the fake docker host')
+    parser.add_argument('--images', type=int, default=100, help='images on the fake docker host')
+    parser.add_argument('--image-size', type=parse_size, default='1G', help='exported tar size per image, e.g. 2G')
+    parser.add_argument('--log-lines', type=int, default=10000, help='log lines returned per pod')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--download-requests', type=int, default=4, help='requests for download_image')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients per route')
+    parser.add_argument('--server', choices=('asgi', 'werkzeug'), default='asgi')
+    parser.add_argument('--routes', default='', help='comma separated routes to run, default all')
+    parser.add_argument('--response-cache', action='store_true', help='keep the response cache enabled')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    started = time.time()
+    fake_kubernetes = FakeKubernetes(pods=args.pods, log_lines=args.log_lines).start()
+    fake_docker = FakeDocker(containers=args.containers, images=args.images, image_size=args.image_size).start()
+    routes = build_routes(fake_docker, args.pods)
+    selected = [name for name in args.routes.split(',') if name] or list(routes)
+    unknown = [name for name in selected if name not in routes]
+    if unknown:
+        sys.exit(f'Unknown routes: {", ".join(unknown)}, expected {", ".join(routes)}')
+    print(f'fake backends ready in {time.time() - started:.1f}s: {args.pods} pods, {args.containers} containers, '
+          f'{args.images} images of {args.image_size / 1024 ** 3:.2f} GiB', file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kubeconfig = os.path.join(tmp, 'kubeconfig')
+        with open(kubeconfig, 'w') as f:
+            yaml.safe_dump(fake_kubernetes.kubeconfig(), f)
+        port = free_port()
+        script = SERVER.format(root=ROOT, kubeconfig=kubeconfig, docker_url=fake_docker.url.replace('http', 'tcp'),
+                               export_dir=os.path.join(tmp, 'export'), response_cache=args.response_cache,
+                               server=args.server, port=port)
+        process = subprocess.Popen([sys.executable, '-c', script], cwd=ROOT)
+        base_url = f'http://127.0.0.1:{port}'
+        results = {}
+        try:
+            wait_for(base_url + '/healthz', process)
+            for name in selected:
+                count = args.download_requests if name == 'download_image' else args.requests
+                # 预热：informer的首次LIST、docker状态缓存的首次同步、连接池
+                run_route(base_url, routes[name], 1, 1)
+                baseline = rss_bytes(process.pid)
+                with RssSampler(process.pid) as sampler:
+                    result = run_route(base_url, routes[name], count, min(args.concurrency, count))
+                result['rss_baseline_mb'] = baseline / 1024 / 1024
+                result['rss_peak_mb'] = sampler.peak / 1024 / 1024
+                results[name] = result
+                if not args.json:
+                    print(format_result(name, result), flush=True)
+        finally:
+            process.terminate()
+            process.wait()
+            fake_docker.stop()
+            fake_kubernetes.stop()
+    if args.json:
+        print(json.dumps({'config': vars(args), 'results': results}, indent=2))
+
+
+def format_result(name, result):
+    line = (f"{name:18s} requests={result['requests']:5d} errors={result['errors']:3d} "
+            f"throughput={result['throughput']:8.1f}/s {result['mb_per_second']:8.1f} MiB/s ")
+    if result['p50'] is not None:
+        line += f"p50={result['p50'] * 1000:8.1f}ms p99={result['p99'] * 1000:8.1f}ms "
+    line += f"rss={result['rss_baseline_mb']:.0f}->{result['rss_peak_mb']:.0f} MiB"
+    if result['first_error']:
+        line += f" ({result['first_error']})"
+    return line
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# 测量服务冷启动到第一个响应的时间
+#   lazy:  当前的启动方式，docker/kubernetes包和客户端在第一次使用（或后台预热）时才导入和创建
+#   eager: 启动前先导入docker和kubernetes包，模拟原来在导入app时就创建客户端的开销（不含连接后端的时间）
+# 每种方式启动REPEAT次取中位数，分别记录 /healthz 第一次返回200 和 /readyz 第一次给出后端状态的时间
+# 运行：python benchmarks/startup_time.py [重复次数]
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEAT = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+PORT = 31200
+
+SERVER = """
+import logging, sys
+sys.path.insert(0, {root!r})
+if {eager!r}:
+    import docker, kubernetes.client, kubernetes.config
+from app import app
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+print('imported docker=%s kubernetes=%s' % ('docker' in sys.modules, 'kubernetes' in sys.modules), flush=True)
+app.run(host='127.0.0.1', port={port})
+"""
+
+
+def wait_for(url, accept, started, timeout=60):
+    while time.time() - started < timeout:
+        try:
+            response = requests.get(url, timeout=1)
+            if accept(response):
+                return time.time() - started
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(url)
+
+
+def startup(eager):
+    started = time.time()
+    process = subprocess.Popen([sys.executable, '-c', SERVER.format(root=ROOT, eager=eager, port=PORT)],
+                               cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    try:
+        imported = process.stdout.readline().strip()
+        first = wait_for(f'http://127.0.0.1:{PORT}/healthz', lambda r: r.status_code == 200, started)
+        # 后端不可用时readyz返回503，只要所有后端都不再是pending就算给出了状态
+        ready = wait_for(f'http://127.0.0.1:{PORT}/readyz',
+                         lambda r: all(b['state'] != 'pending' for b in r.json()['backends'].values()), started)
+        return first, ready, imported
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    print(f'{REPEAT} runs per mode, median seconds since process start')
+    for name, eager in (('lazy', False), ('eager', True)):
+        runs = sorted((startup(eager) for _ in range(REPEAT)), key=lambda run: run[0])
+        first, ready, imported = runs[len(runs) // 2]
+        print(f'{name:6s} first_response={first:.3f}s backends_reported={ready:.3f}s ({imported} after importing app)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# DockerHostRegistry测试：连接慢的主机不阻塞其他主机，连接失败在一段时间内直接返回错误
+import threading
+import time
+
+import pytest
+from docker.errors import DockerException
+
+from app.docker import docker_registry
+from app.docker.docker_registry import DockerHostRegistry
+
+
+def make_registry(create_client):
+    registry = DockerHostRegistry(config_file='/nonexistent')
+    registry.hosts.update({'slow': {}, 'down': {}})
+    registry._create_client = create_client
+    return registry
+
+
+def test_slow_host_does_not_block_other_hosts():
+    release = threading.Event()
+    created = []
+
+    def create_client(host):
+        if host == 'slow':
+            release.wait(5)
+        created.append(host)
+        return host
+
+    registry = make_registry(create_client)
+    slow = threading.Thread(target=registry.get, args=('slow',))
+    slow.start()
+    try:
+        time.sleep(0.05)
+        started = time.monotonic()
+        assert registry.get() == 'local'
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+        slow.join()
+    assert registry.get('slow') == 'slow'
+    assert created == ['local', 'slow']
+
+
+def test_connect_failures_are_cached(monkeypatch):
+    attempts = []
+
+    def create_client(host):
+        attempts.append(host)
+        if len(attempts) < 3:
+            raise DockerException('Error while fetching server API version')
+        return host
+
+    monkeypatch.setattr(docker_registry, 'CONNECT_RETRY_INTERVAL', 0.2)
+    registry = make_registry(create_client)
+    for _ in range(3):
+        with pytest.raises(DockerException):
+            registry.get('down')
+    assert attempts == ['down']
+    time.sleep(0.25)
+    with pytest.raises(DockerException):
+        registry.get('down')
+    time.sleep(0.25)
+    assert registry.get('down') == 'down'
+    assert registry.get('down') == 'down'
+    assert attempts == ['down'] * 3
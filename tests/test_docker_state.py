@@ -0,0 +1,177 @@
+# DockerStateStore对假的docker API和事件流测试：缓存的containers/images/networks与直接查询的结果一致，
+# 事件密集时按debounce合并查询，health_status只修改缓存
+import copy
+import queue
+import threading
+import time
+
+from app.docker.docker_state import DockerStateStore
+
+
+class EventStream:
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def __iter__(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+            yield event
+
+    def put(self, event):
+        self._queue.put(event)
+
+    def close(self):
+        self._queue.put(None)
+
+
+class FakeDockerAPI:
+    # docker.APIClient中DockerStateStore用到的部分：containers/images/networks查询和/events
+    def __init__(self):
+        self.state = {'containers': {}, 'images': {}, 'networks': {}}
+        self.calls = {'containers': 0, 'images': 0, 'networks': 0}
+        self.stream = None
+        self.lock = threading.Lock()
+
+    def _list(self, kind, ids=None, count=True):
+        with self.lock:
+            self.calls[kind] += count
+            return [copy.deepcopy(obj) for object_id, obj in sorted(self.state[kind].items())
+                    if ids is None or any(object_id.startswith(prefix) for prefix in ids)]
+
+    def containers(self, all=False, filters=None):
+        ids = (filters or {}).get('id')
+        return self._list('containers', [ids] if isinstance(ids, str) else ids)
+
+    def images(self):
+        return self._list('images')
+
+    def networks(self, ids=None):
+        return self._list('networks', ids)
+
+    def events(self, decode=True, filters=None):
+        self.stream = EventStream()
+        return self.stream
+
+    # 修改状态并发出对应的事件
+    def change(self, kind, object_id, obj, action):
+        with self.lock:
+            if obj is None:
+                self.state[kind].pop(object_id, None)
+            else:
+                self.state[kind][object_id] = obj
+        self.emit(kind[:-1], object_id, action)
+
+    def emit(self, event_type, object_id, action):
+        self.stream.put({'Type': event_type, 'Action': action, 'Actor': {'ID': object_id}})
+
+
+def container(container_id, status='Up 1 second', state='running'):
+    return {'Id': container_id, 'Names': [f'/{container_id}'], 'Image': 'nginx', 'State': state, 'Status': status}
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def start_store(api, debounce=0.05):
+    store = DockerStateStore(api, retry_interval=0.01, debounce=debounce)
+    store.start()
+    assert store.wait_for_sync(5)
+    return store
+
+
+def sorted_store(store):
+    return {'containers': sorted(store.containers(), key=lambda item: item['Id']),
+            'images': sorted(store.images(), key=lambda item: item['Id']),
+            'networks': sorted(store.networks(), key=lambda item: item['Id'])}
+
+
+# 直接查询的结果（不计入查询次数）
+def direct(api):
+    return {kind: api._list(kind, count=False) for kind in ('containers', 'images', 'networks')}
+
+
+def test_cache_matches_direct_queries_after_events():
+    api = FakeDockerAPI()
+    api.state['containers']['c1'] = container('c1')
+    api.state['images']['sha256:a'] = {'Id': 'sha256:a', 'RepoTags': ['nginx:latest']}
+    api.state['networks']['n1'] = {'Id': 'n1', 'Name': 'bridge', 'Containers': {}}
+    store = start_store(api)
+    try:
+        assert sorted_store(store) == direct(api)
+        api.change('containers', 'c2', container('c2', 'Created', 'created'), 'create')
+        api.change('containers', 'c2', container('c2'), 'start')
+        api.change('containers', 'c1', container('c1', 'Exited (0) 1 second ago', 'exited'), 'die')
+        api.change('images', 'sha256:b', {'Id': 'sha256:b', 'RepoTags': ['redis:7']}, 'pull')
+        api.change('images', 'sha256:a', {'Id': 'sha256:a', 'RepoTags': ['nginx:latest', 'web:1']}, 'tag')
+        api.change('networks', 'n2', {'Id': 'n2', 'Name': 'app', 'Containers': {}}, 'create')
+        api.change('networks', 'n1', {'Id': 'n1', 'Name': 'bridge', 'Containers': {'c2': {}}}, 'connect')
+        assert wait_until(lambda: sorted_store(store) == direct(api))
+        api.change('containers', 'c1', None, 'destroy')
+        api.change('images', 'sha256:b', None, 'delete')
+        api.change('networks', 'n2', None, 'destroy')
+        assert wait_until(lambda: sorted_store(store) == direct(api))
+        assert [item['Id'] for item in store.containers()] == ['c2']
+    finally:
+        store.stop()
+
+
+def test_event_storm_is_coalesced():
+    api = FakeDockerAPI()
+    for index in range(10):
+        api.state['containers'][f'c{index}'] = container(f'c{index}')
+    api.state['images']['sha256:a'] = {'Id': 'sha256:a', 'RepoTags': []}
+    store = start_store(api, debounce=0.2)
+    try:
+        baseline = dict(api.calls)
+        for round_index in range(20):
+            for index in range(10):
+                state = 'running' if round_index % 2 else 'exited'
+                api.change('containers', f'c{index}', container(f'c{index}', f'round {round_index}', state), 'die')
+            api.change('images', 'sha256:a', {'Id': 'sha256:a', 'RepoTags': [f'app:{round_index}']}, 'tag')
+        assert wait_until(lambda: sorted_store(store) == direct(api))
+        # 200个容器事件和20个镜像事件合并为少数几次查询
+        assert api.calls['containers'] - baseline['containers'] <= 5
+        assert api.calls['images'] - baseline['images'] <= 5
+    finally:
+        store.stop()
+
+
+def test_health_status_is_patched_without_queries():
+    api = FakeDockerAPI()
+    api.state['containers']['c1'] = container('c1', 'Up 2 minutes (health: starting)')
+    store = start_store(api)
+    try:
+        baseline = api.calls['containers']
+        version = store.version
+        api.state['containers']['c1'] = container('c1', 'Up 2 minutes (healthy)')
+        api.emit('container', 'c1', 'health_status: healthy')
+        api.emit('container', 'c1', 'exec_start: sh -c healthcheck')
+        api.emit('container', 'c1', 'exec_die')
+        assert wait_until(lambda: store.containers()[0]['Status'] == 'Up 2 minutes (healthy)')
+        time.sleep(0.2)
+        assert api.calls['containers'] == baseline
+        assert store.version == version + 1
+        assert sorted_store(store) == direct(api)
+    finally:
+        store.stop()
+
+
+def test_resyncs_after_the_event_stream_ends():
+    api = FakeDockerAPI()
+    store = start_store(api)
+    try:
+        first = api.stream
+        # 事件流断开期间的变化在重新订阅后的全量同步中得到
+        api.state['containers']['c1'] = container('c1')
+        first.close()
+        assert wait_until(lambda: api.stream is not first and store.containers() == direct(api)['containers'])
+    finally:
+        store.stop()
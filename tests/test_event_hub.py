@@ -0,0 +1,125 @@
+# EventHub/Subscription测试：新订阅者先收到全量数据，同一对象的变化合并，队列满时按policy丢弃或重新同步
+from app.event_hub import EventHub
+
+
+class FakeSource:
+    # 假的上游：snapshot返回items，publish由EventHub在第一次订阅时传入
+    def __init__(self, items=None):
+        self.items = list(items or [])
+        self.publish = None
+        self.starts = 0
+
+    def start(self, publish):
+        self.publish = publish
+        self.starts += 1
+
+    def snapshot(self):
+        return list(self.items)
+
+
+def subscribe(name='test/pods', items=None, **kwargs):
+    hub = EventHub()
+    source = FakeSource(items)
+    topic = hub.topic(name, source.start, source.snapshot)
+    subscription = hub.subscribe([topic], **kwargs)
+    return hub, source, subscription
+
+
+def pod(name, namespace='default', phase='Running'):
+    return {'name': name, 'namespace': namespace, 'phase': phase}
+
+
+def event_types(batch):
+    return [(event['type'], event.get('key')) for event in batch]
+
+
+def test_snapshot_first_then_changes():
+    hub, source, subscription = subscribe(items=[pod('a')])
+    assert source.starts == 1
+    batch = subscription.drain(0)
+    assert batch == [{'topic': 'test/pods', 'type': 'SNAPSHOT', 'items': [pod('a')]}]
+    source.publish('ADDED', 'default/b', pod('b'))
+    assert event_types(subscription.drain(0)) == [('ADDED', 'default/b')]
+    assert subscription.drain(0) == []
+    subscription.close()
+    assert hub.stats() == {'test/pods': {'subscribers': 0}}
+
+
+def test_changes_to_the_same_object_are_coalesced():
+    _, source, subscription = subscribe()
+    subscription.drain(0)
+    source.publish('MODIFIED', 'default/a', pod('a', phase='Pending'))
+    source.publish('MODIFIED', 'default/a', pod('a', phase='Running'))
+    source.publish('ADDED', 'default/b', pod('b'))
+    source.publish('MODIFIED', 'default/b', pod('b', phase='Failed'))
+    source.publish('ADDED', 'default/c', pod('c'))
+    source.publish('DELETED', 'default/c', pod('c'))
+    batch = subscription.drain(0)
+    # a只保留最新状态；b仍然是ADDED但带最新状态；c新增后又删除，不发送
+    assert event_types(batch) == [('MODIFIED', 'default/a'), ('ADDED', 'default/b')]
+    assert batch[0]['object']['phase'] == 'Running'
+    assert batch[1]['object']['phase'] == 'Failed'
+
+
+def test_drop_policy_discards_oldest_and_reports_count():
+    _, source, subscription = subscribe(policy='drop', max_size=2)
+    subscription.drain(0)
+    for name in ('a', 'b', 'c', 'd'):
+        source.publish('ADDED', f'default/{name}', pod(name))
+    batch = subscription.drain(0)
+    assert batch[0] == {'type': 'DROPPED', 'count': 2}
+    assert event_types(batch[1:]) == [('ADDED', 'default/c'), ('ADDED', 'default/d')]
+    assert subscription.drain(0) == []
+
+
+def test_resync_policy_sends_a_new_snapshot_on_overflow():
+    _, source, subscription = subscribe(policy='resync', max_size=2)
+    subscription.drain(0)
+    for name in ('a', 'b', 'c'):
+        source.items.append(pod(name))
+        source.publish('ADDED', f'default/{name}', pod(name))
+    # 重新同步之前的变化已经包含在全量数据中，不再单独发送
+    source.items.append(pod('d'))
+    source.publish('ADDED', 'default/d', pod('d'))
+    batch = subscription.drain(0)
+    assert len(batch) == 1 and batch[0]['type'] == 'SNAPSHOT'
+    assert [item['name'] for item in batch[0]['items']] == ['a', 'b', 'c', 'd']
+    source.publish('MODIFIED', 'default/a', pod('a', phase='Failed'))
+    assert event_types(subscription.drain(0)) == [('MODIFIED', 'default/a')]
+
+
+def test_upstream_resync_replaces_pending_changes():
+    _, source, subscription = subscribe()
+    subscription.drain(0)
+    source.publish('ADDED', 'default/a', pod('a'))
+    source.items = [pod('a'), pod('b')]
+    source.publish('RESYNC', None, None)
+    batch = subscription.drain(0)
+    assert [event['type'] for event in batch] == ['SNAPSHOT']
+    assert len(batch[0]['items']) == 2
+
+
+def test_namespace_filter_and_notify():
+    notified = []
+
+    def match(obj):
+        return obj.get('namespace') == 'default'
+    _, source, subscription = subscribe(items=[pod('a'), pod('x', 'kube-system')], match=match,
+                                        notify=lambda: notified.append(True))
+    assert subscription.drain(0)[0]['items'] == [pod('a')]
+    source.publish('ADDED', 'kube-system/y', pod('y', 'kube-system'))
+    assert notified == []
+    source.publish('ADDED', 'default/b', pod('b'))
+    assert notified == [True]
+    assert event_types(subscription.drain(0)) == [('ADDED', 'default/b')]
+
+
+def test_closed_subscription_stops_events():
+    _, source, subscription = subscribe()
+    events = subscription.events(heartbeat=0.01)
+    assert next(events)['type'] == 'SNAPSHOT'
+    assert next(events)['type'] == 'HEARTBEAT'
+    subscription.close()
+    assert list(events) == []
+    source.publish('ADDED', 'default/a', pod('a'))
+    assert subscription.drain(0) == []
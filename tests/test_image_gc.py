@@ -0,0 +1,138 @@
+# 镜像清理测试：对假的镜像/容器集合生成计划，正在使用的镜像（包括已停止容器使用的）、
+# dangling模式下有tag的镜像、仍被保留的子镜像依赖的父镜像都不会被选中；dry_run不删除任何对象
+from flask import Flask
+
+from app.docker.docker_client import DockerClient
+from app.docker.image_gc import ImageGraph
+
+NOW = 1700000000
+
+
+def image(image_id, tags=(), parent='', size=100, created=NOW - 86400 * 30):
+    return {'Id': image_id, 'RepoTags': list(tags) or ['<none>:<none>'], 'ParentId': parent,
+            'Size': size, 'SharedSize': 0, 'Created': created}
+
+
+def container(container_id, image_id, state):
+    return {'Id': container_id, 'Names': [f'/{container_id}'], 'ImageID': image_id, 'State': state}
+
+
+IMAGES = [
+    image('base', ['base:1']),
+    image('app', ['app:1'], parent='base', size=150),
+    image('old', ['old:1']),
+    image('orphan'),
+    image('stopped-orphan'),
+    # mid是构建web时留下的中间镜像，没有tag
+    image('mid', parent='base', size=120),
+    image('web', ['web:1'], parent='mid', size=180),
+    image('lib', ['lib:1']),
+    image('tool', ['tool:1'], parent='lib', size=130),
+    image('fresh', created=NOW - 60),
+]
+
+CONTAINERS = [
+    container('app-1', 'app', 'running'),
+    container('old-1', 'old', 'exited'),
+    container('stopped-orphan-1', 'stopped-orphan', 'created'),
+    container('tool-1', 'tool', 'paused'),
+]
+
+
+def plan(**kwargs):
+    return ImageGraph(IMAGES, CONTAINERS).plan(now=NOW, **kwargs)
+
+
+def ids(entries):
+    return sorted(entry['id'] for entry in entries)
+
+
+def test_dangling_mode_selects_only_untagged_leaf_images():
+    result = plan(mode='dangling')
+    # stopped-orphan被已停止的容器使用，mid是web依赖的中间镜像
+    assert ids(result['images']) == ['fresh', 'orphan']
+    assert result['containers'] == []
+
+
+def test_older_than_keeps_recent_images():
+    assert ids(plan(mode='dangling', older_than=3600)['images']) == ['orphan']
+
+
+def test_unused_mode_keeps_images_used_by_any_container():
+    result = plan(mode='unused')
+    assert ids(result['images']) == ['fresh', 'orphan', 'web']
+    # base被app和web（通过mid）依赖，app仍在使用；lib被使用中的tool依赖
+    assert ids(result['skipped']) == ['base', 'lib']
+    assert result['containers'] == []
+    used = {item['ImageID'] for item in CONTAINERS}
+    assert not used & {entry['id'] for entry in result['images']}
+
+
+def test_include_stopped_removes_stopped_containers_with_their_images():
+    result = plan(mode='unused', include_stopped=True)
+    assert ids(result['images']) == ['fresh', 'old', 'orphan', 'stopped-orphan', 'web']
+    assert ids(result['containers']) == ['old-1', 'stopped-orphan-1']
+    assert ids(result['skipped']) == ['base', 'lib']
+
+
+def test_children_are_deleted_before_parents():
+    images = IMAGES + [image('leaf', parent='web', size=200)]
+    result = ImageGraph(images, CONTAINERS).plan(mode='unused', now=NOW)
+    order = [entry['id'] for entry in result['images']]
+    assert order.index('leaf') < order.index('web')
+    assert 'mid' not in order
+
+
+class FakeDockerAPI:
+    # docker.APIClient中image_gc用到的部分，记录所有删除调用
+    def __init__(self):
+        self.removed = []
+
+    def _url(self, path):
+        return path
+
+    def _get(self, url, params=None):
+        return url
+
+    def _result(self, response, json=False):
+        return [dict(item) for item in IMAGES]
+
+    def containers(self, all=False):
+        return [dict(item) for item in CONTAINERS]
+
+    def remove_container(self, container_id, force=False):
+        self.removed.append(('container', container_id))
+
+    def remove_image(self, image_id, force=False):
+        self.removed.append(('image', image_id))
+
+
+class FakeDocker:
+    def __init__(self):
+        self.api = FakeDockerAPI()
+
+
+def run_gc(data):
+    docker_client = DockerClient.__new__(DockerClient)
+    docker_client.client = FakeDocker()
+    with Flask(__name__).app_context():
+        response = docker_client.image_gc(data)
+        return docker_client.client.api.removed, response.get_json()
+
+
+def test_dry_run_deletes_nothing():
+    for data in ({'mode': 'unused', 'include_stopped': True}, {'mode': 'unused', 'dry_run': True}):
+        removed, result = run_gc(data)
+        assert removed == []
+        assert result['dry_run'] is True
+        assert result['images']
+        assert 'results' not in result
+
+
+def test_execute_removes_only_planned_objects():
+    removed, result = run_gc({'mode': 'unused', 'include_stopped': True, 'dry_run': False})
+    # 先并发删除容器再删除镜像
+    assert sorted(removed[:2]) == [('container', 'old-1'), ('container', 'stopped-orphan-1')]
+    images = ['fresh', 'old', 'orphan', 'stopped-orphan', 'web']
+    assert sorted(removed[2:]) == [('image', image_id) for image_id in images]
+    assert result['failed'] == 0
@@ -0,0 +1,49 @@
+# FastJSONEncoder测试：输出格式与Flask默认的编码器一致（datetime为HTTP日期），安装与不安装orjson结果相同
+import json
+from datetime import date, datetime, timezone
+
+import pytest
+from flask import Flask, jsonify
+
+from app import json_response
+from app.json_response import install_json
+
+DATA = {
+    'created': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    'naive': datetime(2024, 1, 2, 3, 4, 5),
+    'day': date(2024, 1, 2),
+    'nested': [{'at': datetime(2020, 1, 1, tzinfo=timezone.utc)}],
+    'name': 'web-1',
+}
+EXPECTED = {
+    'created': 'Tue, 02 Jan 2024 03:04:05 GMT',
+    'naive': 'Tue, 02 Jan 2024 03:04:05 GMT',
+    'day': 'Tue, 02 Jan 2024 00:00:00 GMT',
+    'nested': [{'at': 'Wed, 01 Jan 2020 00:00:00 GMT'}],
+    'name': 'web-1',
+}
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def app(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(json_response, 'orjson', None)
+    elif json_response.orjson is None:
+        pytest.skip('orjson is not installed')
+    app = Flask(__name__)
+    install_json(app)
+    return app
+
+
+def test_datetimes_keep_flask_http_date_format(app):
+    with app.test_request_context():
+        body = jsonify(DATA).get_data()
+    assert json.loads(body) == EXPECTED
+
+
+def test_output_matches_flask_default_encoder(app):
+    default_app = Flask(__name__)
+    with default_app.test_request_context():
+        expected = json.loads(jsonify(DATA).get_data())
+    with app.test_request_context():
+        assert json.loads(jsonify(DATA).get_data()) == expected
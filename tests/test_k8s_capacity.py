@@ -0,0 +1,27 @@
+# 容量汇总测试：分组求和/计数在有无numpy时结果相同，-1（没有调度到node的pod）不计入任何分组
+from array import array
+
+import pytest
+
+from app.kubernetes import k8s_capacity
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(k8s_capacity, 'numpy', None)
+    return request.param
+
+
+def test_group_sum_and_count(backend):
+    values = array('d', [0.5, 1.25, 2.0, 4.0, 8.0])
+    groups = array('l', [0, 2, -1, 0, 2])
+    assert list(k8s_capacity.group_sum(values, groups, 4)) == [4.5, 0.0, 9.25, 0.0]
+    assert list(k8s_capacity.group_count(groups, 4)) == [2, 0, 2, 0]
+
+
+def test_group_sum_of_no_pods(backend):
+    assert list(k8s_capacity.group_sum(array('d'), array('l'), 2)) == [0.0, 0.0]
+    assert list(k8s_capacity.group_count(array('l'), 2)) == [0, 0]
@@ -0,0 +1,193 @@
+# ResourceInformer对假的LIST和watch流测试：ADDED/MODIFIED/DELETED、watch超时后续传、410 Gone重新LIST
+import json
+import threading
+import time
+
+from kubernetes import client
+from kubernetes.client import ApiException
+
+from app.kubernetes.k8s_client import KubernetesClient
+from app.kubernetes.k8s_informer import ResourceInformer
+
+
+def raw_pod(name, namespace='default', resource_version='1', phase='Running'):
+    return {'metadata': {'name': name, 'namespace': namespace, 'resourceVersion': resource_version},
+            'status': {'phase': phase}}
+
+
+def event(event_type, obj):
+    return {'type': event_type, 'object': obj, 'raw_object': obj}
+
+
+class RawResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeList:
+    # 以原始JSON返回的LIST，每次LIST依次返回 (pods, resourceVersion)，最后一个重复返回
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        pods, resource_version = self.results[min(self.calls, len(self.results) - 1)]
+        self.calls += 1
+        return RawResponse(json.dumps({'metadata': {'resourceVersion': resource_version},
+                                       'items': pods}).encode('utf-8'))
+
+
+class FakeWatch:
+    # 每次stream()依次取出一段脚本：事件列表（全部产生后即watch超时结束）或要抛出的异常
+    # 脚本用完后阻塞直到stop()
+    def __init__(self, script):
+        self.script = script
+        self.calls = []
+        self.stopped = threading.Event()
+
+    def __call__(self):
+        return self
+
+    def stream(self, func, **kwargs):
+        self.calls.append(kwargs)
+        if not self.script:
+            self.stopped.wait()
+            return
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        yield from step
+
+    def stop(self):
+        self.stopped.set()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def names(informer, namespace=None):
+    return [pod['metadata']['name'] for pod in informer.list(namespace)]
+
+
+def start_informer(list_func, script):
+    fake_watch = FakeWatch(script)
+    informer = ResourceInformer(list_func, watch_factory=fake_watch, retry_interval=0.01, project=lambda raw: raw)
+    events = []
+    informer.add_listener(lambda event_type, obj: events.append((event_type, obj and obj['metadata']['name'])))
+    informer.start()
+    return informer, fake_watch, events
+
+
+def test_applies_watch_events_and_notifies_listeners():
+    list_func = FakeList(([raw_pod('a'), raw_pod('b', 'kube-system')], '1'))
+    informer, fake_watch, events = start_informer(list_func, [[
+        event('ADDED', raw_pod('c', resource_version='2')),
+        event('MODIFIED', raw_pod('a', resource_version='3', phase='Failed')),
+        event('DELETED', raw_pod('b', 'kube-system', resource_version='4')),
+    ]])
+    try:
+        assert wait_until(lambda: len(fake_watch.calls) == 2)
+        assert names(informer) == ['a', 'c']
+        assert informer.get('default', 'a')['status']['phase'] == 'Failed'
+        assert informer.get('kube-system', 'b') is None
+        assert informer.namespaces() == ['default']
+        assert events == [('RESYNC', None), ('ADDED', 'c'), ('MODIFIED', 'a'), ('DELETED', 'b')]
+    finally:
+        informer.stop()
+
+
+def test_resumes_from_latest_resource_version_after_timeout():
+    list_func = FakeList(([raw_pod('a')], '10'))
+    informer, fake_watch, _ = start_informer(list_func, [
+        [event('ADDED', raw_pod('b', resource_version='11'))],
+        [event('BOOKMARK', {'metadata': {'resourceVersion': '15'}})],
+    ])
+    try:
+        assert wait_until(lambda: len(fake_watch.calls) == 3)
+        assert [call['resource_version'] for call in fake_watch.calls] == ['10', '11', '15']
+        assert list_func.calls == 1
+        assert names(informer) == ['a', 'b']
+    finally:
+        informer.stop()
+
+
+def test_relists_on_gone():
+    list_func = FakeList(([raw_pod('a'), raw_pod('b')], '5'), ([raw_pod('b'), raw_pod('c')], '20'))
+    informer, fake_watch, events = start_informer(list_func, [ApiException(status=410, reason='Gone')])
+    try:
+        assert wait_until(lambda: len(fake_watch.calls) == 2)
+        assert list_func.calls == 2
+        assert names(informer) == ['b', 'c']
+        assert fake_watch.calls[1]['resource_version'] == '20'
+        assert events == [('RESYNC', None), ('RESYNC', None)]
+    finally:
+        informer.stop()
+
+
+def test_retries_watch_after_other_errors():
+    list_func = FakeList(([raw_pod('a')], '5'))
+    informer, fake_watch, _ = start_informer(list_func, [
+        ApiException(status=500, reason='Internal Server Error'),
+        ConnectionError('connection reset'),
+        [event('ADDED', raw_pod('b', resource_version='6'))],
+    ])
+    try:
+        assert wait_until(lambda: len(fake_watch.calls) == 4)
+        assert [call['resource_version'] for call in fake_watch.calls] == ['5', '5', '5', '6']
+        assert list_func.calls == 1
+        assert names(informer) == ['a', 'b']
+    finally:
+        informer.stop()
+
+
+def test_model_objects_without_projection():
+    pod_list = client.V1PodList(metadata=client.V1ListMeta(resource_version='1'), items=[
+        client.V1Pod(metadata=client.V1ObjectMeta(name='a', namespace='default', resource_version='1'))])
+    fake_watch = FakeWatch([[{'type': 'ADDED', 'object': client.V1Pod(
+        metadata=client.V1ObjectMeta(name='b', namespace='default', resource_version='2'))}]])
+    informer = ResourceInformer(lambda **kwargs: pod_list, watch_factory=fake_watch, retry_interval=0.01)
+    informer.start()
+    try:
+        assert wait_until(lambda: len(fake_watch.calls) == 2)
+        assert [pod.metadata.name for pod in informer.list()] == ['a', 'b']
+        assert informer.resource_version == '2'
+    finally:
+        informer.stop()
+
+
+def test_slow_initial_list_does_not_block_other_kinds(monkeypatch):
+    release = threading.Event()
+
+    def list_func(kind):
+        def list_items(**kwargs):
+            if kind == 'pods':
+                release.wait(5)
+            return RawResponse(b'{"metadata": {"resourceVersion": "1"}, "items": []}')
+        return list_items
+
+    k8s = KubernetesClient.__new__(KubernetesClient)
+    k8s._informers = {}
+    k8s._informers_lock = threading.Lock()
+    k8s._informer_locks = {}
+    k8s._list_func = list_func
+    monkeypatch.setattr('app.kubernetes.k8s_client.PROJECTIONS',
+                        {'pods': lambda raw: raw, 'services': lambda raw: raw})
+    monkeypatch.setattr(ResourceInformer, '_run', lambda self: None)
+    pods = threading.Thread(target=k8s.informer, args=('pods',))
+    pods.start()
+    try:
+        assert wait_until(lambda: 'pods' in k8s._informer_locks)
+        started = time.monotonic()
+        k8s.informer('services')
+        assert time.monotonic() - started < 1
+        assert 'pods' not in k8s._informers
+    finally:
+        release.set()
+        pods.join()
+    assert k8s.informer('pods') is k8s._informers['pods']
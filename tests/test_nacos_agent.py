@@ -0,0 +1,179 @@
+# NacosAgent对本地的Nacos桩服务器测试：注册、心跳、token刷新、失败退避和注销
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app import nacos_agent
+from app.nacos_agent import NacosAgent, INSTANCE_NOT_FOUND
+
+
+class NacosStub(ThreadingMixIn, HTTPServer):
+    # 记录收到的请求（时间、方法、路径），按 failures[路径] 依次返回失败状态码，beats 为心跳的响应体
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), NacosHandler)
+        self.calls = []
+        self.failures = {}
+        self.beats = []
+        self.token_ttl = 18000
+        self.logins = 0
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def paths(self, method=None):
+        with self.lock:
+            return [path for _, m, path, _ in self.calls if method is None or m == method]
+
+    def times(self, path):
+        with self.lock:
+            return [at for at, _, p, _ in self.calls if p == path]
+
+
+class NacosHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        server = self.server
+        url = urlparse(self.path)
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with server.lock:
+            server.calls.append((time.monotonic(), self.command, url.path, parse_qs(url.query)))
+            failures = server.failures.get(url.path)
+            status = failures.pop(0) if failures else 200
+        if status != 200:
+            return self._reply(status, b'error')
+        if url.path == '/nacos/v1/auth/login':
+            server.logins += 1
+            body = {'accessToken': f'token-{server.logins}', 'tokenTtl': server.token_ttl}
+        elif url.path == '/nacos/v1/ns/instance/beat':
+            body = server.beats.pop(0) if server.beats else {'code': 10200, 'clientBeatInterval': 100}
+        else:
+            return self._reply(200, b'ok')
+        self._reply(200, json.dumps(body).encode('utf-8'))
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def stub():
+    server = NacosStub().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(nacos_agent, 'BACKOFF_BASE', 0.05)
+    monkeypatch.setattr(nacos_agent, 'BACKOFF_MAX', 0.2)
+
+
+def make_agent(stub, **kwargs):
+    kwargs.setdefault('ip', '10.0.0.1')
+    return NacosAgent(server=stub.url, beat_interval=0.1, timeout=(1, 1), **kwargs)
+
+
+def test_registers_beats_at_server_interval_and_deregisters(stub):
+    agent = make_agent(stub)
+    agent.start()
+    assert wait_until(lambda: len(stub.times('/nacos/v1/ns/instance/beat')) >= 3)
+    agent.stop()
+    assert stub.paths()[:3] == ['/nacos/v1/auth/login', '/nacos/v1/ns/instance', '/nacos/v1/ns/instance/beat']
+    assert stub.paths('DELETE') == ['/nacos/v1/ns/instance']
+    assert stub.logins == 1
+    beats = stub.times('/nacos/v1/ns/instance/beat')
+    # clientBeatInterval为100ms
+    assert all(0.05 < b - a < 0.5 for a, b in zip(beats, beats[1:]))
+    assert not agent.registered
+
+
+def test_backs_off_and_keeps_retrying_registration(stub):
+    stub.failures['/nacos/v1/ns/instance'] = [500, 500, 500]
+    agent = make_agent(stub)
+    agent.start()
+    assert wait_until(lambda: agent.registered)
+    agent.stop(deregister=False)
+    attempts = [at for at, method, path, _ in stub.calls if method == 'POST' and path == '/nacos/v1/ns/instance']
+    assert len(attempts) == 4
+    gaps = [b - a for a, b in zip(attempts, attempts[1:])]
+    # 退避时间在 [delay/2, delay] 之间：0.05、0.1、0.2
+    assert gaps[0] >= 0.025 and gaps[1] >= 0.05 and gaps[2] >= 0.1
+
+
+def test_retries_when_backend_is_unreachable():
+    agent = NacosAgent(server='http://127.0.0.1:1', ip='10.0.0.1', timeout=(0.2, 0.2))
+    agent.start()
+    time.sleep(0.3)
+    assert agent._thread.is_alive()
+    agent.stop()
+
+
+def test_hostname_resolution_failure_is_retried(stub, monkeypatch):
+    lookups = []
+
+    def gethostbyname(name):
+        lookups.append(name)
+        if len(lookups) < 3:
+            raise socket.gaierror(-2, 'Name or service not known')
+        return '10.0.0.2'
+    monkeypatch.setattr(socket, 'gethostbyname', gethostbyname)
+    agent = make_agent(stub, ip=None)
+    agent.start()
+    assert wait_until(lambda: agent.registered)
+    agent.stop()
+    assert len(lookups) == 3
+    assert agent.ip == '10.0.0.2'
+
+
+def test_reregisters_when_instance_is_gone(stub):
+    stub.beats = [{'code': INSTANCE_NOT_FOUND}]
+    agent = make_agent(stub)
+    agent.start()
+    assert wait_until(lambda: len(stub.times('/nacos/v1/ns/instance/beat')) >= 2)
+    agent.stop(deregister=False)
+    assert stub.paths('POST').count('/nacos/v1/ns/instance') == 2
+
+
+def test_relogs_in_on_forbidden_and_after_token_ttl(stub):
+    stub.failures['/nacos/v1/ns/instance/beat'] = [403]
+    stub.token_ttl = 0.5
+    agent = make_agent(stub)
+    agent.start()
+    # 403后重新登录一次，token在0.4秒（tokenTtl的80%）后再刷新
+    assert wait_until(lambda: stub.logins >= 3)
+    agent.stop(deregister=False)
+    assert stub.paths('POST').count('/nacos/v1/ns/instance') == 1
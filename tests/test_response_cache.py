@@ -0,0 +1,79 @@
+# ResponseCache测试：分组按主机/集群和资源类型失效，single-flight的等待有上限
+import threading
+import time
+
+from flask import Flask, jsonify
+
+from app.response_cache import ResponseCache
+
+
+def make_app(cache, calls, release=None):
+    app = Flask(__name__)
+
+    def view(name):
+        calls.append(name)
+        # 只有第一次执行阻塞到release
+        if release is not None and len(calls) == 1:
+            release.wait(5)
+        return jsonify({"name": name, "calls": len(calls)})
+
+    for name, group in (('pods-a', 'k8s/a/pods'), ('deployments-a', 'k8s/a/deployments'),
+                        ('overview-a', 'k8s/a'), ('pods-b', 'k8s/b/pods'), ('all', 'k8s')):
+        app.add_url_rule(f'/{name}', name, cache.cached(ttl=60, group=group)(lambda name=name: view(name)))
+    app.add_url_rule('/delete-pod-a', 'delete-pod-a', cache.invalidates('k8s/a/pods')(lambda: jsonify({})),
+                     methods=['DELETE'])
+    return app
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_invalidation_is_scoped_to_related_groups():
+    cache = ResponseCache()
+    calls = []
+    client = make_app(cache, calls).test_client()
+    paths = ['/pods-a', '/deployments-a', '/overview-a', '/pods-b', '/all']
+    for path in paths:
+        client.get(path)
+    for path in paths:
+        client.get(path)
+    assert len(calls) == len(paths)
+    client.delete('/delete-pod-a')
+    for path in paths:
+        client.get(path)
+    # 集群a的pods、集群a的概览和跨集群列表重新执行，集群a的deployments和集群b的pods仍然命中
+    assert calls[len(paths):] == ['pods-a', 'overview-a', 'all']
+
+
+def test_followers_render_themselves_when_leader_hangs():
+    cache = ResponseCache(wait_timeout=0.1)
+    calls = []
+    release = threading.Event()
+    app = make_app(cache, calls, release)
+    leader = threading.Thread(target=lambda: app.test_client().get('/pods-a'))
+    leader.start()
+    try:
+        assert wait_until(lambda: calls)
+        # 执行中的请求一直不返回，等待的请求超时后自己执行
+        response = app.test_client().get('/pods-a')
+        assert response.status_code == 200
+        assert len(calls) == 2
+        assert not release.is_set()
+    finally:
+        release.set()
+        leader.join()
+
+
+def test_disabled_cache_runs_every_request():
+    cache = ResponseCache(enabled=False)
+    calls = []
+    client = make_app(cache, calls).test_client()
+    for _ in range(3):
+        assert client.get('/pods-a').status_code == 200
+    assert calls == ['pods-a'] * 3